@@ -0,0 +1,230 @@
+"""
+==============================================================================
+ Receipt Auto-Crop (OpenCV)
+==============================================================================
+Python port of MATLAB/Crop_Functions/autoCrop.m, so cropping runs inside the
+receipt pipeline instead of a MATLAB session handing over files:
+
+# - 'morphology': CLAHE (adapthisteq), + top-hat - bottom-hat (disk 15),
+#   binarize at Threshold (Otsu when 0), open/close (disk 5), fill holes
+# - 'adaptive':   vote of Canny edges, 'morphology' and 9x9 local variance
+#   (at least 2 of 3), open/close (disk 3), fill holes. autoCrop.m calls a
+#   cannyBoundaryDetection that is not in the MATLAB folder; here Canny edges
+#   (high threshold = Threshold) are closed and filled into a region mask.
+# - postProcessBoundary: drop components smaller than MinArea, keep the
+#   largest, smooth (disk 2)
+# - findOptimalBoundingBox: bounding box of the mask + Padding, clipped; the
+#   whole image when nothing is found
+#
+# Photos larger than max_side are analysed on a downscaled copy (the box is
+# scaled back and the crop cut from the full image); MinArea and Padding stay
+# in full-resolution pixels. Boxes are 0-based x, y, w, h.
+
+Usage:
+    crop, box = auto_crop(img, method='morphology', threshold=0.15, padding=20)
+    pipeline = ReceiptPipeline(engine, crop=AutoCrop('adaptive'))
+    for path, crop, box in crop_batch(['receipts/'], workers=8): ...
+"""
+import cv2
+import numpy as np
+
+METHODS = ('morphology', 'adaptive')
+
+##Defaults of autoCrop.m
+THRESHOLD = 0.5
+MIN_AREA = 1500
+PADDING = 5
+
+##Longest side the masks are computed at
+MAX_SIDE = 1600
+
+def disk(radius):
+    """MATLAB strel('disk', r) as an OpenCV structuring element."""
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+
+def open_close(mask, radius):
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, disk(radius))
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, disk(radius))
+
+def fill_holes(mask):
+    """imfill(mask, 'holes'): background not reachable from the border becomes foreground."""
+    padded = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    flood = padded.copy()
+    cv2.floodFill(flood, None, (0, 0), 255)
+    return mask | cv2.bitwise_not(flood)[1:-1, 1:-1]
+
+def normalize(img):
+    """Grayscale in [0, 1] (rgb2gray + mat2gray)."""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = gray.astype(np.float32)
+    low, high = float(gray.min()), float(gray.max())
+    return (gray - low) / (high - low) if high > low else np.zeros_like(gray)
+
+#------------------------------------------------------- METHODS -----------------------------------------------
+def morphology_mask(gray, threshold):
+    """morphologyBoundaryDetection.m"""
+    enhanced = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply((gray * 255).astype(np.uint8))
+    enhanced = enhanced.astype(np.float32) / 255
+    tophat = cv2.morphologyEx(enhanced, cv2.MORPH_TOPHAT, disk(15))
+    bothat = cv2.morphologyEx(enhanced, cv2.MORPH_BLACKHAT, disk(15))
+    enhanced = enhanced + tophat - bothat
+
+    if threshold == 0:
+        level, _ = cv2.threshold((np.clip(enhanced, 0, 1) * 255).astype(np.uint8), 0, 255,
+                                 cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        threshold = level / 255
+    mask = (enhanced > threshold).astype(np.uint8) * 255
+    return fill_holes(open_close(mask, 5))
+
+def canny_mask(gray, threshold):
+    """Edges at a high threshold of `threshold` (low = 0.4 x high, as MATLAB's edge), closed into regions."""
+    high = max(threshold, 0.01) * 255
+    edges = cv2.Canny((gray * 255).astype(np.uint8), 0.4 * high, high)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, disk(5))
+    return fill_holes(edges)
+
+def adaptive_mask(gray, threshold):
+    """adaptiveBoundaryDetection.m"""
+    edges = canny_mask(gray, threshold) > 0
+    morph = morphology_mask(gray, threshold) > 0
+
+    ##Local variance over 9x9 windows
+    mean = cv2.blur(gray, (9, 9), borderType=cv2.BORDER_REPLICATE)
+    var = cv2.blur((gray - mean) ** 2, (9, 9), borderType=cv2.BORDER_REPLICATE)
+    varying = var > threshold * var.max()
+
+    votes = edges.astype(np.uint8) + morph + varying
+    mask = (votes >= 2).astype(np.uint8) * 255
+    return fill_holes(open_close(mask, 3))
+
+MASKS = {'morphology': morphology_mask, 'adaptive': adaptive_mask}
+
+#------------------------------------------------------- BOX -----------------------------------------------
+def post_process(mask, min_area):
+    """postProcessBoundary.m: drop components below min_area, keep the largest, smooth."""
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count <= 1:
+        return np.zeros_like(mask)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    largest = 1 + int(np.argmax(areas))
+    if areas[largest - 1] < min_area:
+        return np.zeros_like(mask)
+    return open_close((labels == largest).astype(np.uint8) * 255, 2)
+
+def bounding_box(mask, shape, padding, scale=1.0):
+    """findOptimalBoundingBox.m: x, y, w, h in full-resolution pixels (whole image when mask is empty)."""
+    height, width = shape[:2]
+    points = cv2.findNonZero(mask)
+    if points is None:
+        return 0, 0, width, height
+    x, y, w, h = cv2.boundingRect(points)
+    x0 = max(int(x * scale) - padding, 0)
+    y0 = max(int(y * scale) - padding, 0)
+    x1 = min(int(np.ceil((x + w) * scale)) + padding, width)
+    y1 = min(int(np.ceil((y + h) * scale)) + padding, height)
+    return x0, y0, x1 - x0, y1 - y0
+
+def auto_crop(img, method='adaptive', threshold=THRESHOLD, min_area=MIN_AREA, padding=PADDING, max_side=MAX_SIDE):
+    """
+    Crop a receipt out of a photo.
+
+    Args:
+        img (np.ndarray): BGR or grayscale image.
+        method (str): 'morphology' or 'adaptive'.
+        threshold (float): 0-1 (0 = Otsu for the morphology binarization).
+        min_area (int): Smallest region, in full-resolution pixels, that counts as the receipt.
+        padding (int): Pixels added around the detected receipt.
+        max_side (int): Longest side the masks are computed at (None = full resolution).
+
+    Returns:
+        (cropped view of img, (x, y, w, h))
+    """
+    if method not in MASKS:
+        raise ValueError(f'method must be one of {METHODS}, not {method!r}')
+    if not 0 <= threshold <= 1:
+        raise ValueError('threshold must be between 0 and 1')
+
+    small, scale = img, 1.0
+    if max_side and max(img.shape[:2]) > max_side:
+        scale = max(img.shape[:2]) / max_side
+        small = cv2.resize(img, (round(img.shape[1] / scale), round(img.shape[0] / scale)), interpolation=cv2.INTER_AREA)
+
+    mask = MASKS[method](normalize(small), threshold)
+    mask = post_process(mask, min_area / scale ** 2)
+    x, y, w, h = bounding_box(mask, img.shape, padding, scale)
+    return img[y:y + h, x:x + w], (x, y, w, h)
+
+class AutoCrop:
+    """
+    auto_crop with fixed parameters, usable as ReceiptPipeline's crop stage
+    (picklable, so it can go to batch workers).
+    """
+    def __init__(self, method='adaptive', threshold=THRESHOLD, min_area=MIN_AREA, padding=PADDING, max_side=MAX_SIDE):
+        if method not in MASKS:
+            raise ValueError(f'method must be one of {METHODS}, not {method!r}')
+        self.method = method
+        self.threshold = threshold
+        self.min_area = min_area
+        self.padding = padding
+        self.max_side = max_side
+
+    def params(self):
+        """Everything that changes the crop (part of the OCR cache key)."""
+        return {'method': self.method, 'threshold': self.threshold, 'min_area': self.min_area,
+                'padding': self.padding, 'max_side': self.max_side}
+
+    def __call__(self, img):
+        return auto_crop(img, **self.params())[0]
+
+#------------------------------------------------------- BATCH -----------------------------------------------
+##Per-process crop settings, set by init_worker
+_cropper = None
+
+def init_worker(params):
+    global _cropper
+    _cropper = AutoCrop(**params)
+
+def crop_task(path):
+    from receipt_pipeline import decode, read_source
+    img = decode(read_source(path))
+    crop, box = auto_crop(img, **_cropper.params())
+    ##A copy, so the whole photo is not pickled back with the view
+    return path, np.ascontiguousarray(crop), box
+
+def crop_batch(sources, workers=None, **params):
+    """
+    Crop receipts on a pool of workers.
+
+    Args:
+        sources (str | list): Image files and/or directories of images.
+        workers (int): Worker processes (all cores by default).
+        **params: AutoCrop parameters (method, threshold, min_area, padding, max_side).
+
+    Yields:
+        (path, cropped BGR array, (x, y, w, h)) per image, in input order.
+    """
+    from batch_ocr import list_images
+    from parallel import parallel_map
+    AutoCrop(**params)  # validate before starting workers
+    return parallel_map(crop_task, list_images(sources), workers, initializer=init_worker, initargs=(params,))
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='Auto-crop receipt photos (port of autoCrop.m).')
+    parser.add_argument('sources', nargs='+', help='images and/or directories of images')
+    parser.add_argument('--out-dir', required=True, help='write the crops here')
+    parser.add_argument('--method', choices=METHODS, default='adaptive')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--min-area', type=int, default=MIN_AREA)
+    parser.add_argument('--padding', type=int, default=PADDING)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for path, crop, box in crop_batch(args.sources, args.workers, method=args.method, threshold=args.threshold,
+                                      min_area=args.min_area, padding=args.padding):
+        cv2.imwrite(os.path.join(args.out_dir, os.path.basename(path)), crop)
+        print(path, box)
@@ -1,90 +1,112 @@
-import os
-import pytesseract
-import pandas as pd
-# import matplotlib.pyplot as plt
-from datetime import datetime
-from PIL import Image
-import cv2
-import time
-import json
-
-##Clear terminal screen before run
-if os.name == 'nt':
-    os.system('cls')
-else: 
-    os.system('clear')
-##-----------------------------------------------------------------------------------------------------------------------------
-##Time date today
-now = datetime.now()
-dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
-print("Running on -- ",dt_string)
-print("=== Python Receipt OCR ===")
-
-##Files
-output_path = '/Users/panda/Documents/Work/Work_Main/spending_track/ouput'
 ##-----------------------------------------------------------------------------------------------------------------------------
 """Functions"""
 ##-----------------------------------------------------------------------------------------------------------------------------
 class ReceiptOCR:
-    def __init__(self):
-        ##Version tesseract 5.5.1
-        pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
-
-        ##Common patterns for receipt data
-        ##Ex: 01/05/2025 (exact 2/2/4 formats, coult be other way around)
-        self.data_patterns = [
-            r'\d{2}/\d{2}/\d{4}',
-            r'\d{4}-\d{2}-\d{2}',
-            r'\d{2}-\d{2}-\d{4}',
-            r'\d{1,2}/\d{1,2}/\d{2,4}'
-        ]
-
-        ##Patterns for amount, after period is max 2 decimal
-        self.amount_patterns = [
-            r'TOTAL[:\s]*([0-9,]+\.?\d{0,2})',
-            r'Total[:\s]*([0-9,]+\.?\d{0,2})',
-            r'Amount[:\s]*([0-9,]+\.?\d{0,2})',
-            r'AMOUNT[:\s]*([0-9,]+\.?\d{0,2})',
-            r'(\d+\.\d{2})\s*$
-        ]
-
-    ##Use the result from matlab after crop, save from output_path
+    def __init__(self, tesseract_cmd=None, cache_dir=None, cache_bytes=None):
+        from batch_ocr import OcrEngine
+        from ocr_cache import DEFAULT_MAX_BYTES, OcrCache
+        from receipt_fields import FieldExtractor
+        from receipt_pipeline import ReceiptPipeline
+
+        ##Version tesseract 5.5.1 (e.g. '/opt/homebrew/bin/tesseract'); None = tesseract on PATH
+        self.tesseract_cmd = tesseract_cmd
+        self.engine = OcrEngine(tesseract_cmd=tesseract_cmd)
+
+        ##Content-addressed cache of OCR text + preprocessed images (None = no cache)
+        self.cache_dir = cache_dir
+        self.cache_bytes = cache_bytes or DEFAULT_MAX_BYTES
+        self.cache = OcrCache(cache_dir, self.cache_bytes) if cache_dir else None
+
+        ##Date / total / item patterns, compiled once into one single-pass matcher (receipt_fields.py)
+        self.extractor = FieldExtractor()
+
+        ##In-memory pipelines of extract_text, one per (preprocess, lines), built once and reused
+        ##(a line-mode pipeline keeps its per-thread line engines and thread pool between calls)
+        self.pipeline_class = ReceiptPipeline
+        self.pipelines = {(False, False): ReceiptPipeline(self.engine, cache=self.cache)}
+
+    ##Use the result from matlab after crop; returns an RGB buffer and leaves the source file untouched
     def preprocess_image(self, image_path):
+        import numpy as np
+        from PIL import Image
         image = Image.open(image_path)
-        image = image.convert('RGB')
-        image.save(image_path)
+        return np.asarray(image.convert('RGB'))
 
     ##Text extraction 
-    def extract_text(self,image_path):
-        
-        
+    def extract_text(self, image, preprocess=False, lines=False):
+        """
+        OCR one image (path, encoded bytes or decoded BGR array) in memory;
+        preprocess=True applies run_single_img's grayscale/denoise/threshold first,
+        lines=True recognizes only the MSER text-line crops.
+        """
+        key = (bool(preprocess), bool(lines))
+        if key not in self.pipelines:
+            self.pipelines[key] = self.pipeline_class(self.engine, threshold=key[0], cache=self.cache, lines=key[1])
+        return self.pipelines[key].run(image)[0]
+
+    ##Batch extraction on a pool of long-lived OCR workers (batch_ocr.py)
+    def extract_batch(self, images, workers=None, preprocess=False, lines=False, crop=None, cascade=False):
+        """
+        images: files and/or directories. crop: 'morphology' / 'adaptive' auto-crop first.
+        cascade: escalate the preprocessing per receipt while OCR confidence is low.
+        Yields batch_ocr.OcrResult in input order.
+        """
+        from batch_ocr import ocr_batch
+        if crop is not None:
+            from Crop_Functions.auto_crop import AutoCrop
+            crop = AutoCrop(crop)
+        return ocr_batch(images, workers, tesseract_cmd=self.tesseract_cmd, preprocess=preprocess,
+                         cache_dir=self.cache_dir, cache_bytes=self.cache_bytes, lines=lines, crop=crop,
+                         cascade=cascade)
+
+    ##Structured fields (merchant, date, total, items with their positions) from OCR text
+    def extract_fields(self, text):
+        return self.extractor.extract(text)
+
+    def extract_fields_batch(self, texts, workers=1):
+        """(receipts, items) DataFrames for many OCR texts (receipt_fields.FieldExtractor.extract_batch)."""
+        return self.extractor.extract_batch(texts, workers)
+
 ##------------------------------------------------------------------------------------------------------------
 """For mannual entry"""
 ##-----------------------------------------------------------------------------------------------------------------------------
 """Set up for parsing"""
 ##-----------------------------------------------------------------------------------------------------------------------------
-def parse_item_price(item: str) -> float:
+def parse_item_price(item):
     """
     Given a line-item string like 'latte 3.25', parse the LAST token as float.
     If parsing fails, return None.
+    A list / Series / array of line items is parsed in one vectorized pass
+    (receipt_fields.parse_item_prices) into a float array, NaN where parsing fails.
     """
+    if not isinstance(item, str):
+        from receipt_fields import parse_item_prices
+        return parse_item_prices(item)
     parts = item.strip().split()
     try:
         return float(parts[-1])
     except:
         return None
 
-def mannual_entry():
+def mannual_entry(ledger=None):
+    """
+    Ask for one transaction; with a ledger.Ledger it is stored (and queryable) right away.
+    Returns the entry as a dict (with its ledger 'id' when stored).
+    """
+    from ledger import parse_date
     print("====Manual Entry Mode====")
     merchant = input("Merchant name: ").strip()
-    while merchant is None:
+    while not merchant:
         merchant = input("Merchant cannot be empty. Please re-enter: ").strip()
 
     date = input("Date (dd/mm/yyyy or dd-mm-yyyy): ").strip()
-    while date is None:
-        date = input ("Date cannot be empty. Please re-enter: ").strip()
-    
-    date = input("Date (dd/mm/yyyy or dd-mm-yyyy): ").strip()
+    while True:
+        try:
+            parse_date(date)
+            break
+        except ValueError:
+            date = input("Date not recognized. Please re-enter (dd/mm/yyyy or dd-mm-yyyy): ").strip()
+
     total = None
     while total == None:
         val = input("Total amount (e.g., 193.00): ").strip()
@@ -93,12 +115,52 @@ def mannual_entry():
         except:
             print("Invalid amount. Please enter a numeric value (e.g., 193.00).")
 
-   
+    category = input("Category (optional): ").strip() or None
+    entry = {'merchant': merchant, 'date': date, 'total': total, 'category': category}
+    if ledger is not None:
+        entry['id'] = ledger.add(merchant, total, date, category=category, source='manual')
+        print(f"Saved to {ledger.path} (id {entry['id']})")
+    return entry
+
 
 ##-----------------------------------------------------------------------------------------------------------------------------
 """MAIN"""
 ##-----------------------------------------------------------------------------------------------------------------------------
-# def main():
+def main(images, tesseract_cmd=None, preprocess=False, workers=None, cache_dir=None, lines=False, crop=None,
+         cascade=False, ledger=None):
+    """ledger: path of a ledger database (ledger.py) every receipt with a total is booked into."""
+    import time
+    from datetime import datetime
+
+    ##Time date today
+    now = datetime.now()
+    dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
+    print("Running on -- ",dt_string)
+    print("=== Python Receipt OCR ===")
+
+    from batch_ocr import summarize
+
+    ocr = ReceiptOCR(tesseract_cmd, cache_dir)
+    if ledger is not None:
+        from ledger import Ledger
+        ledger = Ledger(ledger)
+    start = time.perf_counter()
+    results = []
+    for result in ocr.extract_batch(images, workers, preprocess, lines, crop, cascade):
+        results.append(result)
+        print(f"--- {result.path} ---")
+        if result.error is not None:
+            print(f"!! {result.error}")
+            continue
+        print(result.text)
+        fields = ocr.extract_fields(result.text)
+        print({name: (None if f is None else f.value) for name, f in fields.items() if name in ('merchant', 'date', 'total')})
+        if ledger is not None:
+            row = ledger.add_receipt(fields, result.path)
+            print(f"!! no total, not booked" if row is None else f"booked into {ledger.path} (id {row})")
+    print(summarize(results, time.perf_counter() - start))
+
+# def interactive_main():
     # ocr = ReceiptOCR()
 #     print("\n === RECEIPT SPENDING TRACKER ===")
 #     while True:
@@ -116,5 +178,6 @@ def mannual_entry():
 
         
 
-# if __name__ == "__main__":
-#     main()
\ No newline at end of file
+if __name__ == "__main__":
+    import sys
+    main(sys.argv[1:])
\ No newline at end of file
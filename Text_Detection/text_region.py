@@ -1,81 +1,240 @@
+import os
+
 import cv2
 import numpy as np
 
+##Images are detected at most this large (longest side); bigger ones go down the pyramid first
+MAX_SIDE = 1600
+
 ##Detecting text region with MSER
-def detect_text_regions(img):
+class RegionDetector:
+    """
+    Reusable MSER text-region detector.
+
+    Images whose longest side exceeds max_side are detected on a pyrDown
+    level (each level halves the sides) and the regions are mapped back to
+    full resolution: a 12 MP photo is detected at ~1 MP. MSER's area limits
+    shrink with the level, so the same characters pass. The MSER object of
+    each level is created once and reused for every image of a batch.
+
+    Args:
+        max_side (int): Longest side to detect at (None = always full resolution).
+        delta, min_area, max_area, max_variation: MSER parameters at full resolution.
+    """
+    def __init__(self, max_side=MAX_SIDE, delta=3, min_area=20, max_area=20000, max_variation=0.4):
+        self.max_side = max_side
+        self.delta = delta
+        self.min_area = min_area
+        self.max_area = max_area
+        self.max_variation = max_variation
+        self.detectors = {}
+
+    def params(self):
+        """Everything that changes the regions found (part of the OCR cache key)."""
+        return {'max_side': self.max_side, 'delta': self.delta, 'min_area': self.min_area,
+                'max_area': self.max_area, 'max_variation': self.max_variation}
+
+    def mser(self, level=0):
+        """The tuned MSER detector of one pyramid level (areas scaled by 1/4 per level)."""
+        if level not in self.detectors:
+            scale = 4 ** level
+            mser = cv2.MSER_create()
+            mser.setDelta(self.delta)
+            mser.setMinArea(max(self.min_area // scale, 1))
+            mser.setMaxArea(max(self.max_area // scale, 2))
+            mser.setMaxVariation(self.max_variation)
+            self.detectors[level] = mser
+        return self.detectors[level]
+
+    def pyramid(self, gray):
+        """(pyramid image no larger than max_side, level)."""
+        level = 0
+        while self.max_side and max(gray.shape[:2]) > self.max_side:
+            gray = cv2.pyrDown(gray)
+            level += 1
+        return gray, level
+
+    def detect(self, gray):
+        """(MSER point regions, x/y/w/h boxes, level): coordinates are those of the pyramid level."""
+        small, level = self.pyramid(gray)
+        regions, boxes = self.mser(level).detectRegions(small)
+        return regions, np.asarray(boxes, dtype=np.int64).reshape(-1, 4), level
+
+    def hulls(self, gray):
+        """Convex hulls (OpenCV contours) of the MSER regions, in full-resolution coordinates."""
+        regions, _, level = self.detect(gray)
+        return [cv2.convexHull(p.reshape(-1, 1, 2)) << level for p in regions]
+
+    def boxes(self, gray):
+        """(n, 4) int array of x, y, w, h bounding boxes of the MSER regions, in full-resolution coordinates."""
+        _, boxes, level = self.detect(gray)
+        return boxes << level
+
+    def mask(self, gray, regions=None):
+        """
+        uint8 mask (255 inside the regions' convex hulls, slightly dilated) of
+        gray's size, or None when nothing is found. regions: a detect() result to reuse.
+        """
+        regions, _, level = regions or self.detect(gray)
+        if not len(regions):
+            return None
+        ##Hulls filled on the pyramid level, then scaled up. One fillConvexPoly per hull:
+        ##a single fillPoly/drawContours over all of them would cancel the overlaps (even-odd fill)
+        small = np.zeros(((gray.shape[0] + (1 << level) - 1) >> level, (gray.shape[1] + (1 << level) - 1) >> level),
+                         dtype=np.uint8)
+        for p in regions:
+            cv2.fillConvexPoly(small, cv2.convexHull(p.reshape(-1, 1, 2)), 255)
+        ##Dilate to make thin strokes thicker
+        small = cv2.dilate(small, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)), iterations=1)
+        if level:
+            return cv2.resize(small, (gray.shape[1], gray.shape[0]), interpolation=cv2.INTER_NEAREST)
+        return small
+
+##Shared by the module-level functions (one detector per process)
+DETECTOR = RegionDetector()
+
+def detect_text_regions(img, visualize=True, detector=DETECTOR):
     """
     Detects text regions in `img` using MSER.
     Args:
         img (np.ndarray): BGR input image.
+        visualize (bool): Also draw the region outlines (skipped, and vis None, when False).
+        detector (RegionDetector): Reuse one across a batch of images.
 
     Returns:
-        vis (np.ndarray): Copy of img with detected region outlines drawn.
+        vis (np.ndarray): Copy of img with detected region outlines drawn (None unless visualize).
         text_only (np.ndarray): img masked to show only those regions.
     """
-    ##Create MSER object
-    # mser = cv2.MSER_create()
-
-    ##Tuned MSER
-    mser = cv2.MSER_create()
-    mser.setDelta(3)
-    mser.setMinArea(20)
-    mser.setMaxArea(20000)
-    mser.setMaxVariation(0.4)
-
     ##Convert to grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    #Detect regions in gray scale image -> list of point arrays
-    regions, _ = mser.detectRegions(gray)
-    
-    # Build convex hulls around each region
-    hulls = []
-    for p in regions:
-        # Reshape region points into OpenCV contour shape
-        points = p.reshape(-1,1,2)
-        hull = cv2.convexHull(points)
-        hulls.append(hull)
+    regions = detector.detect(gray)
 
     # Draw outlnes on a copy of the orginal for visualization
-    vis = img.copy()
-    for i in hulls:
-        #isClosed = True, thickness = 2, color = green
-        cv2.polylines(vis, [i], isClosed = True, color =(0, 255, 0), thickness = 2)
-
-    ##Create a blank mask, same height/width as org img
-    # mask = np.zeros((img.shape[0], img.shape[1]), dtype=np.uint8)
-    mask = np.zeros(gray.shape, dtype=np.uint8)
-
-    ##Fill each hull on the mask in white(255)
-    for i in hulls:
-        cv2.drawContours(mask, [i], contourIdx = -1, color = 255, thickness = -1)
-    
-    ##Dilate to make thin strokes thicker
-    kernal = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
-    mask = cv2.dilate(mask, kernal, iterations = 1)
+    vis = None
+    if visualize:
+        vis = img.copy()
+        #isClosed = True, thickness = 2, color = green; all hulls in one call
+        hulls = [cv2.convexHull(p.reshape(-1, 1, 2)) << regions[2] for p in regions[0]]
+        cv2.polylines(vis, hulls, isClosed = True, color =(0, 255, 0), thickness = 2)
 
     ##Use the mask to extract just those regions from the original
+    mask = detector.mask(gray, regions)
+    if mask is None:
+        return vis, np.zeros_like(img)
     text_only = cv2.bitwise_and(img, img, mask = mask)
 
     return vis, text_only
+
+def keep_text_regions(img, background=255, detector=DETECTOR):
+    """
+    img with everything outside the MSER text regions set to `background`
+    (white, so OCR sees paper). Returned unchanged when no region is found.
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    mask = detector.mask(gray)
+    if mask is None:
+        return img
+    out = img.copy()
+    out[mask == 0] = background
+    return out
+##Grouping regions into text lines
+def line_boxes(img, max_height_frac=0.25, gap=1.5, pad=0.5, detector=DETECTOR):
+    """
+    Text-line bounding boxes of an image, top to bottom.
+
+    Overlapping and nearby MSER boxes are merged by filling them on a mask
+    and closing horizontal gaps up to `gap` x the median character height.
+    The merged pieces are grouped into rows by vertical overlap. Each row
+    spans the whole text block horizontally, because MSER misses some
+    characters and a receipt line (item ... price) should stay one crop.
+    Boxes are padded by `pad` x the character height (plus the gap sideways)
+    and clipped to the image.
+
+    Args:
+        img (np.ndarray): BGR or grayscale image.
+        max_height_frac (float): Regions taller than this fraction of the image are background, not text.
+
+    Returns:
+        (n, 4) int array of x, y, w, h.
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    boxes = detector.boxes(gray)
+    boxes = boxes[(boxes[:, 3] <= max_height_frac * height) & (boxes[:, 2] <= 0.9 * width)]
+    if not len(boxes):
+        return boxes
+
+    ##Character height drives the merge distance and the padding
+    char_h = max(int(np.median(boxes[:, 3])), 1)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for x, y, w, h in boxes:
+        mask[y:y + h, x:x + w] = 255
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(int(gap * char_h), 1), 1))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    pieces = stats[1:, :4].astype(np.int64)
+    ##Drop specks smaller than half a character
+    pieces = pieces[pieces[:, 3] >= char_h // 2]
+    if not len(pieces):
+        return pieces
+
+    ##Rows: a piece whose vertical centre falls inside the current row joins it
+    rows = []
+    for x, y, w, h in pieces[np.argsort(pieces[:, 1] + pieces[:, 3] / 2)]:
+        if rows and rows[-1][0] <= y + h / 2 <= rows[-1][1]:
+            rows[-1][1] = max(rows[-1][1], y + h)
+        else:
+            rows.append([y, y + h])
+    rows = np.array(rows, dtype=np.int64)
+
+    p = int(pad * char_h)
+    ##Sideways also by the merge gap: the first / last characters of the longest line may have no region
+    px = p + int(gap * char_h)
+    x0 = max(int(pieces[:, 0].min()) - px, 0)
+    x1 = min(int((pieces[:, 0] + pieces[:, 2]).max()) + px, width)
+    y0 = np.clip(rows[:, 0] - p, 0, height)
+    y1 = np.clip(rows[:, 1] + p, 0, height)
+    return np.stack([np.full(len(rows), x0), y0, np.full(len(rows), x1 - x0), y1 - y0], axis=1)
+
+def draw_boxes(img, boxes, color=(0, 0, 255)):
+    """Copy of img with the boxes outlined (debug output)."""
+    vis = img.copy() if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    for x, y, w, h in boxes:
+        cv2.rectangle(vis, (int(x), int(y)), (int(x + w), int(y + h)), color, 2)
+    return vis
 ##-----------------------------------------------------------------
-##Testing 
-if __name__ == "__main__":
-    img = cv2.imread('/Users/panda/Documents/Work/Work_Main/Dataset_collection/Screenshot 2025-06-25 at 14.56.31.png')
+def main(image_path, output_path=None, show=False):
+    """Detect text regions; the result images are only written when output_path is given."""
+    img = cv2.imread(image_path)
+    if img is None:
+        raise FileNotFoundError(image_path)
 
-    # Detect and visualize
-    vis, text_only = detect_text_regions(img)
+    # Detect, and visualize only when the result is shown or saved
+    vis, text_only = detect_text_regions(img, visualize=show or bool(output_path))
 
-    cv2.imshow("Detected Text Regions", vis)
-    cv2.waitKey(5000)
+    if show:
+        cv2.imshow("Detected Text Regions", vis)
+        cv2.waitKey(5000)
 
-    cv2.imshow("Masked Text Only", text_only)
-    cv2.waitKey(5000)
-    cv2.destroyAllWindows()
+        cv2.imshow("Masked Text Only", text_only)
+        cv2.waitKey(5000)
+        cv2.destroyAllWindows()
 
-    #Save results
-    output_path = '/Users/panda/Documents/Work/Work_Main/spending_track/ouput'
-    cv2.imwrite(f"{output_path}/detected_text_regions.png", vis)
-    cv2.imwrite(f"{output_path}/masked_text_only.png", text_only)
+    #Save results (debug output, on request)
+    if output_path:
+        os.makedirs(output_path, exist_ok=True)
+        cv2.imwrite(os.path.join(output_path, "detected_text_regions.png"), vis)
+        cv2.imwrite(os.path.join(output_path, "masked_text_only.png"), text_only)
+        print("Save in output folder")
+    return vis, text_only
+
+##Testing 
+if __name__ == "__main__":
+    import argparse
 
-    print("Save in output folder")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Detect text regions with MSER.')
+    parser.add_argument('image')
+    parser.add_argument('--out-dir', default=None, help='write the result images here')
+    parser.add_argument('--show', action='store_true', help='display the results for 5 seconds each')
+    args = parser.parse_args()
+    main(args.image, args.out_dir, args.show)
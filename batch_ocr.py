@@ -0,0 +1,283 @@
+"""
+==============================================================================
+ Batch Receipt OCR
+==============================================================================
+pytesseract.image_to_string starts a tesseract process, and reloads the
+language model, for every image. Batch mode runs the receipts on a pool of
+long-lived workers (one per core), and each worker builds a single OcrEngine
+when it starts:
+
+# - tesserocr installed (pip install tesserocr): the engine wraps a
+#   PyTessBaseAPI, so the model is loaded once per worker and every receipt is
+#   recognized in-process.
+# - otherwise: pytesseract fallback (one tesseract process per image, but all
+#   cores stay busy); a note on stderr says so, once per run.
+#
+# With --crop each photo is first cut down to the receipt
+# (Crop_Functions/auto_crop.py, no MATLAB hand-off through files).
+#
+# With --lines only the MSER text-line crops are recognized (single-line
+# mode, receipt_pipeline.py), which skips the background of phone photos.
+#
+# With --cascade each receipt is recognized at the cheapest preprocessing
+# level first and escalates only while the OCR confidence or the extracted
+# fields fall short (run_single_img.OcrCascade); summarize() counts the
+# levels that were needed.
+#
+# With a cache folder (ocr_cache.py) each worker looks the image bytes up
+# before decoding, so an unchanged receipt costs one hash + one file read.
+#
+# Results stream back in input order (parallel.parallel_map) with each
+# receipt's latency; summarize() gives receipts/sec, p50/p99 and cache hits.
+
+Usage:
+    python batch_ocr.py receipts/ --workers 8 --preprocess --cache-dir .ocr_cache
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+
+import cv2
+import numpy as np
+
+from ocr_cache import DEFAULT_MAX_BYTES, OcrCache
+from parallel import parallel_map
+from receipt_pipeline import ReceiptPipeline
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+##text is None (and error set) when the image could not be read; cached: served from the OCR cache;
+##level: cascade level the text came from (None without cascade or when cached)
+OcrResult = namedtuple('OcrResult', ['path', 'text', 'seconds', 'error', 'cached', 'level'], defaults=(None,))
+
+#------------------------------------------------------- ENGINE -----------------------------------------------
+##The pytesseract fallback is noted once per process (ocr_batch notes it for its workers)
+_fallback_noted = False
+
+def note_fallback():
+    """Say on stderr, once, that OCR runs through the tesseract CLI because tesserocr is not installed."""
+    global _fallback_noted
+    if tesserocr is None and not _fallback_noted:
+        _fallback_noted = True
+        print('note: tesserocr is not installed, falling back to the tesseract CLI (one process per image); '
+              'pip install tesserocr to load the model once per worker', file=sys.stderr)
+
+class OcrEngine:
+    """
+    One reusable tesseract instance.
+
+    Args:
+        lang (str): Tesseract language(s), e.g. 'eng'.
+        config (str): Extra tesseract options for the pytesseract fallback.
+        tesseract_cmd (str): tesseract binary for the fallback (None = on PATH).
+        psm (int): Page segmentation mode (None = tesseract's default, 7 = a single text line).
+    """
+    def __init__(self, lang='eng', config='', tesseract_cmd=None, psm=None):
+        self.lang = lang
+        self.config = config
+        self.tesseract_cmd = tesseract_cmd
+        self.psm = psm
+        self.api = None
+        if tesserocr is not None:
+            self.api = tesserocr.PyTessBaseAPI(lang=lang)
+            if psm is not None:
+                self.api.SetPageSegMode(psm)
+            self.version = tesserocr.tesseract_version()
+        else:
+            import pytesseract
+            note_fallback()
+            if tesseract_cmd:
+                pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+            try:
+                self.version = str(pytesseract.get_tesseract_version())
+            except Exception:  # no binary yet; image_to_string will raise the real error
+                self.version = 'unknown'
+
+    def params(self):
+        """Everything that changes the text for the same pixels (part of the cache key)."""
+        params = {'engine': 'tesserocr' if self.api is not None else 'pytesseract',
+                  'version': self.version, 'lang': self.lang, 'config': self.config}
+        if self.psm is not None:
+            params['psm'] = self.psm
+        return params
+
+    def with_psm(self, psm):
+        """A new engine with the same language / config / binary and another page segmentation mode."""
+        return OcrEngine(self.lang, self.config, self.tesseract_cmd, psm)
+
+    def pytesseract_config(self):
+        return self.config if self.psm is None else f'{self.config} --psm {self.psm}'.strip()
+
+    def set_image(self, img):
+        from PIL import Image
+        self.api.SetImage(Image.fromarray(img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+
+    def image_to_string(self, img):
+        """img: BGR or grayscale NumPy image."""
+        if self.api is not None:
+            self.set_image(img)
+            return self.api.GetUTF8Text()
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=self.lang, config=self.pytesseract_config())
+
+    def image_to_data(self, img):
+        """
+        Text and per-word confidences of one image (a single recognition pass).
+
+        Returns:
+            (text, float array of word confidences, 0-100; empty when no word was found)
+        """
+        if self.api is not None:
+            self.set_image(img)
+            text = self.api.GetUTF8Text()
+            return text, np.array(self.api.AllWordConfidences(), dtype=float)
+        import pytesseract
+        data = pytesseract.image_to_data(img, lang=self.lang, config=self.pytesseract_config(),
+                                         output_type=pytesseract.Output.DICT)
+        ##Words back into lines (block, paragraph, line); conf is -1 on layout rows
+        lines, confidences = {}, []
+        for block, par, line, word, conf in zip(data['block_num'], data['par_num'], data['line_num'],
+                                                data['text'], data['conf']):
+            if float(conf) < 0 or not word.strip():
+                continue
+            lines.setdefault((block, par, line), []).append(word)
+            confidences.append(float(conf))
+        text = ''.join(' '.join(words) + '\n' for words in lines.values())
+        return text, np.array(confidences, dtype=float)
+
+    def close(self):
+        if self.api is not None:
+            self.api.End()
+            self.api = None
+
+def recognize(path, engine, preprocess=False, cache=None, lines=False):
+    """
+    OCR one image file (in-memory pipeline, through the cache when one is given).
+
+    Returns:
+        (text, cached)
+    """
+    return ReceiptPipeline(engine, threshold=preprocess, cache=cache, lines=lines).run(path)
+
+#------------------------------------------------------- WORKERS -----------------------------------------------
+##Per-process pipeline (engine + cache), built once by init_worker
+_pipeline = None
+
+def init_worker(lang, config, tesseract_cmd, preprocess, cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES,
+                regions=False, debug_dir=None, lines=False, line_workers=None, crop=None, cascade=False):
+    global _pipeline, _fallback_noted
+    ##Already noted by ocr_batch in the parent process
+    _fallback_noted = True
+    cache = OcrCache(cache_dir, cache_bytes) if cache_dir else None
+    _pipeline = ReceiptPipeline(OcrEngine(lang, config, tesseract_cmd), crop=crop, regions=regions, threshold=preprocess,
+                                cache=cache, debug_dir=debug_dir, lines=lines, line_workers=line_workers, cascade=cascade)
+
+def ocr_task(path):
+    """Decode once, run the pipeline stages in memory and OCR one receipt."""
+    start = time.perf_counter()
+    try:
+        text, cached = _pipeline.run(path)
+    except (OSError, ValueError, cv2.error) as e:
+        ##One unreadable / corrupt image is a failed result, not a failed batch
+        return OcrResult(path, None, time.perf_counter() - start, str(e), False)
+    return OcrResult(path, text, time.perf_counter() - start, None, cached, _pipeline.level)
+
+#------------------------------------------------------- BATCH -----------------------------------------------
+def list_images(sources):
+    """Image paths from a path or list of paths; directories are expanded (sorted, IMAGE_EXTENSIONS)."""
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    for source in sources:
+        if os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(source, name)
+        else:
+            yield source
+
+def ocr_batch(sources, workers=None, lang='eng', config='', tesseract_cmd=None, preprocess=False,
+              cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES, regions=False, debug_dir=None, lines=False, crop=None,
+              cascade=False):
+    """
+    OCR receipts on a pool of long-lived workers.
+
+    Args:
+        sources (str | list): Image files and/or directories of images.
+        workers (int): Worker processes (all cores by default).
+        preprocess (bool): Grayscale, denoise and threshold before OCR.
+        cache_dir (str): Content-addressed OCR cache folder (None = no cache).
+        cache_bytes (int): LRU size bound of the cache.
+        regions (bool): Blank everything outside the MSER text regions first.
+        debug_dir (str): Write every stage's image here (nothing is written otherwise).
+        lines (bool): OCR only the MSER text-line crops, each as a single line; the
+            cores left over by the worker processes recognize a receipt's lines in parallel.
+        crop (callable): Picklable crop stage, e.g. Crop_Functions.auto_crop.AutoCrop('adaptive').
+        cascade (bool): Escalate the preprocessing per receipt until the OCR is confident (instead of preprocess).
+
+    Yields:
+        OcrResult per image, in input order.
+    """
+    note_fallback()
+    workers = workers or os.cpu_count() or 1
+    line_workers = max((os.cpu_count() or 1) // workers, 1)
+    return parallel_map(ocr_task, list_images(sources), workers,
+                        initializer=init_worker,
+                        initargs=(lang, config, tesseract_cmd, preprocess, cache_dir, cache_bytes, regions, debug_dir,
+                                  lines, line_workers, crop, cascade))
+
+def summarize(results, wall_seconds):
+    """Throughput and latency percentiles of a finished batch."""
+    latencies = np.array([r.seconds for r in results]) * 1000
+    summary = {
+        'receipts': len(results),
+        'errors': sum(r.error is not None for r in results),
+        'cache_hits': sum(bool(r.cached) for r in results),
+        'seconds': wall_seconds,
+        'receipts_per_sec': len(results) / wall_seconds if wall_seconds else 0.0,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+    levels = Counter(r.level for r in results if r.level is not None)
+    if levels:
+        summary['cascade_levels'] = dict(levels)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='OCR a batch of receipt images on a worker pool.')
+    parser.add_argument('sources', nargs='+', help='images and/or directories of images')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--lang', default='eng')
+    parser.add_argument('--tesseract-cmd', default=None)
+    parser.add_argument('--preprocess', action='store_true')
+    parser.add_argument('--cache-dir', default=None, help='content-addressed OCR cache folder')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_MAX_BYTES // 2**20)
+    parser.add_argument('--regions', action='store_true', help='keep only MSER text regions before OCR')
+    parser.add_argument('--debug-dir', default=None, help='write every stage image here')
+    parser.add_argument('--lines', action='store_true', help='OCR only the text-line crops (single-line mode)')
+    parser.add_argument('--crop', choices=('morphology', 'adaptive'), default=None, help='auto-crop the receipt first')
+    parser.add_argument('--cascade', action='store_true', help='escalate the preprocessing only while OCR confidence is low')
+    args = parser.parse_args()
+
+    crop = None
+    if args.crop:
+        from Crop_Functions.auto_crop import AutoCrop
+        crop = AutoCrop(args.crop)
+
+    start = time.perf_counter()
+    results = []
+    for result in ocr_batch(args.sources, args.workers, args.lang, tesseract_cmd=args.tesseract_cmd,
+                            preprocess=args.preprocess, cache_dir=args.cache_dir, cache_bytes=args.cache_mb * 2**20,
+                            regions=args.regions, debug_dir=args.debug_dir, lines=args.lines, crop=crop,
+                            cascade=args.cascade):
+        results.append(result)
+        print(f"--- {result.path} ({result.seconds * 1000:.0f} ms) ---")
+        print(result.text if result.error is None else f"!! {result.error}")
+    print(summarize(results, time.perf_counter() - start))
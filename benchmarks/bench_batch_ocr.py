@@ -0,0 +1,129 @@
+"""
+Benchmark: batch receipt OCR (batch_ocr.ocr_batch) vs one image_to_string per receipt
+
+Renders a synthetic receipt corpus (merchant, date, line items, TOTAL) and
+times the old serial loop (pytesseract.image_to_string, a fresh tesseract
+process per image) against the worker pool, a pass that only recognizes
+the MSER text-line crops (--photo makes most of the frame background), then
+a cold and a warm pass through the OCR cache (ocr_cache.py), reporting
+receipts/sec and p50/p99 per-receipt latency. Needs a tesseract binary (and optionally
+tesserocr for the in-process engine).
+
+Run from the repository root:
+    python benchmarks/bench_batch_ocr.py --receipts 200 --workers 1 4 8
+    python benchmarks/bench_batch_ocr.py --receipts 50 --photo 3000 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import batch_ocr
+
+MERCHANTS = ['Starbucks', 'Walmart', 'Target', 'Costco', 'Trader Joe\'s', 'Shell', 'CVS Pharmacy', 'Whole Foods']
+ITEMS = ['latte', 'bagel', 'milk 2L', 'eggs', 'bread', 'apples', 'coffee beans', 'gas', 'shampoo', 'pasta']
+
+
+def synthetic_receipt(rng):
+    """
+    One receipt's ground truth and its text lines.
+
+    Returns:
+        (dict with merchant, date, items [(name, price)], total), lines
+    """
+    merchant = MERCHANTS[rng.integers(len(MERCHANTS))]
+    day = np.datetime64('2024-01-01') + rng.integers(0, 366)
+    date = day.astype(object).strftime('%d/%m/%Y')
+    items = [(ITEMS[j], round(float(rng.uniform(0.5, 40)), 2)) for j in rng.integers(0, len(ITEMS), rng.integers(3, 9))]
+    total = round(sum(p for _, p in items), 2)
+
+    lines = [merchant.upper(), f'Date: {date}', ''] + [f'{name} {price:.2f}' for name, price in items] + ['', f'TOTAL {total:.2f}']
+    return {'merchant': merchant, 'date': date, 'items': items, 'total': total}, lines
+
+
+def write_receipts(out_dir, n, seed=0, width=640, photo=None):
+    """
+    Render n receipt images into out_dir.
+
+    photo=(height, width) places each receipt somewhere on a larger, textured
+    background, like a phone photo of a receipt lying on a table.
+
+    Returns:
+        list of dicts (path, merchant, date, items [(name, price)], total) - the ground truth.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    receipts = []
+    for i in range(n):
+        truth, lines = synthetic_receipt(rng)
+        img = np.full((60 + 40 * len(lines), width, 3), 255, dtype=np.uint8)
+        for row, line in enumerate(lines):
+            cv2.putText(img, line, (30, 50 + 40 * row), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2, cv2.LINE_AA)
+
+        ##Scanner-like blur and sensor noise (perfectly flat renders give MSER nothing to track)
+        img = cv2.GaussianBlur(img, (3, 3), 0)
+        img = np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+        if photo is not None:
+            frame = cv2.GaussianBlur(rng.integers(60, 120, (*photo, 3)).astype(np.uint8), (15, 15), 0)
+            y, x = rng.integers(0, photo[0] - img.shape[0]), rng.integers(0, photo[1] - img.shape[1])
+            frame[y:y + img.shape[0], x:x + img.shape[1]] = img
+            img = frame
+
+        path = os.path.join(out_dir, f'receipt_{i:05d}.png')
+        cv2.imwrite(path, img)
+        receipts.append({'path': path, **truth})
+    return receipts
+
+
+def report(name, latencies, wall):
+    latencies = np.array(latencies) * 1000
+    print(f'{name:<22}{len(latencies) / wall:>14.1f}{np.percentile(latencies, 50):>10.0f}{np.percentile(latencies, 99):>10.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--receipts', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--tesseract-cmd', default=None)
+    parser.add_argument('--photo', type=int, nargs=2, default=None, metavar=('HEIGHT', 'WIDTH'),
+                        help='put each receipt on a larger background (e.g. 3000 2000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [r['path'] for r in write_receipts(tmp, args.receipts, photo=args.photo)]
+        print(f"receipts: {len(paths)}  engine: {'tesserocr' if batch_ocr.tesserocr else 'pytesseract'}")
+        print(f"{'mode':<22}{'receipts/sec':>14}{'p50 ms':>10}{'p99 ms':>10}")
+
+        import pytesseract
+        if args.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = args.tesseract_cmd
+        latencies, start = [], time.perf_counter()
+        for path in paths:
+            t = time.perf_counter()
+            pytesseract.image_to_string(cv2.imread(path))
+            latencies.append(time.perf_counter() - t)
+        report('image_to_string loop', latencies, time.perf_counter() - start)
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = list(batch_ocr.ocr_batch(paths, workers, tesseract_cmd=args.tesseract_cmd))
+            report(f'ocr_batch x{workers}', [r.seconds for r in results], time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = list(batch_ocr.ocr_batch(paths, args.workers[-1], tesseract_cmd=args.tesseract_cmd, lines=True))
+        report(f'text lines x{args.workers[-1]}', [r.seconds for r in results], time.perf_counter() - start)
+
+        cache_dir = os.path.join(tmp, 'cache')
+        for name in ('cache cold', 'cache warm'):
+            start = time.perf_counter()
+            results = list(batch_ocr.ocr_batch(paths, args.workers[-1], tesseract_cmd=args.tesseract_cmd, cache_dir=cache_dir))
+            report(f'{name} x{args.workers[-1]}', [r.seconds for r in results], time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
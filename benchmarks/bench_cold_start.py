@@ -0,0 +1,68 @@
+"""
+Benchmark: cold start of each spending_track.py subcommand
+
+For every subcommand, times fresh interpreters that
+  - parse the command line only (`spending_track.py <cmd> --help`), and
+  - import what the subcommand loads when it runs (its module + dependencies),
+against the old behaviour of every script importing pandas, matplotlib.pyplot,
+cv2 and pytesseract eagerly. Best of --repeat runs, in milliseconds.
+
+Run from the repository root:
+    python benchmarks/bench_cold_start.py --repeat 5 --json cold_start.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+##Modules each subcommand imports when it runs
+SUBCOMMANDS = {
+    'merge': 'import merge_data',
+    'profile': 'import read_info',
+    'ocr': 'import OCR',
+    'detect': 'from Text_Detection import text_region',
+}
+EAGER = 'import pandas, matplotlib.pyplot, cv2, pytesseract'
+
+
+def best_of(cmd, repeat):
+    """Fastest wall time (ms) of a fresh interpreter running cmd; None if it fails."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = (time.perf_counter() - start) * 1000
+        if done.returncode:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', default=None, help='also write the timings to this file')
+    args = parser.parse_args()
+
+    results = {
+        'python': best_of([sys.executable, '-c', 'pass'], args.repeat),
+        'eager imports': best_of([sys.executable, '-c', EAGER], args.repeat),
+    }
+    for name, imports in SUBCOMMANDS.items():
+        results[f'{name} --help'] = best_of([sys.executable, 'spending_track.py', name, '--help'], args.repeat)
+        results[f'{name} imports'] = best_of([sys.executable, '-c', imports], args.repeat)
+
+    print(f"{'start-up':<20}{'ms':>10}")
+    for name, ms in results.items():
+        print(f"{name:<20}{'failed' if ms is None else f'{ms:.0f}':>10}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: merged_transactions.csv vs the month-partitioned Parquet dataset
+
+Builds a synthetic merged frame, writes it both ways, and compares size on
+disk and load time for a full read, a two-column projection and a one-month
+range (partition pruning).
+
+Run from the repository root:
+    python benchmarks/bench_columnar.py --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import merge_data as md
+import columnar_store as cs
+
+
+def synthetic_merged(n, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(md.merchant_options), dtype=object)[rng.integers(0, len(md.merchant_options), n)]
+    merchant, subcategory = md.generate_merchant_subcategory(categories, rng)
+    dates = pd.Timestamp('2019-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 2 * 365 * 86400, n)), unit='s')
+    return pd.DataFrame({
+        'customer_id': rng.permutation(n),
+        'transaction_date': dates.strftime(md.DATE_FORMAT),
+        'merchant': np.asarray(merchant),
+        'amount': np.round(rng.gamma(2.0, 35.0, n), 2),
+        'category': categories,
+        'subcategory': np.asarray(subcategory),
+    })[md.MERGED_COLUMNS]
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_merged(args.rows)
+    work = tempfile.mkdtemp(prefix='bench_columnar_')
+    try:
+        csv_file = os.path.join(work, 'merged_transactions.csv')
+        root = os.path.join(work, 'merged_transactions')
+        df.to_csv(csv_file, index=False)
+        cs.write_dataset(df, root)
+
+        csv_mb = os.path.getsize(csv_file) / 1e6
+        pq_mb = cs.dataset_size(root) / 1e6
+        print(f'rows: {args.rows:,}')
+        print(f"{'size (MB)':<28}{'csv':>10}{'parquet':>10}")
+        print(f"{'':<28}{csv_mb:>10.1f}{pq_mb:>10.1f}")
+
+        cols = ['category', 'amount']
+        cases = [
+            ('full load', lambda: pd.read_csv(csv_file), lambda: cs.read_transactions(root)),
+            ('category, amount', lambda: pd.read_csv(csv_file, usecols=cols), lambda: cs.read_transactions(root, columns=cols)),
+            ('one month, all columns',
+             lambda: (lambda d: d[pd.to_datetime(d.transaction_date, format=md.DATE_FORMAT).between('2019-03-01', '2019-03-31 23:59:59')])(pd.read_csv(csv_file)),
+             lambda: cs.read_transactions(root, start='2019-03-01', end='2019-03-31 23:59:59')),
+        ]
+        print(f"{'load time (s)':<28}{'csv':>10}{'parquet':>10}{'speedup':>10}")
+        for name, csv_fn, pq_fn in cases:
+            t_csv, _ = timed(csv_fn)
+            t_pq, _ = timed(pq_fn)
+            print(f'{name:<28}{t_csv:>10.3f}{t_pq:>10.3f}{t_csv / t_pq:>9.1f}x')
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: household date parsing
+
+Old path: parse_date (datetime.strptime per row, random time per row) plus a
+row-wise apply for missing dates. New path: DateNormalizer.normalize.
+
+Run from the repository root:
+    python benchmarks/bench_dates.py --rows 2000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from date_normalize import DateNormalizer
+
+START, END = datetime(2015, 1, 1), datetime(2025, 1, 1)
+
+
+##Old implementation, kept here only as the baseline
+def legacy_parse_date(d):
+    d = str(d).strip()
+    try:
+        if len(d) > 10 and ':' in d:
+            return datetime.strptime(d, '%d/%m/%Y %H:%M:%S')
+        elif len(d) == 10 and '/' in d:
+            base = datetime.strptime(d, '%d/%m/%Y')
+            return base + timedelta(hours=random.randint(0, 23), minutes=random.randint(0, 59), seconds=random.randint(0, 59))
+    except ValueError:
+        return pd.NaT
+    return pd.NaT
+
+
+def synthetic_household_dates(n, seed=0):
+    """Household-style dates: 2/3 with time, 1/3 date only, 0.1% missing."""
+    rng = np.random.default_rng(seed)
+    stamps = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 10 * 365 * 86400, n), unit='s')
+    with_time = pd.Series(stamps.strftime('%d/%m/%Y %H:%M:%S'), dtype=object)
+    date_only = pd.Series(stamps.strftime('%d/%m/%Y'), dtype=object)
+    pick = rng.integers(0, 3, n)
+    out = with_time.where(pick > 0, date_only)
+    out[rng.random(n) < 0.001] = np.nan
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    dates = synthetic_household_dates(args.rows)
+    dn = DateNormalizer(np.random.default_rng(40), START, END, max_cache=2 * args.rows)
+    start = time.perf_counter()
+    dn.normalize(dates)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    dn.normalize(dates)
+    cached = time.perf_counter() - start
+
+    sample = dates.iloc[:args.legacy_rows]
+    start = time.perf_counter()
+    parsed = sample.map(legacy_parse_date)
+    parsed[parsed.isna()] = [START + timedelta(days=random.randrange((END - START).days)) for _ in range(int(parsed.isna().sum()))]
+    legacy = time.perf_counter() - start
+
+    print(f"{'impl':<26}{'rows':>12}{'seconds':>10}{'rows/sec':>14}")
+    print(f"{'parse_date (row-wise)':<26}{len(sample):>12,}{legacy:>10.3f}{len(sample) / legacy:>14,.0f}")
+    print(f"{'DateNormalizer':<26}{args.rows:>12,}{first:>10.3f}{args.rows / first:>14,.0f}")
+    print(f"{'DateNormalizer (cached)':<26}{args.rows:>12,}{cached:>10.3f}{args.rows / cached:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: receipt field extraction from OCR text
+
+Old path: ReceiptOCR's former data_patterns / amount_patterns (DATA_PATTERNS /
+AMOUNT_PATTERNS below) tried one after another
+with re.search (recompiled from the pattern cache on every call, one search
+per pattern) plus parse_item_price per line. New path:
+FieldExtractor.extract_batch (one compiled single-pass matcher, values
+parsed per column) and the vectorized parse_item_prices. Texts come from bench_batch_ocr's synthetic
+receipts dressed up as OCR output (header, subtotal / tax, footer), so
+accuracy is checked against their ground truth.
+
+Run from the repository root:
+    python benchmarks/bench_field_extraction.py --texts 20000 --workers 1 4
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_batch_ocr import synthetic_receipt
+from receipt_fields import FieldExtractor, parse_item_prices
+
+DATA_PATTERNS = [r'\d{2}/\d{2}/\d{4}', r'\d{4}-\d{2}-\d{2}', r'\d{2}-\d{2}-\d{4}', r'\d{1,2}/\d{1,2}/\d{2,4}']
+AMOUNT_PATTERNS = [r'TOTAL[:\s]*([0-9,]+\.?\d{0,2})', r'Total[:\s]*([0-9,]+\.?\d{0,2})',
+                   r'Amount[:\s]*([0-9,]+\.?\d{0,2})', r'AMOUNT[:\s]*([0-9,]+\.?\d{0,2})', r'(\d+\.\d{2})\s*$']
+TOTAL_LABELS = ['TOTAL', 'Total', 'Total:', 'AMOUNT DUE', 'Amount', 'Grand Total']
+
+
+##Old implementation, kept here only as the baseline
+def legacy_parse_item_price(item):
+    parts = item.strip().split()
+    try:
+        return float(parts[-1])
+    except:
+        return None
+
+
+def legacy_extract(text):
+    date = total = None
+    for pattern in DATA_PATTERNS:
+        m = re.search(pattern, text)
+        if m:
+            date = m.group(0)
+            break
+    for pattern in AMOUNT_PATTERNS:
+        m = re.search(pattern, text, re.MULTILINE)
+        if m:
+            total = float(m.group(1).replace(',', ''))
+            break
+    lines = text.splitlines()
+    merchant = next((line.strip() for line in lines if line.strip()), None)
+    items = [(line, legacy_parse_item_price(line)) for line in lines[1:]]
+    items = [(line, price) for line, price in items if price is not None and not re.search('total', line, re.I)]
+    return {'merchant': merchant, 'date': date, 'total': total, 'items': items}
+
+
+def synthetic_texts(n, seed=0):
+    """
+    OCR-like texts around bench_batch_ocr's synthetic receipts: address and
+    phone header, SUBTOTAL / TAX lines, the total label in varying case,
+    card and footer lines, and no date on one receipt in ten.
+    """
+    rng = np.random.default_rng(seed)
+    truths, texts = [], []
+    for _ in range(n):
+        truth, lines = synthetic_receipt(rng)
+        subtotal = truth['total']
+        tax = round(subtotal * 0.08, 2)
+        truth['total'] = round(subtotal + tax, 2)
+        label = TOTAL_LABELS[rng.integers(len(TOTAL_LABELS))]
+        date_line = [] if rng.random() < 0.1 else [lines[1]]
+        if not date_line:
+            truth['date'] = None
+        items = [line for line in lines[3:] if line and not line.startswith('TOTAL')]
+        text = ([lines[0], f'{rng.integers(1, 9999)} Main St, Springfield', f'Tel: ({rng.integers(200, 999)}) 555-0{rng.integers(100, 999)}']
+                + date_line + [''] + items
+                + ['', f'SUBTOTAL {subtotal:.2f}', f'TAX 8% {tax:.2f}', f'{label} {truth["total"]:.2f}',
+                   f'VISA **** {rng.integers(1000, 9999)}', 'THANK YOU FOR SHOPPING WITH US'])
+        truths.append(truth)
+        texts.append('\n'.join(text) + '\n')
+    return truths, texts
+
+
+def accuracy(truths, dates, totals, item_counts):
+    n = len(truths)
+    return {
+        'date': sum((d if isinstance(d, str) else None) == t['date'] for d, t in zip(dates, truths)) / n,
+        'total': sum(x is not None and abs(x - t['total']) < 0.005 for x, t in zip(totals, truths)) / n,
+        'items': sum(c == len(t['items']) for c, t in zip(item_counts, truths)) / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=20_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    args = parser.parse_args()
+
+    truths, texts = synthetic_texts(args.texts)
+    print(f"texts: {len(texts)}")
+    print(f"{'mode':<24}{'texts/sec':>12}{'date':>8}{'total':>8}{'items':>8}")
+
+    def row(name, seconds, acc):
+        print(f"{name:<24}{len(texts) / seconds:>12,.0f}{acc['date']:>8.1%}{acc['total']:>8.1%}{acc['items']:>8.1%}")
+
+    start = time.perf_counter()
+    legacy = [legacy_extract(t) for t in texts]
+    row('re.search loop', time.perf_counter() - start,
+        accuracy(truths, [r['date'] for r in legacy], [r['total'] for r in legacy], [len(r['items']) for r in legacy]))
+
+    extractor = FieldExtractor()
+    for workers in args.workers:
+        start = time.perf_counter()
+        receipts, items = extractor.extract_batch(texts, workers)
+        seconds = time.perf_counter() - start
+        row(f'extract_batch x{workers}', seconds, accuracy(truths, receipts['date'], receipts['total'], receipts['items']))
+
+    start = time.perf_counter()
+    results = [extractor.extract(t) for t in texts]
+    row('extract per text', time.perf_counter() - start,
+        accuracy(truths, [r['date'] and r['date'].value for r in results],
+                 [r['total'] and r['total'].value for r in results], [len(r['items']) for r in results]))
+
+    lines = [f'{name} {price:.2f}' for t in truths for name, price in t['items']]
+    start = time.perf_counter()
+    [legacy_parse_item_price(line) for line in lines]
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    parse_item_prices(lines)
+    vectorized = time.perf_counter() - start
+    print(f"\nline items: {len(lines):,}  parse_item_price loop {len(lines) / loop:,.0f}/s  "
+          f"parse_item_prices {len(lines) / vectorized:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
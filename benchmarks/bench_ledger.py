@@ -0,0 +1,94 @@
+"""
+Benchmark: ledger.Ledger bulk load and single inserts vs row-at-a-time SQLite
+
+Old path: what storing the merged rows in sqlite3 looks like without any
+care - one flat table with the names repeated in every row, the indexes in
+place from the start, the default rollback journal (synchronous=FULL) and
+one INSERT + commit per row. It is timed on --legacy-rows rows and
+extrapolated. New path: Ledger.load_merged (dictionary ids, executemany in
+one WAL transaction, indexes rebuilt once at the end) of the merged CSV,
+then single manual inserts (Ledger.add, one WAL commit each) and how soon
+they are visible to a customer / date-range query.
+
+Run from the repository root:
+    python benchmarks/bench_ledger.py --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import merge_data as md
+from bench_query_index import synthetic_merged
+from ledger import Ledger
+
+
+##Old implementation, kept here only as the baseline
+def legacy_insert(path, df):
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE transactions (customer_id INTEGER, transaction_date TEXT, merchant TEXT, amount REAL,
+                                   category TEXT, subcategory TEXT);
+        CREATE INDEX transactions_date ON transactions (transaction_date);
+        CREATE INDEX transactions_customer ON transactions (customer_id);
+    """)
+    for row in df.astype({'transaction_date': str}).itertuples(index=False):
+        db.execute('INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)', tuple(row))
+        db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=2_000, help='rows inserted the old way (extrapolated)')
+    parser.add_argument('--adds', type=int, default=2_000, help='single manual inserts')
+    args = parser.parse_args()
+
+    df = synthetic_merged(args.rows)
+    work = tempfile.mkdtemp(prefix='bench_ledger_')
+    try:
+        csv_file = os.path.join(work, 'merged_transactions.csv')
+        md.write_csv(df, csv_file)
+
+        start = time.perf_counter()
+        legacy_insert(os.path.join(work, 'legacy.db'), df.head(args.legacy_rows))
+        legacy_s = time.perf_counter() - start
+        legacy_add_us = 1e6 * legacy_s / args.legacy_rows
+
+        book = Ledger(os.path.join(work, 'ledger.db'))
+        start = time.perf_counter()
+        book.load_merged(csv_file)
+        load_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(0)
+        customers = df['customer_id'].to_numpy()[rng.integers(0, len(df), args.adds)]
+        add, visible = [], []
+        for customer in customers:
+            start = time.perf_counter()
+            book.add('Blue Bottle Coffee', 5.25, '2021-01-15 08:30:00', category='food', customer_id=int(customer))
+            add.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            assert book.count(customer_id=int(customer), start='2021-01-15', end='2021-01-15 23:59:59') >= 1
+            visible.append(time.perf_counter() - start)
+        db_mb = os.path.getsize(os.path.join(work, 'ledger.db')) / 1e6
+        book.close()
+
+        print(f'rows: {args.rows:,} ({db_mb:,.0f} MB ledger)')
+        print(f"{'':<34}{'old':>12}{'new':>12}")
+        print(f"{'load all rows (s)':<34}{legacy_add_us * args.rows / 1e6:>11.0f}*{load_s:>12.1f}")
+        print(f"{'single insert (us, median)':<34}{legacy_add_us:>12.0f}{1e6 * np.median(add):>12.0f}")
+        print(f"{'query that sees it (us, median)':<34}{'':>12}{1e6 * np.median(visible):>12.0f}")
+        print(f'* extrapolated from {args.legacy_rows:,} rows')
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
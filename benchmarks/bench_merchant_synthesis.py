@@ -0,0 +1,68 @@
+"""
+Benchmark: merchant + subcategory synthesis (merge_data.py)
+
+Compares the vectorized generate_merchant_subcategory against the old
+row-by-row iterrows/random.choice loop, on synthetic category columns.
+
+Run from the repository root:
+    python benchmarks/bench_merchant_synthesis.py
+    python benchmarks/bench_merchant_synthesis.py --rows 1000000 10000000 --legacy-rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import merge_data as md
+
+
+##Old implementation, kept here only as the baseline
+def legacy_generate(df):
+    merchant = [random.choice(md.merchant_options.get(row['category'], md.general_merchant)) for _, row in df.iterrows()]
+    df = df.assign(merchant=merchant)
+    subs = []
+    for _, row in df.iterrows():
+        if row['merchant'] in md.merchant_subcategory_options:
+            options = md.merchant_subcategory_options[row['merchant']]
+        else:
+            options = md.subcategory_options.get(row['category'], md.general_subcategory)
+        subs.append(random.choice(options))
+    return merchant, subs
+
+
+def synthetic_categories(n, seed=0):
+    ##Known categories plus a few without options (fall back to general lists)
+    names = np.array(list(md.merchant_options) + ['misc_net', 'gas_transport', 'personal_care'], dtype=object)
+    return names[np.random.default_rng(seed).integers(0, len(names), size=n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--legacy-rows', type=int, default=20_000, help='rows for the iterrows baseline (0 to skip)')
+    args = parser.parse_args()
+
+    print(f"{'impl':<12}{'rows':>12}{'seconds':>10}{'rows/sec':>16}")
+    for n in args.rows:
+        categories = synthetic_categories(n)
+        start = time.perf_counter()
+        md.generate_merchant_subcategory(categories, np.random.default_rng(md.SEED))
+        elapsed = time.perf_counter() - start
+        print(f"{'vectorized':<12}{n:>12,}{elapsed:>10.3f}{n / elapsed:>16,.0f}")
+
+    if args.legacy_rows:
+        df = pd.DataFrame({'category': synthetic_categories(args.legacy_rows)})
+        random.seed(md.SEED)
+        start = time.perf_counter()
+        legacy_generate(df)
+        elapsed = time.perf_counter() - start
+        print(f"{'iterrows':<12}{args.legacy_rows:>12,}{elapsed:>10.3f}{args.legacy_rows / elapsed:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
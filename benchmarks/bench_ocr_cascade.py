@@ -0,0 +1,104 @@
+"""
+Benchmark: early-exit OCR cascade vs run_single_img's fixed two passes
+
+Old path: run_single_img.run as it was - image_to_string on the raw image,
+then grayscale -> median blur -> Otsu and image_to_string again, so every
+receipt pays for two recognitions. New path: OcrCascade (gray, otsu,
+adaptive, deskew), stopping at the first level whose mean word confidence
+reaches --min-confidence and whose text has a total. Synthetic receipts
+(bench_batch_ocr) are recognized clean and with three degradations (heavy
+sensor noise, a shadow across the paper, a few degrees of skew), and each
+path's total is checked against the ground truth. Needs a tesseract binary.
+
+Run from the repository root:
+    python benchmarks/bench_ocr_cascade.py --receipts 40
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+import pytesseract
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_batch_ocr import write_receipts
+from batch_ocr import OcrEngine
+from receipt_fields import FieldExtractor
+from run_single_img import LEVELS, MIN_CONFIDENCE, OcrCascade
+
+
+##Old implementation, kept here only as the baseline
+def legacy_run(img):
+    text = pytesseract.image_to_string(img)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    img = cv2.medianBlur(img, 5)
+    img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    return pytesseract.image_to_string(img)
+
+
+def noisy(img, rng):
+    return np.clip(img + rng.normal(0, 40, img.shape), 0, 255).astype(np.uint8)
+
+
+def shadow(img, rng):
+    ##Light falling off from one side to 35% at the other
+    ramp = np.linspace(1.0, 0.35, img.shape[1])[None, :, None]
+    return (img * ramp).astype(np.uint8)
+
+
+def skewed(img, rng):
+    angle = rng.choice([-1, 1]) * rng.uniform(3, 8)
+    height, width = img.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(img, rotation, (width, height), borderValue=(255, 255, 255))
+
+
+DEGRADATIONS = {'clean': lambda img, rng: img, 'noisy': noisy, 'shadow': shadow, 'skewed': skewed}
+
+
+def total_ok(extractor, text, truth):
+    total = extractor.extract(text)['total']
+    return total is not None and abs(total.value - truth['total']) < 0.005
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--receipts', type=int, default=40, help='receipts per degradation')
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE)
+    parser.add_argument('--tesseract-cmd', default=None)
+    args = parser.parse_args()
+
+    if args.tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = args.tesseract_cmd
+    extractor = FieldExtractor()
+    rng = np.random.default_rng(0)
+
+    print(f"{'receipts':<10}{'old ms':>9}{'new ms':>9}{'OCR old':>9}{'new':>6}{'total old':>11}{'new':>6}  levels kept")
+    with tempfile.TemporaryDirectory() as tmp:
+        receipts = write_receipts(tmp, args.receipts)
+        for name, degrade in DEGRADATIONS.items():
+            images = [degrade(cv2.imread(r['path']), rng) for r in receipts]
+
+            start = time.perf_counter()
+            old = [legacy_run(img) for img in images]
+            old_ms = 1000 * (time.perf_counter() - start) / len(images)
+
+            cascade = OcrCascade(OcrEngine(tesseract_cmd=args.tesseract_cmd), args.min_confidence)
+            start = time.perf_counter()
+            new = [cascade.run(img).text for img in images]
+            new_ms = 1000 * (time.perf_counter() - start) / len(images)
+
+            calls = sum(s['tried'] for s in cascade.stats.values()) / len(images)
+            old_ok = np.mean([total_ok(extractor, text, r) for text, r in zip(old, receipts)])
+            new_ok = np.mean([total_ok(extractor, text, r) for text, r in zip(new, receipts)])
+            kept = Counter({level: s['kept'] for level, s in cascade.stats.items() if s['kept']})
+            print(f"{name:<10}{old_ms:>9.0f}{new_ms:>9.0f}{2:>9}{calls:>6.1f}{old_ok:>11.0%}{new_ok:>6.0%}  "
+                  + ' '.join(f'{level}:{kept[level]}' for level in LEVELS if kept[level]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: parallel card transform (clean_card_parallel) across worker counts
+
+Writes a synthetic card CSV in the credit_card_transactions.csv layout, runs
+clean_card_parallel with 1/2/4/8/16 workers and checks that every run writes
+byte-identical CSV output (each chunk draws from its own seeded generator,
+so the worker count cannot change the result).
+
+Run from the repository root:
+    python benchmarks/bench_parallel.py --rows 2000000 --workers 1 2 4 8 16
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import merge_data as md
+
+CARD_CATEGORIES = ['entertainment', 'food_dining', 'gas_transport', 'grocery_net', 'grocery_pos', 'health_fitness',
+                   'home', 'kids_pets', 'misc_net', 'misc_pos', 'personal_care', 'shopping_net', 'shopping_pos', 'travel']
+
+
+def synthetic_card_csv(path, n, seed=0):
+    """Raw card export: unnamed ID column, trans_date_trans_time, category, amt (plus unused columns)."""
+    rng = np.random.default_rng(seed)
+    stamps = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 2 * 365 * 86400, n), unit='s')
+    df = pd.DataFrame({
+        'trans_date_trans_time': stamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'cc_num': rng.integers(10**15, 10**16, n),
+        'category': np.array(CARD_CATEGORIES, dtype=object)[rng.integers(0, len(CARD_CATEGORIES), n)],
+        'amt': rng.gamma(2.0, 35.0, n).round(2),
+    })
+    df.to_csv(path)
+
+
+def digest(df):
+    buf = io.BytesIO()
+    md.write_csv(df, buf)
+    return hashlib.sha256(buf.getvalue()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--chunk-rows', type=int, default=md.CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'card.csv')
+        synthetic_card_csv(path, args.rows)
+
+        print(f'rows: {args.rows:,}  chunk rows: {args.chunk_rows:,}  cores: {os.cpu_count()}')
+        print(f"{'workers':>8}{'seconds':>10}{'rows/sec':>14}{'speedup':>10}  output sha256")
+        base = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            df1 = md.clean_card_parallel(path, md.SEED, workers, args.chunk_rows)
+            elapsed = time.perf_counter() - start
+            base = base or elapsed
+            print(f'{workers:>8}{elapsed:>10.3f}{args.rows / elapsed:>14,.0f}{base / elapsed:>9.2f}x  {digest(df1)[:16]}')
+
+
+if __name__ == "__main__":
+    main()
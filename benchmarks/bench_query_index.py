@@ -0,0 +1,149 @@
+"""
+Benchmark: transaction_index lookups vs loading the merged output and filtering
+
+Old path: every question about the merged transactions loads them first -
+pd.read_csv of merged_transactions.csv (dates parsed) or
+columnar_store.read_transactions of the Parquet copy (month partitions
+outside the date range skipped) - then filters the frame in pandas. New
+path: TransactionIndex over the memory-mapped .npy columns, a binary search
+for the date range and the customer / merchant / category posting lists.
+
+Queries are drawn at random (seeded): one customer, one week, one week of a
+category, one merchant in a quarter. The new path is timed per query (median
+of --queries, index opened once, as a long-running caller would) for
+select() (row numbers only), total() and query() (DataFrame); the old paths
+once per query kind, load included.
+
+Run from the repository root:
+    python benchmarks/bench_query_index.py --rows 10000000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import columnar_store as cs
+import merge_data as md
+from transaction_index import TransactionIndex, build_index
+
+
+def synthetic_merged(n, seed=0):
+    """Merged-like frame: typed dates in order, ~20 transactions per customer."""
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(md.merchant_options), dtype=object)[rng.integers(0, len(md.merchant_options), n)]
+    merchant, subcategory = md.generate_merchant_subcategory(categories, rng)
+    dates = np.datetime64('2019-01-01', 'ns') + np.sort(rng.integers(0, 2 * 365 * 86400, n)).astype('timedelta64[s]')
+    return pd.DataFrame({
+        'customer_id': rng.integers(0, max(n // 20, 1), n).astype(np.int32),
+        'transaction_date': dates,
+        'merchant': pd.Categorical(merchant),
+        'amount': np.round(rng.gamma(2.0, 35.0, n), 2),
+        'category': pd.Categorical(categories),
+        'subcategory': pd.Categorical(subcategory),
+    })[md.MERGED_COLUMNS]
+
+
+def make_queries(df, n, rng):
+    """n random filter dicts per query kind."""
+    week, quarter = pd.Timedelta(days=7) - pd.Timedelta(seconds=1), pd.Timedelta(days=91) - pd.Timedelta(seconds=1)
+    starts = lambda: [pd.Timestamp('2019-01-01') + pd.Timedelta(days=int(d)) for d in rng.integers(0, 2 * 365 - 91, n)]
+    customers = df['customer_id'].to_numpy()[rng.integers(0, len(df), n)]
+    categories = rng.choice(df['category'].cat.categories, n)
+    merchants = df['merchant'].to_numpy()[rng.integers(0, len(df), n)]
+    return {
+        'customer': [{'customer_id': int(c)} for c in customers],
+        'week': [{'start': s, 'end': s + week} for s in starts()],
+        'week + category': [{'start': s, 'end': s + week, 'category': c} for s, c in zip(starts(), categories)],
+        'quarter + merchant': [{'start': s, 'end': s + quarter, 'merchant': m} for s, m in zip(starts(), merchants)],
+    }
+
+
+##Old implementation, kept here only as the baseline
+def legacy_filter(df, start=None, end=None, customer_id=None, merchant=None, category=None):
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['transaction_date'] >= start
+    if end is not None:
+        mask &= df['transaction_date'] <= end
+    if customer_id is not None:
+        mask &= df['customer_id'] == customer_id
+    if merchant is not None:
+        mask &= df['merchant'] == merchant
+    if category is not None:
+        mask &= df['category'] == category
+    return df[mask]
+
+
+def legacy_csv(csv_file, **filters):
+    df = pd.read_csv(csv_file)
+    df['transaction_date'] = pd.to_datetime(df['transaction_date'], format=md.DATE_FORMAT)
+    return legacy_filter(df, **filters)
+
+
+def legacy_parquet(root, **filters):
+    df = cs.read_transactions(root, start=filters.get('start'), end=filters.get('end'))
+    return legacy_filter(df, **filters)
+
+
+def timed(fn, path, filters):
+    start = time.perf_counter()
+    fn(path, **filters)
+    return time.perf_counter() - start
+
+
+def median_us(fn, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(**q)
+        times.append(time.perf_counter() - start)
+    return 1e6 * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=1000, help='random queries per kind for the index')
+    parser.add_argument('--no-csv', action='store_true', help='skip the CSV baseline (slow to write at 10M rows)')
+    args = parser.parse_args()
+
+    df = synthetic_merged(args.rows)
+    work = tempfile.mkdtemp(prefix='bench_query_index_')
+    try:
+        csv_file = os.path.join(work, 'merged_transactions.csv')
+        if not args.no_csv:
+            md.write_csv(df, csv_file)
+        parquet = os.path.join(work, 'merged_transactions')
+        cs.write_dataset(df, parquet)
+        start = time.perf_counter()
+        root = build_index(df, os.path.join(work, 'merged_transactions.idx'))
+        build_s = time.perf_counter() - start
+        size_mb = sum(os.path.getsize(os.path.join(root, f)) for f in os.listdir(root)) / 1e6
+        print(f'rows: {args.rows:,}, index built in {build_s:.2f} s ({size_mb:,.0f} MB)')
+
+        start = time.perf_counter()
+        index = TransactionIndex(root)
+        print(f'open: {1e3 * (time.perf_counter() - start):.2f} ms')
+
+        queries = make_queries(df, args.queries, np.random.default_rng(1))
+        print(f"{'query':<20}{'rows':>9}{'csv ms':>10}{'parquet ms':>12}{'select us':>11}{'total us':>10}{'query us':>10}")
+        for name, qs in queries.items():
+            rows = int(np.median([index.count(**q) for q in qs[:50]]))
+            expected = legacy_filter(df, **qs[0])
+            assert len(index.query(**qs[0])) == len(expected)
+            csv_ms = '' if args.no_csv else f'{1e3 * timed(legacy_csv, csv_file, qs[0]):.0f}'
+            pq_ms = 1e3 * timed(legacy_parquet, parquet, qs[0])
+            print(f"{name:<20}{rows:>9,}{csv_ms:>10}{pq_ms:>12.0f}{median_us(index.select, qs):>11.1f}"
+                  f"{median_us(index.total, qs):>10.1f}{median_us(index.query, qs):>10.1f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
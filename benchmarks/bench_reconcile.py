@@ -0,0 +1,145 @@
+"""
+Benchmark: bucket-index receipt reconciliation vs scanning the card data per receipt
+
+Old path: for every receipt, compare it with every card transaction (amount
+within tolerance and date within the window over the full columns), then
+difflib.SequenceMatcher on the lower-cased merchant names of the survivors -
+a join that grows with receipts x transactions. It is timed on
+--legacy-receipts receipts and extrapolated. New path: reconcile.Reconciler
+(sorted (amount bucket, day) keys, candidates found with searchsorted, one
+similarity per distinct name pair).
+
+Card transactions look like the card export ('fraud_' + surname-style
+merchant names, many sharing a surname). Receipts are drawn from them and
+OCR'd: upper case, character confusions (0/O, 1/l, 5/S, rn/m, e/c), a store
+number or dropped suffix, date as dd/mm/yyyy, some a cent or a day off.
+--fake share of receipts have no card transaction. Accuracy is checked
+against that ground truth.
+
+Run from the repository root:
+    python benchmarks/bench_reconcile.py --rows 10000000 --receipts 100000
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reconcile import AMOUNT_TOL, DAYS, MIN_SIMILARITY, Reconciler, summarize, to_days
+
+SURNAMES = ['Kub', 'Mann', 'Rippin', 'Heller', 'Gutmann', 'Zieme', 'Lind', 'Buckridge', 'Kutch', 'Hermann', 'Keeling',
+            'Schultz', 'Bins', 'Koepp', 'Kris', 'Rau', 'Towne', 'Lesch', 'Dooley', 'Hane', 'Bailey', 'Feil', 'Lemke',
+            'Stokes', 'Kihn', 'Abernathy', 'Mraz', 'Boyer', 'Haley', 'Kozey', 'Gleason', 'Conroy', 'Reichel', 'Nader',
+            'Quitzon', 'Wiza', 'Kling', 'Cormier', 'Ratke', 'Bednar']
+
+OCR_CONFUSIONS = [('o', '0'), ('l', '1'), ('s', '5'), ('b', '8'), ('m', 'rn'), ('e', 'c'), ('i', '1')]
+
+
+def merchant_names(n, rng):
+    """Card export style names: 'Kub, Mann and Bins', 'Heller-Lind', 'Zieme Inc', ..."""
+    names = set()
+    while len(names) < n:
+        a, b, c = rng.choice(SURNAMES, 3, replace=False)
+        names.add([f'{a}, {b} and {c}', f'{a}-{b}', f'{a} Inc', f'{a} and Sons', f'{a} LLC', f'{a}, {b} and {c}'][rng.integers(6)])
+    return sorted(names)
+
+
+def synthetic_card(n, rng, n_merchants=700):
+    names = np.array(['fraud_' + name for name in merchant_names(n_merchants, rng)], dtype=object)
+    dates = np.datetime64('2019-01-01T00:00:00', 'ns') + np.sort(rng.integers(0, 2 * 365 * 86400, n)).astype('timedelta64[s]')
+    return pd.DataFrame({
+        'date': dates,
+        'merchant': pd.Categorical.from_codes(rng.integers(0, len(names), n), categories=names),
+        'amount': np.round(rng.gamma(1.5, 45.0, n) + 1, 2),
+    })
+
+
+def ocr_noise(name, rng):
+    name = name[len('fraud_'):].upper() if rng.random() < 0.7 else name[len('fraud_'):]
+    for _ in range(rng.integers(0, 3)):
+        a, b = OCR_CONFUSIONS[rng.integers(len(OCR_CONFUSIONS))]
+        name = name.replace(a.upper(), b.upper(), 1).replace(a, b, 1)
+    if rng.random() < 0.3:
+        name += f' #{rng.integers(100, 9999)}'
+    if rng.random() < 0.2:
+        name = name.replace(' Inc', '').replace(' INC', '')
+    return name
+
+
+def synthetic_receipts(card, n, rng, fake=0.15):
+    """Receipts drawn from card rows (truth = row) plus fakes (truth = -1)."""
+    rows = rng.choice(len(card), n, replace=False)
+    is_fake = rng.random(n) < fake
+    merchants = card['merchant'].to_numpy()[rows]
+    amounts = card['amount'].to_numpy()[rows] + np.where(rng.random(n) < 0.1, rng.choice([-0.01, 0.01], n), 0)
+    dates = card['date'].to_numpy()[rows] + np.where(rng.random(n) < 0.1, rng.choice([-1, 1], n), 0).astype('timedelta64[D]')
+    ##Fakes: a real merchant name, but an amount / day no card transaction of it has
+    amounts = np.where(is_fake, np.round(rng.uniform(1000, 5000, n), 2), amounts)
+    return pd.DataFrame({
+        'merchant': [ocr_noise(m, rng) for m in merchants],
+        'date': pd.Series(dates).dt.strftime('%d/%m/%Y'),
+        'total': np.round(amounts, 2),
+        'truth': np.where(is_fake, -1, rows),
+    })
+
+
+##Old implementation, kept here only as the baseline
+def legacy_match(card, receipts, amount_tol=AMOUNT_TOL, days=DAYS, min_similarity=MIN_SIMILARITY):
+    card_days = to_days(card['date'].to_numpy())
+    amounts = card['amount'].to_numpy()
+    names = card['merchant'].astype(object).str.lower().str.replace('fraud_', '').to_numpy()
+    receipt_days = to_days(receipts['date'])
+    out = []
+    for i, receipt in enumerate(receipts.itertuples()):
+        near = np.flatnonzero((np.abs(amounts - receipt.total) <= amount_tol + 1e-9)
+                              & (np.abs(card_days - receipt_days[i]) <= days))
+        scored = [(difflib.SequenceMatcher(None, receipt.merchant.lower(), names[j]).ratio(), j) for j in near]
+        best = max(scored, default=(0.0, -1))
+        out.append(best[1] if best[0] >= min_similarity else -1)
+    return np.array(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='card transactions')
+    parser.add_argument('--receipts', type=int, default=100_000)
+    parser.add_argument('--legacy-receipts', type=int, default=50, help='receipts matched the old way (extrapolated)')
+    parser.add_argument('--fake', type=float, default=0.15, help='share of receipts without a card transaction')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    card = synthetic_card(args.rows, rng)
+    receipts = synthetic_receipts(card, args.receipts, rng, args.fake)
+
+    start = time.perf_counter()
+    legacy = legacy_match(card, receipts.head(args.legacy_receipts))
+    legacy_s = (time.perf_counter() - start) * args.receipts / args.legacy_receipts
+    legacy_ok = np.mean(legacy == receipts['truth'].to_numpy()[:args.legacy_receipts])
+
+    start = time.perf_counter()
+    reconciler = Reconciler(card)
+    index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    result = reconciler.match(receipts)
+    match_s = time.perf_counter() - start
+
+    truth = receipts['truth'].to_numpy()
+    matched = (result['status'] == 'matched').to_numpy()
+    correct = matched & (result['transaction'].to_numpy() == truth)
+    print(f'{args.receipts:,} receipts vs {args.rows:,} card transactions')
+    print(summarize(result))
+    print(f"{'':<28}{'seconds':>10}{'correct':>10}")
+    print(f"{'old (scan + difflib)':<28}{legacy_s:>9.0f}*{legacy_ok:>10.1%}")
+    print(f"{'new index build':<28}{index_s:>10.2f}")
+    print(f"{'new match':<28}{match_s:>10.2f}{np.mean(np.where(matched, correct, truth == -1)):>10.1%}")
+    print(f'matched: {matched.sum():,}, of them wrong: {(matched & ~correct).sum():,}; '
+          f'genuine receipts not matched: {((truth >= 0) & ~matched).sum():,}')
+    print(f'* extrapolated from {args.legacy_receipts} receipts; correct = same transaction, or none for a fake')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark suite: every stage of the merge, profile and receipt paths at scale
+
+For each --rows size, synthetic card and household exports
+(synthetic_data.py, seeded, reused across runs from --data-dir) go through
+merge_data.main (its own stage trace, stage_trace.py, down to the chunk
+reads, merchant synthesis and date parsing in the pool workers), then
+read_info.profile over the merged CSV and Parquet copy. A set of rendered
+receipts goes through detect_text_regions and the batch OCR path (skipped
+without a tesseract binary). Every stage records wall and CPU seconds,
+rows/sec and its peak RSS, and is appended as one JSON line per stage to
+--results with the commit it ran on, so runs on different commits line up:
+
+    python benchmarks/bench_suite.py --compare     # last run vs the previous commit in the results file
+
+Run from the repository root:
+    python benchmarks/bench_suite.py --rows 10000 1000000 10000000 --receipts 50
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import synthetic_data
+from stage_trace import Tracer
+
+RESULTS = 'bench_results.jsonl'
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'spending_track_bench')
+
+
+def git_commit():
+    """Short hash of HEAD ('+' when the tree has local changes), 'unknown' outside git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('+' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Suite:
+    """Times stages and appends one record per stage to the results file."""
+    def __init__(self, results_file, workers):
+        self.results_file = results_file
+        self.run = {'commit': git_commit(), 'started': datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(), 'machine': platform.machine(),
+                    'cpus': os.cpu_count(), 'workers': workers}
+        self.records = []
+
+    def stage(self, size, name, rows, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) as stage `name` of `size` rows; returns its result."""
+        trace = Tracer(name)
+        with trace.stage(name, rows_in=rows):
+            out = fn(*args, **kwargs)
+        self.add_trace(size, trace)
+        return out
+
+    def add_trace(self, size, trace, prefix=None):
+        """One record per stage of a stage_trace.Tracer (named prefix.stage)."""
+        for stage in trace.records():
+            name = f"{prefix}.{stage['name']}" if prefix else stage['name']
+            rows = stage['rows_out'] if stage['rows_out'] is not None else stage['rows_in']
+            seconds = stage['seconds']
+            record = {**self.run, 'size': size, 'stage': name, 'rows': rows, 'calls': stage['calls'],
+                      'seconds': round(seconds, 4), 'cpu_seconds': round(stage['cpu_seconds'], 4),
+                      'rows_per_sec': round(rows / seconds) if rows and seconds else None,
+                      'peak_rss_mb': stage['peak_rss_mb'], 'peak_scope': trace.peak_scope}
+            self.records.append(record)
+            with open(self.results_file, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+            rate = f"{record['rows_per_sec']:>14,}" if record['rows_per_sec'] else f"{'':>14}"
+            peak = f"{record['peak_rss_mb']:>10.0f}" if record['peak_rss_mb'] is not None else f"{'':>10}"
+            print(f"{size:>12,}  {name:<40}{seconds:>10.3f}{rate}{peak}")
+
+
+#------------------------------------------------------- STAGES -----------------------------------------------
+def bench_merge(suite, rows, card_file, household_file, work, seed, workers):
+    """merge_data.main into work/; returns the merged CSV and Parquet paths and the merged row count."""
+    import merge_data as md
+    out_dir = os.path.join(work, 'after_merge')
+    with open(os.devnull, 'w') as quiet:
+        stdout, sys.stdout = sys.stdout, quiet
+        try:
+            trace = md.main(card_file, household_file, os.path.join(work, 'data_info'), out_dir, seed, workers)
+        finally:
+            sys.stdout = stdout
+    suite.add_trace(rows, trace, prefix='merge')
+    merged_rows = next(s['rows_out'] for s in trace.records() if s['name'] == 'merge_sort')
+    return os.path.join(out_dir, 'merged_transactions.csv'), os.path.join(out_dir, 'merged_transactions'), merged_rows
+
+
+def bench_profile(suite, rows, csv_file, parquet, merged_rows):
+    import read_info
+    suite.stage(rows, 'profile.csv', merged_rows, read_info.profile, csv_file)
+    suite.stage(rows, 'profile.parquet', merged_rows, read_info.profile, parquet)
+
+
+def tesseract_available(tesseract_cmd=None):
+    import pytesseract
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return False
+    return True
+
+
+def bench_receipts(suite, receipts, workers, tesseract_cmd=None):
+    import cv2
+    from Text_Detection.text_region import DETECTOR, detect_text_regions
+
+    paths = [r['path'] for r in receipts]
+    suite.stage(len(paths), 'detect_text_regions', len(paths),
+                lambda: [detect_text_regions(cv2.imread(p), visualize=False, detector=DETECTOR) for p in paths])
+    if not tesseract_available(tesseract_cmd):
+        print(f"{len(paths):>12,}  {'ocr_batch':<40}  skipped (no tesseract binary)")
+        return
+    import batch_ocr
+    suite.stage(len(paths), 'ocr_batch', len(paths), lambda: list(batch_ocr.ocr_batch(paths, workers, tesseract_cmd=tesseract_cmd)))
+
+
+#------------------------------------------------------- COMPARE -----------------------------------------------
+def compare(results_file, base=None):
+    """
+    Latest run's stages against the same (size, stage) on another commit.
+
+    Args:
+        base (str): Commit to compare with (default: the most recent other commit in the file).
+    """
+    with open(results_file) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        print('no results yet')
+        return
+    head = records[-1]['commit']
+    base = base or next((r['commit'] for r in reversed(records) if r['commit'] != head), None)
+    if base is None:
+        print(f'only commit {head} in {results_file}')
+        return
+    latest = lambda commit: {(r['size'], r['stage']): r for r in records if r['commit'] == commit}
+    new, old = latest(head), latest(base)
+    print(f"{base} -> {head}")
+    print(f"{'size':>12}  {'stage':<40}{'old s':>10}{'new s':>10}{'change':>9}{'old MB':>9}{'new MB':>9}")
+    for key in sorted(new.keys() & old.keys(), key=lambda k: (k[0], list(new).index(k))):
+        o, n = old[key], new[key]
+        change = n['seconds'] / o['seconds'] - 1 if o['seconds'] else 0.0
+        print(f"{key[0]:>12,}  {key[1]:<40}{o['seconds']:>10.3f}{n['seconds']:>10.3f}{change:>+9.0%}"
+              f"{o['peak_rss_mb']:>9.0f}{n['peak_rss_mb']:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000], help='card (and household) rows')
+    parser.add_argument('--household-rows', type=int, default=None, help='household rows (default: same as --rows)')
+    parser.add_argument('--receipts', type=int, default=20, help='rendered receipts (0 to skip); their size column is the receipt count')
+    parser.add_argument('--workers', type=int, default=None, help='pool size of the card transform and OCR')
+    parser.add_argument('--seed', type=int, default=synthetic_data.SEED)
+    parser.add_argument('--data-dir', default=DATA_DIR, help='generated inputs, kept for the next run')
+    parser.add_argument('--results', default=RESULTS, help='JSON lines file the stage records are appended to')
+    parser.add_argument('--tesseract-cmd', default=None)
+    parser.add_argument('--compare', nargs='?', const='', default=None, metavar='COMMIT',
+                        help='only compare the latest run in --results with COMMIT (default: the previous commit)')
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare(args.results, args.compare or None)
+        return
+
+    suite = Suite(args.results, args.workers)
+    print(f"commit {suite.run['commit']}, results -> {args.results}")
+    print(f"{'rows':>12}  {'stage':<40}{'seconds':>10}{'rows/sec':>14}{'peak MB':>10}")
+    for rows in args.rows:
+        start = time.perf_counter()
+        card_file, household_file = synthetic_data.transactions(args.data_dir, rows, args.household_rows, args.seed)
+        print(f"{rows:>12,}  {'(inputs ready)':<40}{time.perf_counter() - start:>10.3f}")
+        work = tempfile.mkdtemp(prefix='bench_suite_')
+        try:
+            csv_file, parquet, merged_rows = bench_merge(suite, rows, card_file, household_file, work, args.seed, args.workers)
+            bench_profile(suite, rows, csv_file, parquet, merged_rows)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    if args.receipts:
+        bench_receipts(suite, synthetic_data.receipts(args.data_dir, args.receipts, args.seed), args.workers,
+                       args.tesseract_cmd)
+
+
+if __name__ == "__main__":
+    main()
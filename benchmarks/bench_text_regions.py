@@ -0,0 +1,112 @@
+"""
+Benchmark: MSER text-region detection
+
+Old path: detect_text_regions as it was (a new MSER object per call, a
+Python loop of convexHull, one drawContours per hull, the visualization
+always drawn). New path: one RegionDetector reused for the whole batch,
+detection and the hull mask on a pyramid level of at most MAX_SIDE, and
+no visualization. Photos are synthetic receipts (bench_batch_ocr) scaled up
+to fill part of a textured frame; 'text kept' is the share of the receipt's
+ink pixels inside each path's text mask.
+
+Run from the repository root:
+    python benchmarks/bench_text_regions.py --sizes 1 4 12 --images 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_batch_ocr import write_receipts
+from Text_Detection.text_region import RegionDetector, detect_text_regions
+
+
+##Old implementation, kept here only as the baseline
+def legacy_detect_text_regions(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    mser = cv2.MSER_create()
+    mser.setDelta(3)
+    mser.setMinArea(20)
+    mser.setMaxArea(20000)
+    mser.setMaxVariation(0.4)
+    regions, _ = mser.detectRegions(gray)
+    hulls = []
+    for p in regions:
+        hulls.append(cv2.convexHull(p.reshape(-1, 1, 2)))
+    vis = img.copy()
+    for i in hulls:
+        cv2.polylines(vis, [i], isClosed=True, color=(0, 255, 0), thickness=2)
+    mask = np.zeros(gray.shape[:2], dtype=np.uint8)
+    for i in hulls:
+        cv2.drawContours(mask, [i], contourIdx=-1, color=255, thickness=-1)
+    mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)), iterations=1)
+    return vis, cv2.bitwise_and(img, img, mask=mask)
+
+
+def synthetic_photos(tmp, n, megapixels, seed=0):
+    """
+    n 4:3 photos of about `megapixels` MP, each a receipt covering ~60% of the
+    frame height. Returns (photo, boolean mask of the receipt's ink) pairs.
+    """
+    height = int(np.sqrt(megapixels * 1e6 * 4 / 3))
+    width = int(height * 3 / 4)
+    rng = np.random.default_rng(seed)
+    photos = []
+    for receipt in write_receipts(tmp, n, seed):
+        img = cv2.imread(receipt['path'])
+        scale = 0.6 * height / img.shape[0]
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)[:, :width]
+        frame = cv2.GaussianBlur(rng.integers(60, 120, (height, width, 3)).astype(np.uint8), (15, 15), 0)
+        y, x = (height - img.shape[0]) // 2, max((width - img.shape[1]) // 2, 0)
+        frame[y:y + img.shape[0], x:x + img.shape[1]] = img
+        ink = np.zeros((height, width), dtype=bool)
+        ink[y:y + img.shape[0], x:x + img.shape[1]] = img.max(axis=2) < 100
+        photos.append((frame, ink))
+    return photos
+
+
+def text_kept(text_only, ink):
+    return (text_only.any(axis=2) & ink).sum() / ink.sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 12], help='photo sizes in megapixels')
+    parser.add_argument('--images', type=int, default=3, help='photos per size')
+    args = parser.parse_args()
+
+    print(f"{'size':>8}{'old ms':>10}{'new ms':>10}{'speedup':>9}{'full-res ms':>13}{'text kept old':>15}{'new':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        detector = RegionDetector()
+        full_res = RegionDetector(max_side=None)
+        for mp in args.sizes:
+            photos = synthetic_photos(tmp, args.images, mp)
+            timings = {'old': [], 'new': [], 'full': []}
+            kept = {'old': [], 'new': []}
+            for img, ink in photos:
+                start = time.perf_counter()
+                _, old = legacy_detect_text_regions(img)
+                timings['old'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                _, new = detect_text_regions(img, visualize=False, detector=detector)
+                timings['new'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                detect_text_regions(img, visualize=False, detector=full_res)
+                timings['full'].append(time.perf_counter() - start)
+                kept['old'].append(text_kept(old, ink))
+                kept['new'].append(text_kept(new, ink))
+
+            old_ms, new_ms, full_ms = (1000 * np.mean(timings[k]) for k in ('old', 'new', 'full'))
+            print(f"{mp:>6.0f}MP{old_ms:>10.0f}{new_ms:>10.0f}{old_ms / new_ms:>8.1f}x{full_ms:>13.0f}"
+                  f"{np.mean(kept['old']):>15.0%}{np.mean(kept['new']):>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: string-dated object frames vs the typed transaction schema
+
+Old path: dates formatted with strftime before concat, text columns as
+object, sort on the '%m/%d/%Y %H:%M:%S' strings (lexicographic, so not even
+chronological across years). New path: TRANSACTION_DTYPES from load through
+sort (datetime64 dates, categorical text, int32 IDs), formatting only in
+write_csv.
+
+Run from the repository root:
+    python benchmarks/bench_typed_schema.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import merge_data as md
+
+
+def synthetic_clean(n, start_id, seed):
+    """A cleaned frame in the typed schema, as clean_card/clean_household return it."""
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(md.merchant_options), dtype=object)[rng.integers(0, len(md.merchant_options), n)]
+    merchant, subcategory = md.generate_merchant_subcategory(categories, rng)
+    df = pd.DataFrame({
+        'customer_id': np.arange(start_id, start_id + n),
+        'transaction_date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 10 * 365 * 86400, n), unit='s'),
+        'merchant': merchant,
+        'amount': rng.gamma(2.0, 35.0, n),
+        'category': categories,
+        'subcategory': subcategory,
+    })
+    return md.to_schema(df)
+
+
+def legacy(df):
+    """Old in-memory layout: object text, int64 IDs, dates already strftime'd."""
+    out = df.astype({'customer_id': 'int64', 'merchant': object, 'category': object, 'subcategory': object})
+    out['transaction_date'] = out['transaction_date'].dt.strftime(md.DATE_FORMAT)
+    return out
+
+
+def legacy_merge(df1, df2):
+    merged = pd.concat([df1, df2], ignore_index=True)
+    merged.sort_values(by='transaction_date', inplace=True)
+    merged.reset_index(drop=True, inplace=True)
+    return merged[md.MERGED_COLUMNS]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - start, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    n2 = max(1, args.rows // 400)
+    typed1 = synthetic_clean(args.rows, 0, seed=1)
+    typed2 = synthetic_clean(n2, args.rows, seed=2)
+
+    t_fmt, (old1, old2) = timed(lambda: (legacy(typed1), legacy(typed2)))
+    t_old, old_merged = timed(lambda: legacy_merge(old1, old2))
+    t_new, new_merged = timed(lambda: md.merge_frames(typed1, typed2))
+
+    old_mb = old_merged.memory_usage(deep=True).sum() / 1e6
+    new_mb = new_merged.memory_usage(deep=True).sum() / 1e6
+    chronological = pd.to_datetime(old_merged['transaction_date'], format=md.DATE_FORMAT).is_monotonic_increasing
+
+    print(f'rows: {args.rows + n2:,}')
+    print(f"{'':<26}{'strings':>12}{'typed':>12}")
+    print(f"{'merged frame (MB)':<26}{old_mb:>12.1f}{new_mb:>12.1f}")
+    print(f"{'strftime before merge (s)':<26}{t_fmt:>12.3f}{0:>12.3f}")
+    print(f"{'concat + sort (s)':<26}{t_old:>12.3f}{t_new:>12.3f}")
+    print(f"{'chronological order':<26}{str(chronological):>12}{str(new_merged['transaction_date'].is_monotonic_increasing):>12}")
+
+
+if __name__ == "__main__":
+    main()
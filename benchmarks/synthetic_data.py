@@ -0,0 +1,197 @@
+"""
+Seeded synthetic inputs for the benchmarks
+
+The repository only ships two-row stubs in dataset/before_merge (the card
+export is a git-lfs pointer), so the benchmarks generate their own data with
+the same layout as the real exports:
+
+# - credit_card_transactions.csv: unnamed row-number column, ISO
+#   trans_date_trans_time in chronological order (0.1% missing), cc_num,
+#   merchant, category, amt and the other columns of the card export. Categories mix
+#   merge_data.merchant_options keys with card-only ones (no options, so the
+#   general merchants are used); merchants come from merchant_options.
+# - Daily Household Transactions.csv: day-first dates, 10% without time of
+#   day, title-cased categories / subcategories from subcategory_options,
+#   amounts in INR.
+# - receipts: bench_batch_ocr.write_receipts images (ground truth in receipts.json).
+#
+# Everything is written in GENERATE_ROWS chunks, each from its own child of
+# SeedSequence(seed), so a 10M-row file never sits in memory and the same
+# (rows, seed) always gives the same bytes. Finished sets are reused: files
+# are written under a temporary name and renamed when complete.
+
+Run from the repository root:
+    python benchmarks/synthetic_data.py --rows 10000 1000000 10000000 --receipts 50 --out-dir bench_data
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import merge_data as md
+
+SEED = 0
+
+##Rows generated (and written) at a time
+GENERATE_ROWS = 1_000_000
+
+##Card categories of the real export that have no merchant_options entry
+CARD_ONLY_CATEGORIES = ['gas_transport', 'grocery_pos', 'misc_net', 'misc_pos', 'personal_care',
+                        'shopping_net', 'shopping_pos', 'home', 'kids_pets', 'health_fitness', 'food_dining']
+CARD_CATEGORIES = list(md.merchant_options) + CARD_ONLY_CATEGORIES
+CARD_START, CARD_END = np.datetime64('2019-01-01T00:00:00'), np.datetime64('2020-12-31T23:59:59')
+
+FIRST_NAMES = ['Jennifer', 'Stephanie', 'Edward', 'Jeremy', 'Tyler', 'Jessica', 'Daniel', 'Mary', 'Linh', 'Victoria']
+LAST_NAMES = ['Banks', 'Gill', 'Sanchez', 'White', 'Garcia', 'Nguyen', 'Phung', 'Smith', 'Johnson', 'Lee']
+STATES = ['CA', 'IL', 'NY', 'TX', 'WA', 'FL', 'PA', 'OH', 'MI', 'NC']
+MODES = ['Cash', 'Saving Bank account 1', 'Credit Card', 'Debit Card', 'UPI']
+
+CARD_FILE = 'credit_card_transactions.csv'
+HOUSEHOLD_FILE = 'Daily Household Transactions.csv'
+
+
+def chunk_rngs(seed, rows, chunk_rows=GENERATE_ROWS):
+    """(generator, first row, rows) per chunk; chunk i always draws from child i of SeedSequence(seed)."""
+    for i, start in enumerate(range(0, rows, chunk_rows)):
+        yield np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,))), start, min(chunk_rows, rows - start)
+
+
+def pick(rng, values, n):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def card_chunk(rng, start, n, rows):
+    """Rows start..start + n of a rows-long card export (its time range is split evenly across rows)."""
+    span = (CARD_END - CARD_START).astype(np.int64)
+    lo, hi = span * start // rows, span * (start + n) // rows
+    dates = CARD_START + np.sort(rng.integers(lo, max(hi, lo + 1), n)).astype('timedelta64[s]')
+    dates = pd.Series(dates.astype('datetime64[ns]')).mask(rng.random(n) < 0.001)
+
+    categories = pick(rng, CARD_CATEGORIES, n)
+    merchants = np.asarray([m for ms in md.merchant_options.values() for m in ms], dtype=object)
+    return pd.DataFrame({
+        'trans_date_trans_time': dates,
+        'cc_num': rng.integers(10**15, 10**16, n),
+        'merchant': 'fraud_' + pd.Series(pick(rng, merchants, n)),
+        'category': categories,
+        'amt': np.round(rng.gamma(1.5, 45.0, n) + 1, 2),
+        'first': pick(rng, FIRST_NAMES, n),
+        'last': pick(rng, LAST_NAMES, n),
+        'state': pick(rng, STATES, n),
+        'zip': rng.integers(10000, 99999, n),
+        'trans_num': pd.Series(rng.integers(0, 2**63, n)).map('{:032x}'.format),
+        'unix_time': dates.astype('int64') // 10**9,
+        'is_fraud': (rng.random(n) < 0.005).astype(np.int8),
+    }, index=pd.RangeIndex(start, start + n))
+
+
+def household_chunk(rng, start, n, rows):
+    """Rows of the household export: day-first dates, title-cased vocabulary, INR amounts."""
+    seconds = rng.integers(0, (np.datetime64('2018-09-20') - np.datetime64('2015-01-01')).astype('timedelta64[s]').astype(np.int64), n)
+    dates = pd.Series(np.datetime64('2015-01-01T00:00:00') + seconds.astype('timedelta64[s]'))
+    text = dates.dt.strftime('%d/%m/%Y %H:%M:%S')
+    date_only = rng.random(n) < 0.1
+    text[date_only] = dates[date_only].dt.strftime('%d/%m/%Y')
+
+    ##[category, option] table of subcategories, padded by repeating each list
+    names = list(md.subcategory_options)
+    width = max(len(v) for v in md.subcategory_options.values())
+    table = np.array([[v[j % len(v)] for j in range(width)] for v in md.subcategory_options.values()], dtype=object)
+    lengths = np.array([len(v) for v in md.subcategory_options.values()])
+    category = rng.integers(0, len(names), n)
+    option = rng.integers(0, lengths[category])
+    title = lambda values: pd.Series(values, dtype=object).str.replace('_', ' ').str.capitalize()
+    return pd.DataFrame({
+        'Date': text,
+        'Mode': pick(rng, MODES, n),
+        'Category': title(np.asarray(names, dtype=object)[category]),
+        'Subcategory': title(table[category, option]),
+        'Note': pick(rng, [m for ms in md.merchant_options.values() for m in ms], n),
+        'Amount': np.round(rng.gamma(1.2, 400.0, n), 0),
+        'Income/Expense': np.where(rng.random(n) < 0.95, 'Expense', 'Income'),
+        'Currency': 'INR',
+    })
+
+
+def write_chunks(path, chunks, index, date_format=None):
+    """Write generated chunks to path (through path + '.part', so a finished file is always complete)."""
+    part = path + '.part'
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(part, mode='w' if i == 0 else 'a', header=i == 0, index=index, date_format=date_format)
+    os.replace(part, path)
+    return path
+
+
+def write_card(path, rows, seed=SEED):
+    chunks = (card_chunk(rng, start, n, rows) for rng, start, n in chunk_rngs(seed, rows))
+    return write_chunks(path, chunks, index=True, date_format='%Y-%m-%d %H:%M:%S')
+
+
+def write_household(path, rows, seed=SEED):
+    ##Its own seed stream, so the household file does not change with the card row count
+    chunks = (household_chunk(rng, start, n, rows) for rng, start, n in chunk_rngs((seed, 1), rows))
+    return write_chunks(path, chunks, index=False)
+
+
+def transactions(out_dir, rows, household_rows=None, seed=SEED):
+    """
+    Card and household CSVs of rows (household_rows) rows under out_dir/<rows>_<household_rows>_<seed>,
+    generated on first use.
+
+    Returns:
+        (card csv path, household csv path)
+    """
+    household_rows = rows if household_rows is None else household_rows
+    folder = os.path.join(out_dir, f'{rows}_{household_rows}_{seed}')
+    os.makedirs(folder, exist_ok=True)
+    card, household = os.path.join(folder, CARD_FILE), os.path.join(folder, HOUSEHOLD_FILE)
+    if not os.path.exists(card):
+        write_card(card, rows, seed)
+    if not os.path.exists(household):
+        write_household(household, household_rows, seed)
+    return card, household
+
+
+def receipts(out_dir, n, seed=SEED, photo=None):
+    """
+    n rendered receipts (bench_batch_ocr.write_receipts) under out_dir, generated on first use.
+
+    Returns:
+        list of dicts (path, merchant, date, items, total) - the ground truth.
+    """
+    from bench_batch_ocr import write_receipts
+    folder = os.path.join(out_dir, f'receipts_{n}_{seed}' + (f'_{photo[0]}x{photo[1]}' if photo else ''))
+    truth_file = os.path.join(folder, 'receipts.json')
+    if os.path.exists(truth_file):
+        with open(truth_file) as f:
+            return json.load(f)
+    truth = write_receipts(folder, n, seed, photo=photo)
+    with open(truth_file + '.part', 'w') as f:
+        json.dump(truth, f)
+    os.replace(truth_file + '.part', truth_file)
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000])
+    parser.add_argument('--household-rows', type=int, default=None, help='household rows (default: same as --rows)')
+    parser.add_argument('--receipts', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out-dir', default='bench_data')
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        for path in transactions(args.out_dir, rows, args.household_rows, args.seed):
+            print(f'{path} ({os.path.getsize(path) / 1e6:,.1f} MB)')
+    if args.receipts:
+        truth = receipts(args.out_dir, args.receipts, args.seed)
+        print(f'{len(truth)} receipts in {os.path.dirname(truth[0]["path"])}')
+
+
+if __name__ == "__main__":
+    main()
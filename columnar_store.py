@@ -0,0 +1,157 @@
+"""
+==============================================================================
+ Columnar (Parquet) Store for Merged Transactions
+==============================================================================
+Writes the merged transactions as a Parquet dataset partitioned by month
+(after_merge/merged_transactions/month=YYYY-MM/*.parquet) with a compact schema:
+
+    customer_id       int32
+    transaction_date  timestamp[ms]
+    merchant          dictionary<string>
+    amount            float32
+    category          dictionary<string>
+    subcategory       dictionary<string>
+
+Readers ask only for the columns and months they need, so a summary of one
+column over one quarter never touches the rest of the data.
+
+Requires pyarrow (pip install pyarrow).
+"""
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from merge_data import DATE_FORMAT, MERGED_COLUMNS
+
+PARTITION = 'month'
+
+SCHEMA = pa.schema([
+    ('customer_id', pa.int32()),
+    ('transaction_date', pa.timestamp('ms')),
+    ('merchant', pa.dictionary(pa.int32(), pa.string())),
+    ('amount', pa.float32()),
+    ('category', pa.dictionary(pa.int32(), pa.string())),
+    ('subcategory', pa.dictionary(pa.int32(), pa.string())),
+    (PARTITION, pa.string()),
+])
+
+#------------------------------------------------------- HELPERS -----------------------------------------------
+def to_table(df):
+    """Cast a merged frame (MERGED_COLUMNS) to the compact Arrow schema, adding the month partition key."""
+    dates = df['transaction_date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=DATE_FORMAT)
+
+    frame = pd.DataFrame({
+        'customer_id': df['customer_id'].astype('int32'),
+        'transaction_date': dates,
+        'merchant': df['merchant'].astype('category'),
+        'amount': df['amount'].astype('float32'),
+        'category': df['category'].astype('category'),
+        'subcategory': df['subcategory'].astype('category'),
+        PARTITION: dates.dt.strftime('%Y-%m'),
+    })
+    return pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+
+##Write (or append to) the month-partitioned dataset
+def write_partitioned(df, root, part=0, existing='overwrite_or_ignore'):
+    """
+    Write df under root/month=YYYY-MM/.
+
+    part makes file names unique so repeated calls (e.g. one per streamed
+    chunk) append instead of overwriting each other.
+    """
+    pq.write_to_dataset(
+        to_table(df), root,
+        partition_cols=[PARTITION],
+        basename_template=f'part-{part:05d}-{{i}}.parquet',
+        existing_data_behavior=existing,
+    )
+
+def write_dataset(df, root):
+    """Replace the dataset at root with df."""
+    shutil.rmtree(root, ignore_errors=True)
+    write_partitioned(df, root)
+
+def csv_to_parquet(csv_file, root, chunk_rows=1_000_000):
+    """Replace the dataset at root with a merged_transactions.csv, converted chunk by chunk."""
+    shutil.rmtree(root, ignore_errors=True)
+    for part, chunk in enumerate(pd.read_csv(csv_file, chunksize=chunk_rows)):
+        write_partitioned(chunk, root, part=part)
+
+def replace_months(frames, root, months):
+    """
+    Replace only the given month partitions (e.g. {'2019-03', '2019-04'}) with
+    the rows of frames (all of those months' rows, in chunks); the other
+    months are left untouched. A month without rows is removed.
+    """
+    tmp = root.rstrip(os.sep) + '.months.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        for part, df in enumerate(frames):
+            if len(df):
+                write_partitioned(df, tmp, part=part)
+        for month in months:
+            folder = f'{PARTITION}={month}'
+            shutil.rmtree(os.path.join(root, folder), ignore_errors=True)
+            if os.path.isdir(os.path.join(tmp, folder)):
+                os.replace(os.path.join(tmp, folder), os.path.join(root, folder))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+##Read with column projection and partition pruning
+def scan(root, columns=None, start=None, end=None, where=None):
+    """
+    Dataset, projected columns and filter expression shared by the readers.
+
+    Args:
+        root (str): Dataset folder (e.g. after_merge/merged_transactions).
+        columns (list): Columns to load (default: all of MERGED_COLUMNS).
+        start, end (str | datetime): Optional inclusive date range (a date-only
+            end includes that whole day). Whole month partitions outside the
+            range are skipped before any file is opened.
+        where (pyarrow.dataset.Expression): Extra row filter, e.g.
+            ds.field('category') == 'food'.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    expr = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = (ds.field(PARTITION) >= start.strftime('%Y-%m')) & (ds.field('transaction_date') >= start)
+    if end is not None:
+        end = pd.Timestamp(end)
+        ##A date-only end means the whole last day
+        if end == end.normalize():
+            last = ds.field('transaction_date') < end + pd.Timedelta(days=1)
+        else:
+            last = ds.field('transaction_date') <= end
+        cond = (ds.field(PARTITION) <= end.strftime('%Y-%m')) & last
+        expr = cond if expr is None else expr & cond
+    if where is not None:
+        expr = where if expr is None else expr & where
+    return dataset, columns or MERGED_COLUMNS, expr
+
+def read_transactions(root, columns=None, start=None, end=None, where=None):
+    """
+    Load transactions from the partitioned dataset (arguments as in scan).
+
+    Returns:
+        pd.DataFrame
+    """
+    dataset, columns, expr = scan(root, columns, start, end, where)
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+def iter_transactions(root, columns=None, start=None, end=None, where=None, batch_rows=1_000_000):
+    """Same rows as read_transactions, as DataFrames of at most batch_rows rows."""
+    dataset, columns, expr = scan(root, columns, start, end, where)
+    for batch in dataset.to_batches(columns=columns, filter=expr, batch_size=batch_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def dataset_size(root):
+    """Total bytes on disk of a partitioned dataset."""
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
@@ -0,0 +1,203 @@
+"""
+==============================================================================
+ Vectorized Date Normalization
+==============================================================================
+Turns the raw date strings of both sources into datetime64 in one pass:
+
+# 1. Factorize the column so each distinct string is handled once, and skip
+#    strings already parsed in an earlier call (cache shared across chunks).
+# 2. Detect the format of each new distinct string (DATE_FORMATS, day-first,
+#    same shapes receipt_fields.DATE_PATTERNS looks for). Zero-padded strings are
+#    decoded straight from their bytes (parse_fixed); the rest are parsed with
+#    one pd.to_datetime call per format group.
+# 3. Date-only values get a random time of day, unparseable/missing values a
+#    random datetime in [start, end). Both are drawn as seeded arrays.
+"""
+import numpy as np
+import pandas as pd
+
+##(regex, format for pd.to_datetime, has time of day); first match wins
+DATE_FORMATS = [
+    (r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2}', '%d/%m/%Y %H:%M:%S', True),
+    (r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}', '%d/%m/%Y %H:%M', True),
+    (r'\d{1,2}/\d{1,2}/\d{4}', '%d/%m/%Y', False),
+    (r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?', 'ISO8601', True),
+    (r'\d{4}-\d{2}-\d{2}', '%Y-%m-%d', False),
+    (r'\d{1,2}-\d{1,2}-\d{4}', '%d-%m-%Y', False),
+    (r'\d{1,2}/\d{1,2}/\d{2}', '%d/%m/%y', False),
+]
+
+NAT = np.iinfo(np.int64).min
+SECONDS_PER_DAY = 24 * 60 * 60
+NS = 1_000_000_000
+
+##strftime code -> placeholder in a fixed-width layout ('%d/%m/%Y' -> 'DD/MM/YYYY')
+LAYOUT_CODES = {'%d': 'DD', '%m': 'MM', '%Y': 'YYYY', '%y': 'yy', '%H': 'hh', '%M': 'mm', '%S': 'ss'}
+
+def fixed_layout(fmt):
+    """Fixed-width layout of a zero-padded format, or None (e.g. ISO8601)."""
+    if fmt == 'ISO8601':
+        return None
+    for code, placeholder in LAYOUT_CODES.items():
+        fmt = fmt.replace(code, placeholder)
+    return None if '%' in fmt else fmt
+
+def parse_fixed(texts, layout):
+    """
+    Decode strings that follow a zero-padded layout byte by byte.
+
+    Args:
+        texts (np.ndarray): Strings, all of len(layout).
+        layout (str): e.g. 'DD/MM/YYYY hh:mm:ss'.
+
+    Returns:
+        (values int64 ns with NAT where the string does not fit, ok bool mask)
+    """
+    width = len(layout)
+    try:
+        raw = np.asarray(texts, dtype=f'S{width}').view(np.uint8).reshape(-1, width)
+    except UnicodeEncodeError:
+        return np.full(len(texts), NAT, dtype=np.int64), np.zeros(len(texts), dtype=bool)
+
+    ok = np.ones(len(raw), dtype=bool)
+    fields = {}
+    for pos, ch in enumerate(layout):
+        if ch in 'DMYyhms':
+            digit = raw[:, pos] - np.uint8(ord('0'))   # wraps to >= 10 for anything but 0-9
+            ok &= digit < 10
+            fields[ch] = fields.get(ch, 0) * 10 + digit.astype(np.int64)
+        else:
+            ok &= raw[:, pos] == ord(ch)
+
+    ##Two-digit years pivot like strptime's %y: 00-68 -> 20xx, 69-99 -> 19xx
+    year = fields['Y'] if 'Y' in fields else np.where(fields['y'] < 69, 2000, 1900) + fields['y']
+    month, day = fields['M'], fields['D']
+    hour, minute, second = fields.get('h', 0), fields.get('m', 0), fields.get('s', 0)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60) & (second < 60)
+
+    ##Calendar arithmetic on datetime64 month/day units; also rejects e.g. 30/02
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    first = months.astype('datetime64[D]')
+    ok &= day <= ((months + 1).astype('datetime64[D]') - first).astype(np.int64)
+    days = first.astype(np.int64) + day - 1
+    values = (days * SECONDS_PER_DAY + hour * 3600 + minute * 60 + second) * NS
+    return np.where(ok, values, NAT), ok
+
+##Detect + parse distinct strings, one pd.to_datetime call per format
+def parse_unique(texts):
+    """
+    Args:
+        texts (pd.Series): Distinct, stripped date strings.
+
+    Returns:
+        (int64 ns since epoch with NAT for failures, has_time bool) per string.
+    """
+    texts = texts.reset_index(drop=True)
+    values = np.full(len(texts), NAT, dtype=np.int64)
+    has_time = np.zeros(len(texts), dtype=bool)
+    todo = np.ones(len(texts), dtype=bool)
+
+    ##Fast path: zero-padded strings decoded from their bytes
+    lengths = texts.str.len().to_numpy()
+    for _, fmt, timed in DATE_FORMATS:
+        layout = fixed_layout(fmt)
+        idx = np.flatnonzero(todo & (lengths == len(layout))) if layout else []
+        if not len(idx):
+            continue
+        parsed, ok = parse_fixed(texts.iloc[idx].to_numpy(dtype=object), layout)
+        idx = idx[ok]
+        values[idx] = parsed[ok]
+        has_time[idx] = timed
+        todo[idx] = False
+
+    ##General path: regex detection, one pd.to_datetime call per format
+    for pattern, fmt, timed in DATE_FORMATS:
+        if not todo.any():
+            break
+        idx = np.flatnonzero(todo)
+        hit = texts.iloc[idx].str.fullmatch(pattern).to_numpy(dtype=bool)
+        idx = idx[hit]
+        if not len(idx):
+            continue
+        parsed = pd.to_datetime(texts.iloc[idx], format=fmt, errors='coerce')
+        values[idx] = parsed.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        has_time[idx] = timed
+        todo[idx] = False
+    return values, has_time
+
+class DateNormalizer:
+    """
+    Parse-once date normalizer.
+
+    Args:
+        rng (np.random.Generator): Source of the random times and imputed dates.
+        start, end (datetime): Window for dates that are missing or unparseable.
+        max_cache (int): Distinct strings remembered across calls; the cache is
+            cleared when it grows past this.
+    """
+    def __init__(self, rng, start, end, max_cache=1_000_000):
+        self.rng = rng
+        self.start = pd.Timestamp(start)
+        self.end = pd.Timestamp(end)
+        self.max_cache = max_cache
+        self.hits = 0
+        self.misses = 0
+        self.clear_cache()
+
+    def clear_cache(self):
+        ##Hash-indexed keys + parallel value arrays (lookups stay in C, no per-string Python)
+        self.cache_keys = pd.Index([], dtype=object)
+        self.cache_values = np.empty(0, dtype=np.int64)
+        self.cache_has_time = np.empty(0, dtype=bool)
+
+    def lookup(self, uniques):
+        """parse_unique through the cache."""
+        pos = self.cache_keys.get_indexer(uniques)
+        missing = np.flatnonzero(pos < 0)
+        found = pos >= 0
+        values = np.full(len(uniques), NAT, dtype=np.int64)
+        has_time = np.zeros(len(uniques), dtype=bool)
+        values[found] = self.cache_values[pos[found]]
+        has_time[found] = self.cache_has_time[pos[found]]
+        self.hits += len(uniques) - len(missing)
+        self.misses += len(missing)
+
+        if len(missing):
+            new_keys = uniques[missing]
+            new_values, new_has_time = parse_unique(pd.Series(new_keys))
+            values[missing] = new_values
+            has_time[missing] = new_has_time
+
+            if len(self.cache_keys) + len(missing) > self.max_cache:
+                self.clear_cache()
+            self.cache_keys = self.cache_keys.append(pd.Index(new_keys, dtype=object))
+            self.cache_values = np.concatenate([self.cache_values, new_values])
+            self.cache_has_time = np.concatenate([self.cache_has_time, new_has_time])
+        return values, has_time
+
+    def normalize(self, dates):
+        """
+        Args:
+            dates (array-like): Raw date strings (NaN allowed).
+
+        Returns:
+            np.ndarray of datetime64[ns], no NaT.
+        """
+        ##Missing dates become '' (parsed to NAT), so factorize never hands out the -1 sentinel
+        texts = pd.Series(dates, dtype=object).fillna('').astype(str).str.strip()
+        codes, uniques = pd.factorize(texts)
+        values, has_time = self.lookup(pd.Index(uniques, dtype=object))
+        out = values[codes]
+
+        ##Date-only rows: random time of day
+        date_only = ~has_time[codes] & (out != NAT)
+        out[date_only] += self.rng.integers(0, SECONDS_PER_DAY, size=int(date_only.sum())) * NS
+
+        ##Missing / unparseable rows: random datetime in the window
+        missing = out == NAT
+        n_missing = int(missing.sum())
+        if n_missing:
+            days = max(1, (self.end - self.start).days)
+            offset = self.rng.integers(0, days, size=n_missing) * SECONDS_PER_DAY + self.rng.integers(0, SECONDS_PER_DAY, size=n_missing)
+            out[missing] = self.start.value + offset * NS
+        return out.view('datetime64[ns]')
@@ -0,0 +1,325 @@
+"""
+==============================================================================
+ Transaction Ledger (SQLite)
+==============================================================================
+One local database for every transaction: the merged card + household data,
+manual entries (OCR.mannual_entry) and OCR'd receipts (ReceiptOCR), stdlib
+sqlite3 only.
+
+Schema (normalized; names live once in the dictionary tables):
+
+    merchant / category / subcategory (id INTEGER PRIMARY KEY, name TEXT UNIQUE)
+    transactions (id, customer_id, date, amount, merchant_id, category_id,
+                  subcategory_id, source, receipt)
+        date:   unix seconds (INTEGER), indexed
+        source: 'merged' | 'manual' | 'ocr';  receipt: image path of OCR rows
+        index on (customer_id, date)
+    ledger: view with the names joined back and the date as text
+
+# - The database runs in WAL mode with synchronous=NORMAL: a commit appends to
+#   the write-ahead log without an fsync, so a single add() costs tens of
+#   microseconds and is visible to readers at once.
+# - load_merged() replaces the 'merged' rows from merged_transactions.csv (or
+#   the Parquet folder) in ONE transaction: chunks are mapped to dictionary ids
+#   with vectorized lookups, inserted with executemany, and the date/customer
+#   indexes are dropped first and rebuilt once at the end. Rows without a
+#   date are skipped (and counted).
+
+Usage:
+    book = Ledger('dataset/ledger.db')
+    book.load_merged('dataset/after_merge/merged_transactions.csv')
+    book.add('Starbucks', 4.75, '14/03/2025', category='food')
+    book.query(start='2025-03-01', end='2025-03-31', source='manual')
+"""
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from date_normalize import DATE_FORMATS, NAT, NS, SECONDS_PER_DAY, fixed_layout, parse_fixed
+from merge_data import DATASET_DIR, DATE_FORMAT, MERGED_COLUMNS
+
+DEFAULT_LEDGER = os.path.join(DATASET_DIR, 'ledger.db')
+
+##Dictionary tables (name -> id)
+NAMES = ['merchant', 'category', 'subcategory']
+
+SOURCES = ('merged', 'manual', 'ocr')
+
+##Rows read and inserted per executemany during load_merged
+LOAD_ROWS = 200_000
+
+SCHEMA_VERSION = 1
+
+EPOCH = datetime(1970, 1, 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS merchant (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS category (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS subcategory (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    customer_id INTEGER,
+    date INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    merchant_id INTEGER REFERENCES merchant(id),
+    category_id INTEGER REFERENCES category(id),
+    subcategory_id INTEGER REFERENCES subcategory(id),
+    source TEXT NOT NULL,
+    receipt TEXT
+);
+"""
+
+##Rows with their names joined back (the `ledger` view, and query() with its filters on the transactions columns)
+SELECT_NAMED = """
+SELECT t.id, t.customer_id, {date} AS transaction_date, m.name AS merchant, t.amount,
+       c.name AS category, s.name AS subcategory, t.source, t.receipt
+FROM transactions t
+LEFT JOIN merchant m ON m.id = t.merchant_id
+LEFT JOIN category c ON c.id = t.category_id
+LEFT JOIN subcategory s ON s.id = t.subcategory_id"""
+
+SCHEMA += 'CREATE VIEW IF NOT EXISTS ledger AS ' + SELECT_NAMED.format(date="datetime(t.date, 'unixepoch')") + ';\n'
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_customer ON transactions (customer_id, date);
+"""
+
+INSERT = ("INSERT INTO transactions (customer_id, date, amount, merchant_id, category_id, subcategory_id, source, receipt) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+#------------------------------------------------------- HELPERS -----------------------------------------------
+def parse_date(text):
+    """
+    Unix seconds of one entered / OCR'd date (date_normalize.DATE_FORMATS, day-first;
+    a datetime or Timestamp is taken as is). None or '' = now.
+    """
+    if text is None or text == '':
+        ##Naive local time, like every entered date (all are stored as if UTC)
+        text = datetime.now()
+    if not isinstance(text, str):
+        return int(pd.Timestamp(text).timestamp())
+    text = text.strip()
+    for pattern, fmt, _ in DATE_FORMATS:
+        if re.fullmatch(pattern, text):
+            date = datetime.fromisoformat(text) if fmt == 'ISO8601' else datetime.strptime(text, fmt)
+            return (date - EPOCH) // timedelta(seconds=1)
+    raise ValueError(f'unrecognized date: {text!r}')
+
+def end_bound(end):
+    """(operator, unix seconds) of an inclusive end date; a date alone includes its whole day."""
+    value = parse_date(end)
+    if value % SECONDS_PER_DAY == 0:
+        return '<', value + SECONDS_PER_DAY
+    return '<=', value
+
+def seconds(dates):
+    """
+    Unix seconds of a merged date column (typed, or DATE_FORMAT strings as in the CSV); None for NaT.
+    Strings are decoded from their bytes (date_normalize.parse_fixed), strptime only for the odd one out.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        values = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    else:
+        texts = dates.to_numpy(dtype=object, na_value='')
+        values, ok = parse_fixed(texts, fixed_layout(DATE_FORMAT))
+        if not ok.all():
+            values[~ok] = pd.to_datetime(pd.Series(texts[~ok]), format=DATE_FORMAT, errors='coerce').to_numpy(
+                dtype='datetime64[ns]').astype(np.int64)
+    out = (values // NS).astype(object)
+    out[values == NAT] = None
+    return out
+
+class Ledger:
+    """
+    The ledger database at `path` (created on first use).
+
+    Filters of query / total / count:
+        start, end (str | datetime): Inclusive date range (a date-only end includes that whole day).
+        customer_id (int), merchant, category (str), source ('merged' | 'manual' | 'ocr'): Equality.
+    """
+    def __init__(self, path=DEFAULT_LEDGER):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        ##Autocommit: every add() is its own (cheap, WAL) transaction; bulk loads open one explicitly
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('PRAGMA foreign_keys=ON')
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f'{path}: ledger schema version {version}, expected {SCHEMA_VERSION}')
+        self.db.executescript(SCHEMA + INDEXES + f'PRAGMA user_version={SCHEMA_VERSION};')
+        ##name -> id of every dictionary table, so lookups never hit the database
+        self.ids = {table: dict(self.db.execute(f'SELECT name, id FROM {table}')) for table in NAMES}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+
+    def id_of(self, table, name):
+        """Dictionary id of a name, inserted on first use (None for a missing name)."""
+        if name is None or (isinstance(name, float) and np.isnan(name)):
+            return None
+        ids = self.ids[table]
+        found = ids.get(name)
+        if found is None:
+            self.db.execute(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', (name,))
+            found = ids[name] = self.db.execute(f'SELECT id FROM {table} WHERE name = ?', (name,)).fetchone()[0]
+        return found
+
+    #------------------------------------------------------- WRITE -----------------------------------------------
+    def add(self, merchant, amount, date=None, category=None, subcategory=None, customer_id=None, source='manual',
+            receipt=None):
+        """
+        Insert one transaction, committed (queryable) on return.
+
+        Args:
+            date (str | datetime): See parse_date (None = now).
+            source (str): 'manual' or 'ocr' ('merged' rows are replaced by every load_merged).
+            receipt (str): Image path of an OCR'd receipt.
+
+        Returns:
+            id of the new row
+        """
+        if source not in SOURCES:
+            raise ValueError(f'source must be one of {SOURCES}, got {source!r}')
+        row = (customer_id, parse_date(date), float(amount), self.id_of('merchant', merchant),
+               self.id_of('category', category), self.id_of('subcategory', subcategory), source, receipt)
+        return self.db.execute(INSERT, row).lastrowid
+
+    def add_receipt(self, fields, receipt=None, category=None, customer_id=None):
+        """
+        Insert an OCR'd receipt from its receipt_fields.FieldExtractor.extract() fields.
+
+        Returns:
+            id of the new row, or None when the receipt has no total (nothing to book)
+        """
+        value = lambda name: None if fields.get(name) is None else fields[name].value
+        if value('total') is None:
+            return None
+        date = value('date')
+        try:
+            parse_date(date)
+        except ValueError:
+            ##An OCR'd date that is not a date: book it today rather than lose the receipt
+            date = None
+        return self.add(value('merchant'), value('total'), date, category, customer_id=customer_id, source='ocr',
+                        receipt=receipt)
+
+    def map_names(self, table, values):
+        """Dictionary ids of a text column (object array, None where missing), new names inserted."""
+        cat = pd.Categorical(values)
+        ids = np.array([self.id_of(table, str(name)) for name in cat.categories] + [None], dtype=object)
+        ##Code -1 (missing) picks the trailing None
+        return ids[cat.codes]
+
+    def load_merged(self, path, chunk_rows=LOAD_ROWS):
+        """
+        Replace the 'merged' rows with merged_transactions.csv (or the Parquet folder),
+        in one transaction; manual and OCR rows are kept. Rows without a date
+        are skipped (a count is printed).
+
+        Returns:
+            rows loaded
+        """
+        from read_info import iter_chunks
+        rows = skipped = 0
+        ##Every id comes from the dictionary tables just looked up: skip the per-row foreign key checks
+        self.db.execute('PRAGMA foreign_keys=OFF')
+        self.db.execute('BEGIN')
+        try:
+            self.db.execute("DELETE FROM transactions WHERE source = 'merged'")
+            ##Dropped and rebuilt once: maintaining them row by row costs more than one sort at the end
+            self.db.execute('DROP INDEX IF EXISTS transactions_date')
+            self.db.execute('DROP INDEX IF EXISTS transactions_customer')
+            for chunk in iter_chunks(path, chunk_rows, columns=MERGED_COLUMNS):
+                dates = seconds(chunk['transaction_date'])
+                dated = ~pd.isna(dates)
+                if not dated.all():
+                    skipped += int((~dated).sum())
+                    chunk, dates = chunk[dated], dates[dated]
+                customers = chunk['customer_id'].astype(object).where(chunk['customer_id'].notna(), None)
+                self.db.executemany(INSERT, zip(
+                    customers.tolist(),
+                    dates.tolist(),
+                    chunk['amount'].astype(np.float64).tolist(),
+                    self.map_names('merchant', chunk['merchant']).tolist(),
+                    self.map_names('category', chunk['category']).tolist(),
+                    self.map_names('subcategory', chunk['subcategory']).tolist(),
+                    ['merged'] * len(chunk),
+                    [None] * len(chunk),
+                ))
+                rows += len(chunk)
+            ##(executescript would COMMIT first, so one statement at a time)
+            for sql in INDEXES.split(';'):
+                if sql.strip():
+                    self.db.execute(sql)
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            ##The cached ids of names inserted in the rolled back transaction are gone too
+            self.ids = {table: dict(self.db.execute(f'SELECT name, id FROM {table}')) for table in NAMES}
+            raise
+        finally:
+            self.db.execute('PRAGMA foreign_keys=ON')
+        self.db.execute('ANALYZE')
+        if skipped:
+            print(f'{skipped:,} rows without a date skipped')
+        return rows
+
+    #------------------------------------------------------- READ -----------------------------------------------
+    def where(self, start=None, end=None, customer_id=None, merchant=None, category=None, source=None):
+        """(WHERE clause over transactions t, parameters) of the filters."""
+        terms, params = [], []
+        if start is not None:
+            terms.append('t.date >= ?')
+            params.append(parse_date(start))
+        if end is not None:
+            op, value = end_bound(end)
+            terms.append(f't.date {op} ?')
+            params.append(value)
+        if customer_id is not None:
+            terms.append('t.customer_id = ?')
+            params.append(int(customer_id))
+        for table, name in (('merchant', merchant), ('category', category)):
+            if name is not None:
+                ##Unknown name: id -1 matches nothing
+                terms.append(f't.{table}_id = ?')
+                params.append(self.ids[table].get(name, -1))
+        if source is not None:
+            terms.append('t.source = ?')
+            params.append(source)
+        return (' WHERE ' + ' AND '.join(terms)) if terms else '', params
+
+    def query(self, limit=None, **filters):
+        """Matching transactions (ledger view columns) as a DataFrame, in date order."""
+        where, params = self.where(**filters)
+        sql = f"{SELECT_NAMED.format(date='t.date')}{where} ORDER BY t.date, t.id"
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        ##Plain fetchall + unix seconds: read_sql_query's date parsing costs more than the lookup
+        cursor = self.db.execute(sql, params)
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=[c[0] for c in cursor.description], index='id')
+        df['transaction_date'] = pd.to_datetime(df['transaction_date'], unit='s')
+        return df
+
+    def total(self, **filters):
+        where, params = self.where(**filters)
+        return self.db.execute(f'SELECT COALESCE(SUM(amount), 0) FROM transactions t{where}', params).fetchone()[0]
+
+    def count(self, **filters):
+        where, params = self.where(**filters)
+        return self.db.execute(f'SELECT COUNT(*) FROM transactions t{where}', params).fetchone()[0]
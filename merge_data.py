@@ -18,7 +18,8 @@ Purpose: This script merges two financial transaction datasets (credit card and
 #   transactions with varying date formats and currency.
 #
 # Processing Steps:
-# 1. Load and preprocess the credit card dataset (df1):
+# 1. Load and preprocess the credit card dataset (df1), CHUNK_ROWS rows at a time
+#    in a process pool (clean_card_parallel; one seeded generator per chunk):
 #    - Rename columns (e.g., 'trans_date_trans_time' to 'transaction_date', 'amt' to 'amount').
 #    - Convert transaction dates to datetime format.
 #    - Standardize category and subcategory names (lowercase, replace spaces with underscores).
@@ -27,22 +28,30 @@ Purpose: This script merges two financial transaction datasets (credit card and
 
 # 2. Load and preprocess the household dataset (df2):
 #    - Rename columns (e.g., 'Date' to 'transaction_date', 'Amount' to 'amount').
-#    - Parse and standardize transaction dates with random time additions.
+#    - Parse and standardize transaction dates with random time additions
+#      (date_normalize.py: each distinct date string is parsed once).
 #    - Convert amounts to USD (divide by 86).
 #    - Standardize category and subcategory names.
 #    - Assign new customer IDs from 1,048,576 to 1,051,036.
 
 # 3. Merge the datasets:
 #    - Concatenate df1 and df2, preserving original customer IDs.
-#    - Sort by transaction date for chronological order.
+#    - Sort by transaction date (datetime64) for chronological order; dates are
+#      only formatted as strings when the CSV is written (write_csv).
 #    - Reset the index for a clean sequence.
 #    - Select only relevant columns (customer_id, transaction_date, amount, category, subcategory).
 
-# 4. Save the merged dataset to 'merged_transactions.csv' in the after_merge directory.
+# 4. Save the merged dataset to 'merged_transactions.csv' in the after_merge directory,
+#    plus a month-partitioned Parquet copy in 'merged_transactions/' (columnar_store.py).
 #
 # Output:
 # - merged_transactions.csv: Contains 1,051,036 rows with customer IDs ranging from
 #   0 to 1,051,036, reflecting all transactions in chronological order.
+# - merged_transactions/month=YYYY-MM/*.parquet: Same rows, compact typed schema.
+# - rollup.pkl: Spending cube (rollup.py) the histograms and summaries are drawn from.
+# - merge_trace.json: Wall/CPU seconds, rows in/out and peak RSS of every stage
+#   (stage_trace.py; nested stages such as load_card.standardize.dates add up
+#   across chunks and pool workers), also printed as a table at the end.
 #
 # Notes:
 # - Visualizations (histograms) are generated for category-wise spending but are
@@ -53,26 +62,30 @@ Purpose: This script merges two financial transaction datasets (credit card and
 """
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-from matplotlib.colors import ListedColormap
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
 import os
 
+from date_normalize import DateNormalizer
+from parallel import parallel_map
+from rollup import RollupCube
+from stage_trace import NULL_TRACER, Tracer
+
 # --------------------------------------------------CONFIGURATION-------------------------------------------------------------------------------
+##Default locations (the repository's dataset/ folder); every entry point takes them as arguments
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+
 ##Dataset 1 and 2
-df1 = pd.read_csv('/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/before_merge/credit_card_transactions.csv')
-df2 = pd.read_csv('/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/before_merge/Daily Household Transactions.csv')
+card_path = os.path.join(DATASET_DIR, 'before_merge', 'credit_card_transactions.csv')
+household_path = os.path.join(DATASET_DIR, 'before_merge', 'Daily Household Transactions.csv')
 
 ## Folders for save df1 and df2 visulization
-data_info_path = '/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/data_info'
+data_info_path = os.path.join(DATASET_DIR, 'data_info')
 
 ##After merge folder
-after_merge = '/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/after_merge'
+after_merge = os.path.join(DATASET_DIR, 'after_merge')
 
 ##Set randome seed for reproducibility
-random.seed(40) 
+SEED = 40
 
 # Define pastel color palette
 pastel_colors = [
@@ -80,64 +93,33 @@ pastel_colors = [
     '#FDC394', '#F9D7B0', '#A7D3B8', '#B5DFC5', '#C2E5CD', '#CBEAD2', 
     '#A19ACB', '#C5B8DD'
 ]
-pastel_cmap = ListedColormap(pastel_colors)
 
 random_start = datetime(2015, 1, 1)
 random_end = datetime.now()
 
-#------------------------------------------------------- HELPERS -----------------------------------------------
-# Convert transaction_date to datetime
-def parse_date(d):
-    d = str(d).strip()
-    try:
-        if len(d) > 10 and ':' in d: 
-            ##Format: DD/MM/YYYY HH:MM:SS
-            return datetime.strptime(d, '%d/%m/%Y %H:%M:%S')
-
-        elif len(d) == 10 and '/' in d:
-            ## Format: DD/MM/YYYY (no time), add random time
-            base = datetime.strptime(d, '%d/%m/%Y')
-            rand_time = timedelta(hours=random.randint(0, 23),
-                                minutes=random.randint(0, 59),
-                                seconds=random.randint(0, 59))
-            return base + rand_time
-    except ValueError:
-        return pd.NaT
-    return pd.NaT
-
-# Generate random datetime for missing dates
-def random_datetime(start, end):
-    """Generate a random datetime between start and end."""
-    time_between = end - start
-    days_between = time_between.days
-    random_days = random.randrange(days_between)
-    random_seconds = random.randrange(24 * 60 * 60)  # Random time within the day
-    return start + timedelta(days=random_days, seconds=random_seconds)
-
-##Generate merchant
-def generate_merchant(df):
-    merchant = []
-    for _, row in df.iterrows():
-        category = row['category']
-        #Get the list of merchants for this category
-        choices = merchant_options.get(category, general_merchant)
-        #Randomly select one merchant
-        selected_merchant = random.choice(choices)
-        merchant.append(selected_merchant)
-    return merchant
-
-##Generate subcategory with merchant-specific mapping
-def generate_subcategory(df):
-    subs = []
-    for _, row in df.iterrows():
-        merchant = row['merchant']
-        if merchant in merchant_subcategory_options:
-            options = merchant_subcategory_options[merchant]
-        else:
-            options = subcategory_options.get(row['category'], general_subcategory)
-        selected_sub = random.choice(options)
-        subs.append(selected_sub)
-    return subs
+##Date format written to the CSV outputs
+DATE_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+##Column order of merged_transactions.csv
+MERGED_COLUMNS = ['customer_id', 'transaction_date', 'merchant', 'amount', 'category', 'subcategory']
+
+##In-memory schema from load through sort; dates only become strings in write_csv
+TRANSACTION_DTYPES = {
+    'customer_id': 'int32',
+    'transaction_date': 'datetime64[ns]',
+    'merchant': 'category',
+    'amount': 'float64',
+    'category': 'category',
+    'subcategory': 'category',
+}
+TEXT_COLUMNS = ['merchant', 'category', 'subcategory']
+
+##Rows per chunk in the parallel card transform; chunk i always draws from chunk_rng(seed, i)
+CHUNK_ROWS = 500_000
+
+##Source columns actually used (the card export has ~20 more)
+CARD_COLUMNS = ['trans_date_trans_time', 'category', 'amt']
+HOUSEHOLD_COLUMNS = ['Date', 'Category', 'Amount']
 
 # ----------------------------------------------- Generate more data --------------------------------------------------------------
 subcategory_options = {
@@ -189,135 +171,338 @@ merchant_subcategory_options = {
     'Nike':            ['jacket','shorts','socks','shoes','pants','shirt'],
 }
 
+#------------------------------------------------------- HELPERS -----------------------------------------------
+##Lookup tables for the vectorized generator, built once per set of categories
+def build_option_tables(category_names):
+    """
+    Lay out the merchant/subcategory vocabularies as padded code tables.
+
+    Row g of the tables belongs to category_names[g]; one extra trailing row
+    covers missing or unknown categories (general merchants).
+
+    Returns:
+        merchant_vocab (list): Distinct merchant names (categorical categories).
+        sub_vocab (list): Distinct subcategory names.
+        merchant_table (np.ndarray): [group, slot] -> merchant code.
+        merchant_len (np.ndarray): Number of merchant slots per group.
+        sub_table (np.ndarray): [group, slot, option] -> subcategory code.
+        sub_len (np.ndarray): [group, slot] -> number of subcategory options.
+    """
+    merchant_vocab, sub_vocab = {}, {}
+    groups = []
+    for name in list(category_names) + [None]:
+        merchants = merchant_options.get(name, general_merchant)
+        subs_per_merchant = []
+        for m in merchants:
+            ##Merchant-specific subcategories win over the category defaults
+            if m in merchant_subcategory_options:
+                subs = merchant_subcategory_options[m]
+            else:
+                subs = subcategory_options.get(name, general_subcategory)
+            subs_per_merchant.append([sub_vocab.setdefault(s, len(sub_vocab)) for s in subs])
+        groups.append(([merchant_vocab.setdefault(m, len(merchant_vocab)) for m in merchants], subs_per_merchant))
+
+    n_groups = len(groups)
+    max_merchants = max(len(g[0]) for g in groups)
+    max_subs = max(len(s) for g in groups for s in g[1])
+
+    merchant_table = np.zeros((n_groups, max_merchants), dtype=np.int32)
+    merchant_len = np.zeros(n_groups, dtype=np.int64)
+    sub_table = np.zeros((n_groups, max_merchants, max_subs), dtype=np.int32)
+    sub_len = np.ones((n_groups, max_merchants), dtype=np.int64)
+    for g, (m_codes, subs_per_merchant) in enumerate(groups):
+        merchant_len[g] = len(m_codes)
+        merchant_table[g, :len(m_codes)] = m_codes
+        for slot, s_codes in enumerate(subs_per_merchant):
+            sub_len[g, slot] = len(s_codes)
+            sub_table[g, slot, :len(s_codes)] = s_codes
+
+    return list(merchant_vocab), list(sub_vocab), merchant_table, merchant_len, sub_table, sub_len
+
+##Generate merchant and subcategory (with merchant-specific mapping) for every row at once
+def generate_merchant_subcategory(categories, rng):
+    """
+    Draw a merchant and a subcategory for each row from its category's options.
+
+    Works on category codes instead of rows: the merchant slot and the
+    subcategory option for every row come from one seeded NumPy call each,
+    then both are looked up in the padded tables from build_option_tables.
+
+    Args:
+        categories (array-like): Category name per row (NaN allowed).
+        rng (np.random.Generator): Seeded generator, e.g. np.random.default_rng(SEED).
+
+    Returns:
+        merchant (pd.Categorical), subcategory (pd.Categorical)
+    """
+    cat = pd.Categorical(categories)
+    merchant_vocab, sub_vocab, merchant_table, merchant_len, sub_table, sub_len = build_option_tables(cat.categories)
+
+    ##Missing categories (code -1) use the trailing general row
+    codes = np.asarray(cat.codes, dtype=np.int64)
+    codes[codes < 0] = len(cat.categories)
+
+    slot = rng.integers(0, merchant_len[codes])
+    option = rng.integers(0, sub_len[codes, slot])
+
+    merchant = pd.Categorical.from_codes(merchant_table[codes, slot], categories=merchant_vocab)
+    subcategory = pd.Categorical.from_codes(sub_table[codes, slot, option], categories=sub_vocab)
+    return merchant, subcategory
+
+##Horizontal bar chart of total spending per category
+def plot_totals(cat_sum, title, out_file, figsize=(12, 6)):
+    ##Headless: matplotlib is only imported here, with the Agg backend, and the figure is closed once saved
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    cat_sum = cat_sum.sort_values()
+    n_cat = len(cat_sum)
+
+    fig = plt.figure(figsize=(figsize[0], max(figsize[1], 0.3 * n_cat)))  # Dynamically scaled height
+    plt.barh(cat_sum.index, cat_sum.values, color=pastel_colors[:n_cat])
+    plt.title(title)
+    plt.xlabel('Total Amount (USD)')
+    plt.tight_layout()
+    os.makedirs(os.path.dirname(out_file) or '.', exist_ok=True)
+    plt.savefig(out_file)
+    plt.close(fig)
+
+#------------------------------------------------------- LOAD / WRITE -----------------------------------------------
+def read_card(path, **kwargs):
+    """Read the card CSV: ID column plus CARD_COLUMNS, category already categorical."""
+    return pd.read_csv(path, usecols=lambda c: c in CARD_COLUMNS or c == 'customer_id' or c.startswith('Unnamed'),
+                       dtype={'category': 'category'}, **kwargs)
+
+def read_household(path, **kwargs):
+    """Read the household CSV: HOUSEHOLD_COLUMNS only."""
+    return pd.read_csv(path, usecols=HOUSEHOLD_COLUMNS, **kwargs)
+
+def to_schema(df):
+    """Cast a cleaned frame to TRANSACTION_DTYPES, in MERGED_COLUMNS order."""
+    return df[MERGED_COLUMNS].astype(TRANSACTION_DTYPES)
+
+def write_csv(df, path_or_buf, **kwargs):
+    """The only place dates are formatted (DATE_FORMAT)."""
+    df.to_csv(path_or_buf, index=False, date_format=DATE_FORMAT, **kwargs)
+
 # ----------------------------------------------- Clean and Standardize df1 --------------------------------------------------------------
-print('Loading df1... ⏬⏬')
-print('======================================================')
-print('======================================================')
-
-# Rename unnamed column to 'customer_id' if necessary
-if df1.columns[0] != 'customer_id':
-    df1.rename(columns={df1.columns[0]: 'customer_id'}, inplace=True)
-
-#Rename column to 'customer_id' 
-df1.rename(columns={
-    'trans_date_trans_time': 'transaction_date',
-    'amt': 'amount',
-}, inplace=True)
-
-df1['merchant'] = generate_merchant(df1)
-
-##Assign the generated subcategories back to df1
-df1['subcategory'] = generate_subcategory(df1)
-
-##Standardize date format
-df1['transaction_date'] = pd.to_datetime(df1['transaction_date'], errors='coerce')
-mask = df1['transaction_date'].isna()
-df1.loc[mask,'transaction_date'] = df1.loc[mask].apply(lambda _: random_datetime(random_start,random_end), axis=1)
-df1['transaction_date'] = pd.to_datetime(df1['transaction_date']).dt.strftime('%m/%d/%Y %H:%M:%S')
-
-# Reassign customer IDs
-df1 = df1.sort_values('customer_id').reset_index(drop=True)
-df1['customer_id'] = np.arange(len(df1))
-df1 = df1[['customer_id','transaction_date','merchant','category','subcategory','amount']]
-
-# ------------------ Visualize df1 ------------------
-cat_sum_1 = df1.groupby('category')['amount'].sum().sort_values()
-n_cat_1 = len(cat_sum_1)
-
-plt.figure(figsize=(12, max(6, 0.3 * n_cat_1)))  # Dynamically scaled height
-plt.barh(cat_sum_1.index, cat_sum_1.values, color=pastel_cmap.colors[:n_cat_1])
-##Save plot
-plt.title('Credit Card Transactions by Category (USD)')
-plt.xlabel('Total Amount (USD)')
-plt.tight_layout()
-
-# Save in folder
-plt.savefig(os.path.join(data_info_path, 'd1_histogram.png'))
-plt.close()
+def standardize_card(df1, rng, dates=None, trace=NULL_TRACER):
+    """
+    Rename, synthesize merchant/subcategory and fix dates for (a chunk of) the credit card data.
+    Pass the same DateNormalizer as `dates` for every chunk to reuse its cache.
+    """
+    # Rename unnamed column to 'customer_id' if necessary
+    if df1.columns[0] != 'customer_id':
+        df1 = df1.rename(columns={df1.columns[0]: 'customer_id'})
+
+    #Rename column to 'customer_id' 
+    df1 = df1.rename(columns={
+        'trans_date_trans_time': 'transaction_date',
+        'amt': 'amount',
+    })
+
+    ##Generate merchant and subcategory (merchant-specific mapping applied)
+    with trace.stage('merchants', rows_in=len(df1)):
+        df1['merchant'], df1['subcategory'] = generate_merchant_subcategory(df1['category'], rng)
+
+    ##Standardize date format (missing dates imputed at random)
+    with trace.stage('dates', rows_in=len(df1)):
+        dates = dates or DateNormalizer(rng, random_start, random_end)
+        df1['transaction_date'] = dates.normalize(df1['transaction_date'])
+    return df1
+
+def clean_card(df1, rng, dates=None):
+    """Standardize the credit card data and reassign customer IDs 0..N-1 in original ID order."""
+    df1 = standardize_card(df1, rng, dates)
+
+    # Reassign customer IDs
+    df1 = df1.sort_values('customer_id', kind='stable').reset_index(drop=True)
+    df1['customer_id'] = np.arange(len(df1))
+    return to_schema(df1)
+
+# ----------------------------------------------- Parallel df1 transform --------------------------------------------------------------
+def chunk_rng(seed, index):
+    """Generator of chunk `index`: child `index` of SeedSequence(seed), independent of worker count."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+def standardize_card_chunk(task):
+    """
+    Pool task: (chunk, seed, index, start, end) -> standardize_card with the chunk's
+    own generator, plus the worker's stage records.
+    """
+    chunk, seed, index, start, end = task
+    rng = chunk_rng(seed, index)
+    trace = Tracer('chunk')
+    with trace.stage('standardize', rows_in=len(chunk)) as stage:
+        df = standardize_card(chunk, rng, DateNormalizer(rng, start, end), trace)
+        stage.rows_out = len(df)
+    return df, trace.records()
+
+def standardize_card_chunks(chunks, seed=SEED, workers=None, trace=NULL_TRACER):
+    """
+    standardize_card over an iterable of card chunks in a process pool, yielded in order.
+    The workers' stage records are merged into trace under its open stage.
+    """
+    tasks = ((chunk, seed, i, random_start, random_end) for i, chunk in enumerate(chunks))
+    for df, records in parallel_map(standardize_card_chunk, tasks, workers):
+        trace.merge(records)
+        yield df
+
+def clean_card_parallel(path, seed=SEED, workers=None, chunk_rows=CHUNK_ROWS, trace=NULL_TRACER):
+    """
+    clean_card for the whole card CSV, CHUNK_ROWS rows per pool task.
+
+    Every chunk gets its own seeded generator (chunk_rng), so the result
+    only depends on seed and chunk_rows: workers=1 and workers=32 give the
+    same frame, and the same bytes once written.
+    """
+    chunks = trace.iterate('read', read_card(path, chunksize=chunk_rows))
+    df1 = pd.concat(standardize_card_chunks(chunks, seed, workers, trace), ignore_index=True)
+
+    # Reassign customer IDs
+    with trace.stage('reassign_ids', rows_in=len(df1)):
+        df1 = df1.sort_values('customer_id', kind='stable').reset_index(drop=True)
+        df1['customer_id'] = np.arange(len(df1))
+        return to_schema(df1)
 
 # ----------------------------------------------- Clean and Standardize df2 --------------------------------------------------------------
-print('Loading df2... ⏬⏬')
-print('======================================================')
-print('======================================================')
-# Rename columns
-rename_map = {'Date':'transaction_date','Category':'category','Subcategory':'subcategory','Amount':'amount'}
-df2.rename(columns=rename_map,inplace=True)
-
-##Convert amount to USD
-inr_to_usd = 1/86
-df2['amount'] = df2['amount'] * inr_to_usd
-df2['category'] = df2['category'].astype(str).str.lower().str.replace(' ','_')
-
-##Generate merchant
-df2['merchant'] = generate_merchant(df2)
-
-##Generate subcategory with merchant-specific mapping
-df2['subcategory'] = generate_subcategory(df2)
-
-##Standardize date format
-df2['transaction_date'] = pd.to_datetime(df2['transaction_date'], errors='coerce')
-mask = df2['transaction_date'].isna()
-df2.loc[mask,'transaction_date'] = df2.loc[mask].apply(lambda _: random_datetime(random_start,random_end), axis=1)
-df2['transaction_date'] = pd.to_datetime(df2['transaction_date']).dt.strftime('%m/%d/%Y %H:%M:%S')
-
-# Assign customer IDs after df1
-start_id = df1['customer_id'].max() + 1
-df2 = df2.reset_index(drop=True)
-df2['customer_id'] = df2.index + start_id
-df2 = df2[['customer_id','transaction_date','merchant','category','subcategory','amount']]
-
-# ------------------ Visualize df2 ------------------
-cat_sum_2 = df2.groupby('category')['amount'].sum().sort_values()
-n_cat_2 = len(cat_sum_2)
-
-plt.figure(figsize=(12, max(6, 0.3 * n_cat_2)))  # Dynamically scaled height
-plt.barh(cat_sum_2.index, cat_sum_2.values,color=pastel_cmap.colors[:n_cat_2])
-plt.title('Daily Household Transactions by Category (USD)')
-plt.xlabel('Total Amount (USD)')
-plt.tight_layout()
-
-# Save in folder
-plt.savefig(os.path.join(data_info_path, 'df2_histogram.png'))
-plt.close()
-
-# ------------------ Merge df1 and df2 ------------------
-merged_df = pd.concat([df1, df2], ignore_index=True)
-
-##Sort by dates
-merged_df.sort_values(by='transaction_date', inplace=True)
-merged_df.reset_index(drop=True, inplace=True)
-
-# Keep only required columns
-merged_df = merged_df[['customer_id', 'transaction_date', 'merchant', 'amount', 'category', 'subcategory']]
-# ------------------ Visualization of Merged Dataset ------------------
-print('Merging datasets... ⛓️⛓️')
-print('======================================================')
-print('======================================================')
-
-category_totals = merged_df.groupby('category')['amount'].sum().sort_values()
-num_categories = len(category_totals)
-colors = cm.get_cmap('tab20', num_categories)(range(num_categories))  # distinct colors
-
-## Save CSV
-os.makedirs(after_merge, exist_ok=True)
-merged_df.to_csv(os.path.join(after_merge, 'merged_transactions.csv'), index=False)
-
-##Plot merged
-cat_sum_merge = merged_df.groupby('category')['amount'].sum().sort_values()
-plt.figure(figsize=(14, max(8, 0.3 * len(cat_sum_merge))))# Dynamically adjust height
-plt.barh(cat_sum_merge.index, cat_sum_merge.values, color=pastel_cmap.colors[:len(cat_sum_merge)])
-plt.title('All Transactions by Category (USD)')
-plt.xlabel('Total Amount (USD)')
-plt.tight_layout()
-plt.savefig(os.path.join(after_merge, 'merge_histogram.png'))
-plt.show()
-plt.close()
-
-print('======================================================')
-print("🟢🔵🟢🔵🟢🔵🟢")
-print("Processing complete. Histograms saved as:")
-print(" - df1_histogram.png ✔️")
-print(" - df2_histogram.png ✔️")
-print(" - merge.png ✔️")
-print("Files generated")
-print('Done')
+def clean_household(df2, rng, start_id, dates=None, trace=NULL_TRACER):
+    """Rename, convert to USD, synthesize merchant/subcategory, fix dates and assign IDs after df1."""
+    # Rename columns
+    rename_map = {'Date':'transaction_date','Category':'category','Subcategory':'subcategory','Amount':'amount'}
+    df2 = df2.rename(columns=rename_map)
+
+    ##Convert amount to USD
+    inr_to_usd = 1/86
+    df2['amount'] = df2['amount'] * inr_to_usd
+    df2['category'] = df2['category'].astype(str).str.lower().str.replace(' ','_')
+
+    ##Generate merchant and subcategory (merchant-specific mapping applied)
+    with trace.stage('merchants', rows_in=len(df2)):
+        df2['merchant'], df2['subcategory'] = generate_merchant_subcategory(df2['category'], rng)
+
+    ##Standardize date format (DD/MM/YYYY with or without time; random time added when missing)
+    with trace.stage('dates', rows_in=len(df2)):
+        dates = dates or DateNormalizer(rng, random_start, random_end)
+        df2['transaction_date'] = dates.normalize(df2['transaction_date'])
+
+    # Assign customer IDs after df1
+    df2 = df2.reset_index(drop=True)
+    df2['customer_id'] = df2.index + start_id
+    return to_schema(df2)
+
+# ----------------------------------------------- Merge df1 and df2 --------------------------------------------------------------
+def merge_frames(df1, df2):
+    merged_df = pd.concat([df1, df2], ignore_index=True)
+
+    ##concat drops to object when the categories differ, so union them instead
+    for col in TEXT_COLUMNS:
+        merged_df[col] = pd.api.types.union_categoricals([df1[col], df2[col]], ignore_order=True)
+
+    ##Sort by dates (datetime64, so truly chronological)
+    merged_df.sort_values(by='transaction_date', kind='stable', inplace=True)
+    merged_df.reset_index(drop=True, inplace=True)
+
+    # Keep only required columns
+    return merged_df[MERGED_COLUMNS]
+
+##-----------------------------------------------------------------------------------------------------------------------------
+"""MAIN"""
+##-----------------------------------------------------------------------------------------------------------------------------
+def main(card_file=card_path, household_file=household_path, info_dir=data_info_path, out_dir=after_merge,
+         seed=SEED, workers=None, trace=None, trace_file=None, profile_dir=None):
+    """
+    Args:
+        trace (stage_trace.Tracer): Record the stages here (a new one by default).
+        trace_file (str): JSON trace of the stages (default: merge_trace.json in out_dir).
+        profile_dir (str): Also dump a cProfile of every stage into this folder.
+
+    Returns:
+        stage_trace.Tracer of the run.
+    """
+    trace = trace or Tracer('merge', profile_dir)
+    rng = np.random.default_rng(seed)
+    dates = DateNormalizer(rng, random_start, random_end)
+
+    print('Loading df1... ⏬⏬')
+    print('======================================================')
+    print('======================================================')
+    with trace.stage('load_card') as stage:
+        df1 = clean_card_parallel(card_file, seed, workers, trace=trace)
+        stage.rows_out = len(df1)
+    with trace.stage('rollup', rows_in=len(df1)):
+        cube = RollupCube().update(df1, 'card')
+
+    # ------------------ Visualize df1 ------------------
+    with trace.stage('plot'):
+        plot_totals(cube.category_totals('card'), 'Credit Card Transactions by Category (USD)', os.path.join(info_dir, 'd1_histogram.png'))
+
+    print('Loading df2... ⏬⏬')
+    print('======================================================')
+    print('======================================================')
+    with trace.stage('load_household') as stage:
+        with trace.stage('read') as read:
+            df2 = read_household(household_file)
+            read.rows_out = len(df2)
+        df2 = clean_household(df2, rng, start_id=df1['customer_id'].max() + 1, dates=dates, trace=trace)
+        stage.rows_out = len(df2)
+    with trace.stage('rollup', rows_in=len(df2)):
+        cube.update(df2, 'household')
+
+    # ------------------ Visualize df2 ------------------
+    with trace.stage('plot'):
+        plot_totals(cube.category_totals('household'), 'Daily Household Transactions by Category (USD)', os.path.join(info_dir, 'df2_histogram.png'))
+
+    # ------------------ Visualization of Merged Dataset ------------------
+    print('Merging datasets... ⛓️⛓️')
+    print('======================================================')
+    print('======================================================')
+    with trace.stage('merge_sort', rows_in=len(df1) + len(df2)) as stage:
+        merged_df = merge_frames(df1, df2)
+        stage.rows_out = len(merged_df)
+
+    ## Save CSV
+    os.makedirs(out_dir, exist_ok=True)
+    with trace.stage('write_csv', rows_in=len(merged_df)):
+        write_csv(merged_df, os.path.join(out_dir, 'merged_transactions.csv'))
+
+    ##Columnar copy partitioned by month (needs pyarrow)
+    try:
+        import columnar_store
+    except ImportError:
+        print('pyarrow not installed, skipping Parquet output')
+    else:
+        with trace.stage('write_parquet', rows_in=len(merged_df)):
+            columnar_store.write_dataset(merged_df, os.path.join(out_dir, 'merged_transactions'))
+
+    ##Memory-mapped columns + customer/merchant/category indexes for point and range queries
+    import transaction_index
+    with trace.stage('write_index', rows_in=len(merged_df)):
+        transaction_index.build_index(merged_df, os.path.join(out_dir, 'merged_transactions.idx'),
+                                      source=os.path.join(out_dir, 'merged_transactions.csv'))
+
+    ##Rollup cube (sum/count/min/max by category x subcategory x merchant x day)
+    with trace.stage('save_rollup'):
+        cube.save(os.path.join(out_dir, 'rollup.pkl'))
+
+    ##Plot merged
+    with trace.stage('plot'):
+        plot_totals(cube.category_totals(), 'All Transactions by Category (USD)', os.path.join(out_dir, 'merge_histogram.png'), figsize=(14, 8))
+
+    trace_file = trace.write(trace_file or os.path.join(out_dir, 'merge_trace.json'))
+    print('======================================================')
+    print("🟢🔵🟢🔵🟢🔵🟢")
+    print("Processing complete. Histograms saved as:")
+    print(" - df1_histogram.png ✔️")
+    print(" - df2_histogram.png ✔️")
+    print(" - merge.png ✔️")
+    print("Files generated")
+    print(trace.summary())
+    print(f"Stage trace saved to {trace_file}")
+    print('Done')
+    return trace
+
+
+if __name__ == "__main__":
+    main()
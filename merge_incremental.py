@@ -0,0 +1,404 @@
+"""
+==============================================================================
+ Incremental Merge
+==============================================================================
+Keeps after_merge/merged_transactions.csv up to date without redoing the
+whole merge. A manifest (after_merge/merge_manifest.json) records, per source
+file: size, mtime, sha256 of the processed bytes, the byte offset / row count
+processed so far and the customer ID ranges its rows own. For the output it
+records the last date written and a sparse [byte_offset, first_date] index.
+
+Each run:
+# 1. Unchanged sources (same size and mtime) are skipped without being read.
+# 2. Appended sources (the processed prefix still hashes the same) only have
+#    their new rows read, cleaned and given fresh customer IDs after the
+#    current maximum, so existing IDs never move.
+# 3. Rewritten sources are reprocessed in full; their rows reuse the ID ranges
+#    the source already owned (same IDs when the row count is unchanged).
+# 4. New rows that are all newer than the output are appended to it. Otherwise
+#    only the tail of the output from the first affected index entry onwards
+#    is merged again; a rewritten source forces a single streamed pass over
+#    the output to drop its old rows.
+#
+# The rollup cube (rollup.py) is updated with the same new rows; a rewritten
+# source has its cells replaced. When present, the Parquet copy has the month
+# partitions of the new rows rewritten, and the transaction index is removed
+# (or rebuilt, which reads the whole output, with --rebuild-index).
+#
+# Without a manifest (first run) the full bounded-memory merge from
+# merge_stream.py is run and the manifest is created from it.
+
+Usage:
+    python merge_incremental.py
+    python merge_incremental.py --card new_export.csv --out-dir /data/after_merge
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import merge_data as md
+import merge_stream as ms
+from date_normalize import DateNormalizer, fixed_layout, parse_fixed
+from rollup import RollupCube
+
+MANIFEST = 'merge_manifest.json'
+OUTPUT = 'merged_transactions.csv'
+ROLLUP = 'rollup.pkl'
+HASH_BLOCK = 1 << 20
+
+#------------------------------------------------------- FILE STATE -----------------------------------------------
+def data_end(path):
+    """Byte offset just past the last complete line (a half-written last line is left for next time)."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            step = min(HASH_BLOCK, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            nl = block.rfind(b'\n')
+            if nl >= 0:
+                return pos - step + nl + 1
+            pos -= step
+    return 0
+
+def hash_prefix(path, nbytes):
+    """sha256 of the first nbytes of a file, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        left = nbytes
+        while left > 0:
+            block = f.read(min(HASH_BLOCK, left))
+            if not block:
+                break
+            h.update(block)
+            left -= len(block)
+    return h.hexdigest()
+
+def source_state(path, offset, rows, ids):
+    st = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': hash_prefix(path, offset),
+        'offset': offset,
+        'rows': rows,
+        'ids': ids,
+    }
+
+def read_slice(path, start, end, reader):
+    """Parse bytes [start, end) of a CSV (plus its header line) with reader."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(start, len(header)))
+        body = f.read(max(0, end - max(start, len(header))))
+    return reader(io.BytesIO(header + body))
+
+#------------------------------------------------------- CUSTOMER IDS -----------------------------------------------
+def take_ids(ranges, n, next_id):
+    """First n IDs from the [start, stop) ranges in order, then from next_id on. Returns (ids, next_id)."""
+    parts, left = [], n
+    for start, stop in ranges:
+        if not left:
+            break
+        k = min(left, stop - start)
+        parts.append(np.arange(start, start + k))
+        left -= k
+    parts.append(np.arange(next_id, next_id + left))
+    return np.concatenate(parts).astype(np.int64), next_id + left
+
+def to_ranges(ids):
+    """Sorted [start, stop) ranges covering a set of IDs."""
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    if not len(ids):
+        return []
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = ids[np.r_[0, breaks]]
+    stops = ids[np.r_[breaks - 1, len(ids) - 1]] + 1
+    return [[int(a), int(b)] for a, b in zip(starts, stops)]
+
+def in_ranges(ids, ranges):
+    """Boolean mask of ids falling in any [start, stop) range."""
+    if not ranges:
+        return np.zeros(len(ids), dtype=bool)
+    ranges = sorted(ranges)
+    starts = np.array([r[0] for r in ranges])
+    stops = np.array([r[1] for r in ranges])
+    pos = np.searchsorted(starts, ids, side='right') - 1
+    return (pos >= 0) & (ids < stops[np.maximum(pos, 0)])
+
+#------------------------------------------------------- CLEANING -----------------------------------------------
+def clean_new_card(df, rng, dates, ranges, next_id):
+    """Clean card rows; IDs follow original-ID order, drawn from ranges then next_id."""
+    df = md.standardize_card(df, rng, dates)
+    df = df.sort_values('customer_id', kind='stable').reset_index(drop=True)
+    df['customer_id'], next_id = take_ids(ranges, len(df), next_id)
+    return md.to_schema(df), next_id
+
+def clean_new_household(df, rng, dates, ranges, next_id):
+    """Clean household rows; IDs in file order, drawn from ranges then next_id."""
+    df = md.clean_household(df, rng, start_id=0, dates=dates)
+    df['customer_id'], next_id = take_ids(ranges, len(df), next_id)
+    return md.to_schema(df), next_id
+
+#------------------------------------------------------- OUTPUT -----------------------------------------------
+def read_output(path_or_buf, chunk_rows, has_header=True):
+    """Stream an existing merged CSV back as typed blocks (dates decoded from their fixed layout)."""
+    layout = fixed_layout(md.DATE_FORMAT)
+    kwargs = {} if has_header else {'header': None, 'names': md.MERGED_COLUMNS}
+    ##round_trip so rewritten amounts come out byte-identical
+    for chunk in pd.read_csv(path_or_buf, chunksize=chunk_rows, float_precision='round_trip', **kwargs):
+        values, _ = parse_fixed(chunk['transaction_date'].to_numpy(dtype=object), layout)
+        chunk['transaction_date'] = values.view('datetime64[ns]')
+        yield chunk
+
+def copy_bytes(src, dst, n, block=1 << 20):
+    """Copy the next n bytes of src to dst."""
+    while n > 0:
+        data = src.read(min(block, n))
+        if not data:
+            break
+        dst.write(data)
+        n -= len(data)
+
+def month_rows(csv_file, manifest, months, chunk_rows):
+    """Blocks of the output's rows in the given months (datetime64[M], sorted), read from the index entry before the first."""
+    first = int(months[0].astype('datetime64[ns]').astype(np.int64))
+    end = int((months[-1] + 1).astype('datetime64[ns]').astype(np.int64))
+    entries = manifest['output']['index']
+    offset = max([entry[0] for entry in entries if entry[1] <= first], default=0)
+    with open(csv_file, 'rb') as f:
+        f.seek(offset)
+        for block in read_output(f, chunk_rows, has_header=(offset == 0)):
+            dates = block[ms.KEY].to_numpy()
+            if dates[0].astype(np.int64) >= end:
+                break
+            keep = np.isin(dates.astype('datetime64[M]'), months)
+            if keep.any():
+                yield block[keep]
+
+def refresh_copies(out_dir, manifest, new_rows, full, chunk_rows, rebuild_index=False):
+    """
+    Keep the Parquet dataset and the transaction index (when present) in line
+    with the updated CSV, so readers that prefer them (read_info.profile,
+    spending_track query) never see old rows.
+
+    # - Parquet: only the month partitions of the new rows are rewritten, from
+    #   those months' rows of the CSV (found through its offset index). With
+    #   full (a rewritten source has rows in every month, a full build
+    #   replaced everything) it is rebuilt whole.
+    # - Index: one structure over all rows, so rebuilding it reads the whole
+    #   output - as slow as a full merge's write_index. That is only done with
+    #   rebuild_index; otherwise the stale index is removed (spending_track
+    #   query --build recreates it).
+    """
+    csv_file = os.path.join(out_dir, OUTPUT)
+    parquet = os.path.join(out_dir, 'merged_transactions')
+    if os.path.isdir(parquet):
+        import columnar_store
+        if full:
+            tmp = parquet + '.tmp'
+            columnar_store.csv_to_parquet(csv_file, tmp, chunk_rows)
+            shutil.rmtree(parquet)
+            os.replace(tmp, parquet)
+        elif len(new_rows):
+            months = np.unique(new_rows[ms.KEY].to_numpy().astype('datetime64[M]'))
+            columnar_store.replace_months(month_rows(csv_file, manifest, months, chunk_rows), parquet,
+                                          {str(month) for month in months})
+    index = os.path.join(out_dir, 'merged_transactions.idx')
+    if os.path.isdir(index):
+        if rebuild_index:
+            import transaction_index
+            transaction_index.build_from_file(csv_file, index, chunk_rows)
+        else:
+            shutil.rmtree(index)
+
+def update_output(out_file, manifest, new_rows, drop_ranges, chunk_rows):
+    """
+    Fold new_rows into the sorted output and drop rows whose IDs are in drop_ranges.
+
+    Only the part of the file from the first affected index entry onwards is
+    parsed and merged again; the bytes before it are copied as they are. The
+    result is written to a sibling temp file that replaces the output only
+    once complete, so a failure leaves the old output (and manifest) intact.
+    """
+    out = manifest['output']
+    new_rows = new_rows.sort_values(ms.KEY, kind='stable')
+    first_new = int(new_rows[ms.KEY].iat[0].value) if len(new_rows) else None
+
+    ##Fast path: nothing to drop and everything is at or after the end of the file
+    if not drop_ranges and first_new is not None and first_new >= out['last_date']:
+        with open(out_file, 'ab') as f:
+            size = f.tell()
+            try:
+                rows, index, last = ms.write_blocks([new_rows], f, header=False, start_row=out['rows'])
+            except BaseException:
+                f.truncate(size)
+                raise
+        out['index'] += index
+        out['rows'] += rows
+        out['last_date'] = last
+        return 'append'
+
+    ##Rewrite point: last index entry starting at or before the earliest new row
+    ##(a dropped source can have rows anywhere, so then everything is rewritten)
+    entries = out['index']
+    keep = 0
+    if not drop_ranges:
+        keep = max([i for i, entry in enumerate(entries) if entry[1] <= first_new], default=0)
+    offset, _, start_row = entries[keep] if entries else (0, 0, 0)
+
+    tmp_file = out_file + '.tmp'
+    try:
+        with open(out_file, 'rb') as src, open(tmp_file, 'wb') as dst:
+            copy_bytes(src, dst, offset)
+            old = read_output(src, chunk_rows, has_header=(offset == 0))
+            if drop_ranges:
+                old = (b[~in_ranges(b['customer_id'].to_numpy(), drop_ranges)] for b in old)
+            rows, index, last = ms.write_blocks(ms.merge_sorted([old, [new_rows]]), dst,
+                                                header=(offset == 0), start_row=start_row)
+        os.replace(tmp_file, out_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    out['index'] = entries[:keep] + index
+    out['rows'] = start_row + rows
+    out['last_date'] = last if last is not None else 0
+    return 'rewrite'
+
+#------------------------------------------------------- MANIFEST -----------------------------------------------
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not all(os.path.exists(os.path.join(out_dir, name)) for name in (MANIFEST, OUTPUT, ROLLUP)):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def full_build(card_file, household_file, out_dir, seed, chunk_rows):
+    """First run: bounded-memory full merge, then record where every source stands."""
+    summary = ms.stream_merge(card_file, household_file, out_dir, chunk_rows=chunk_rows, seed=seed)
+    n_card, n_household = summary['card'], summary['household']
+
+    manifest = {
+        'seed': seed,
+        'run': 0,
+        'next_id': n_card + n_household,
+        'sources': {
+            'card': source_state(card_file, data_end(card_file), n_card, [[0, n_card]] if n_card else []),
+            'household': source_state(household_file, data_end(household_file), n_household,
+                                      [[n_card, n_card + n_household]] if n_household else []),
+        },
+        'output': {
+            'rows': summary['rows'],
+            'last_date': summary['last_date'] or 0,
+            'index': summary['index'],
+        },
+    }
+    save_manifest(out_dir, manifest)
+    return manifest
+
+##-----------------------------------------------------------------------------------------------------------------------------
+"""Incremental merge"""
+##-----------------------------------------------------------------------------------------------------------------------------
+def incremental_merge(card_file, household_file, out_dir, seed=md.SEED, chunk_rows=500_000, rebuild_index=False):
+    """
+    Bring out_dir/merged_transactions.csv up to date with the two sources.
+
+    rebuild_index: rebuild an existing transaction index from the whole output
+    (otherwise it is removed, being stale); see refresh_copies.
+
+    Returns:
+        dict: per source 'unchanged' / 'append' / 'rebuild' / 'full', the
+        number of new rows processed and how the output was updated.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    if manifest is None or manifest.get('seed') != seed:
+        manifest = full_build(card_file, household_file, out_dir, seed, chunk_rows)
+        refresh_copies(out_dir, manifest, None, True, chunk_rows, rebuild_index)
+        return {'card': 'full', 'household': 'full', 'new_rows': manifest['output']['rows'], 'output': 'full'}
+
+    ##Fresh, reproducible random stream per run
+    manifest['run'] += 1
+    rng = np.random.default_rng([seed, manifest['run']])
+    dates = DateNormalizer(rng, md.random_start, md.random_end)
+
+    cube = RollupCube.load(os.path.join(out_dir, ROLLUP))
+    report, frames, drop_ranges = {}, [], []
+    next_id = manifest['next_id']
+    sources = [('card', card_file, md.read_card, clean_new_card),
+               ('household', household_file, md.read_household, clean_new_household)]
+
+    for name, path, reader, clean in sources:
+        old = manifest['sources'][name]
+        st = os.stat(path)
+        if os.path.abspath(path) == old['path'] and st.st_size == old['size'] and st.st_mtime_ns == old['mtime_ns']:
+            report[name] = 'unchanged'
+            continue
+
+        end = data_end(path)
+        appended = (os.path.abspath(path) == old['path'] and end >= old['offset']
+                    and hash_prefix(path, old['offset']) == old['sha256'])
+        if appended:
+            ##Only the bytes after the processed offset
+            if end > old['offset']:
+                df, next_id_after = clean(read_slice(path, old['offset'], end, reader), rng, dates, [], next_id)
+                frames.append(df)
+                cube.update(df, name)
+                new_ids = old['ids'] + to_ranges(np.arange(next_id, next_id_after))
+                next_id = next_id_after
+                rows = old['rows'] + len(df)
+            else:
+                new_ids, rows = old['ids'], old['rows']
+            report[name] = 'append'
+        else:
+            ##Rewritten: reprocess everything, reusing the IDs this source owned
+            df, next_id = clean(reader(path), rng, dates, old['ids'], next_id)
+            frames.append(df)
+            cube.replace_source(df, name)
+            drop_ranges += old['ids']
+            new_ids, rows = to_ranges(df['customer_id'].to_numpy()), len(df)
+            report[name] = 'rebuild'
+        manifest['sources'][name] = source_state(path, end, rows, new_ids)
+
+    new_rows = pd.concat(frames, ignore_index=True) if frames else None
+    report['new_rows'] = 0 if new_rows is None else len(new_rows)
+    if new_rows is not None and (len(new_rows) or drop_ranges):
+        report['output'] = update_output(os.path.join(out_dir, OUTPUT), manifest, new_rows, drop_ranges, chunk_rows)
+        refresh_copies(out_dir, manifest, new_rows, bool(drop_ranges), chunk_rows, rebuild_index)
+    else:
+        report['output'] = 'unchanged'
+
+    manifest['next_id'] = next_id
+    cube.save(os.path.join(out_dir, ROLLUP))
+    save_manifest(out_dir, manifest)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Incrementally refresh merged_transactions.csv.')
+    parser.add_argument('--card', default=md.card_path)
+    parser.add_argument('--household', default=md.household_path)
+    parser.add_argument('--out-dir', default=md.after_merge)
+    parser.add_argument('--chunk-rows', type=int, default=500_000)
+    parser.add_argument('--seed', type=int, default=md.SEED)
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='rebuild the transaction index (reads the whole output) instead of removing it')
+    args = parser.parse_args()
+
+    print(incremental_merge(args.card, args.household, args.out_dir, args.seed, args.chunk_rows, args.rebuild_index))
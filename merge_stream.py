@@ -0,0 +1,235 @@
+"""
+==============================================================================
+ Streaming (Bounded-Memory) Merge
+==============================================================================
+Same output as merge_data.py, built without holding either dataset in memory,
+as long as chunk_rows is merge_data.CHUNK_ROWS (the default) and the household
+file fits in one chunk: card chunk i draws from chunk_rng(seed, i) and
+household chunks share one generator, so the random merchants, subcategories
+and imputed dates follow the chunk boundaries. Another chunk_rows gives an
+equally valid, reproducible, but different merge.
+
+Processing Steps:
+# 1. Read only the customer_id column of the card file to count rows and work
+#    out the reassigned IDs (row position when already sorted, otherwise the
+#    stable rank of the original ID).
+# 2. Stream both CSVs in fixed-size chunks through the same helpers as
+#    merge_data.py (standardize_card / clean_household). Card chunks are
+#    standardized in a process pool (--workers), one seeded generator per chunk.
+# 3. Sort every cleaned chunk by transaction_date and spill it to disk as a
+#    sorted run (pickled blocks).
+# 4. External merge: combine the runs block by block into
+#    merged_transactions.csv.
+#
+# Peak memory is roughly one chunk plus one block per run, so a 50M-row card
+# export can be merged with a few GB of RAM. The rollup cube (rollup.py) is
+# updated per chunk, so the histograms are still produced.
+
+Usage:
+    python merge_stream.py --chunk-rows 500000 --tmp-dir /scratch
+"""
+import argparse
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import merge_data as md
+from date_normalize import DateNormalizer
+from rollup import RollupCube, plot_histograms
+
+##Runs are sorted on the typed datetime64 column itself
+KEY = 'transaction_date'
+
+##Rows between entries of the sparse output index (see write_blocks)
+INDEX_EVERY = 65_536
+
+#------------------------------------------------------- HELPERS -----------------------------------------------
+def card_id_ranks(card_file, chunk_rows):
+    """
+    Count card rows and compute their reassigned customer IDs.
+
+    Reads only the first column. Returns (n_rows, ranks) where ranks is None
+    when the original IDs are already non-decreasing (new ID = row position),
+    otherwise an int64 array with the stable rank of each row's original ID.
+    """
+    n_rows, last, ordered = 0, None, True
+    for chunk in pd.read_csv(card_file, usecols=[0], chunksize=chunk_rows):
+        ids = chunk.iloc[:, 0].to_numpy()
+        n_rows += len(ids)
+        if ordered and len(ids):
+            ordered = (last is None or ids[0] >= last) and bool(np.all(ids[1:] >= ids[:-1]))
+            last = ids[-1]
+    if ordered:
+        return n_rows, None
+
+    ##Unsorted IDs: one int64 column is all that has to fit in memory
+    ids = pd.read_csv(card_file, usecols=[0]).iloc[:, 0].to_numpy()
+    ranks = np.empty(len(ids), dtype=np.int64)
+    ranks[np.argsort(ids, kind='stable')] = np.arange(len(ids))
+    return n_rows, ranks
+
+##Sort one cleaned chunk by date and spill it as a run of pickled blocks
+def write_run(df, run_dir, run_id, block_rows):
+    df = df.sort_values(KEY, kind='stable')
+
+    path = os.path.join(run_dir, f'run_{run_id:05d}.pkl')
+    with open(path, 'wb') as f:
+        for start in range(0, len(df), block_rows):
+            pickle.dump(df.iloc[start:start + block_rows], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+def read_run(path):
+    """Yield the blocks of a run in order."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def next_block(reader):
+    """Next non-empty block of a reader, or None when it is exhausted."""
+    for block in reader:
+        if len(block):
+            return block
+    return None
+
+def merge_sorted(sources):
+    """
+    K-way merge of sorted block iterators, yielding sorted frames.
+
+    Every row with key <= the smallest block tail across sources is final (no
+    source can still produce an earlier key), so those rows are sorted together
+    and yielded; the source that owned the smallest tail then loads its next block.
+    """
+    readers = [iter(src) for src in sources]
+    buffers = [next_block(r) for r in readers]
+    while True:
+        live = [i for i, b in enumerate(buffers) if b is not None]
+        if not live:
+            return
+        bound = min(buffers[i][KEY].iat[-1] for i in live)
+
+        ready = []
+        for i in live:
+            block = buffers[i]
+            cut = block[KEY].searchsorted(bound, side='right')
+            ready.append(block.iloc[:cut])
+            buffers[i] = next_block(readers[i]) if cut == len(block) else block.iloc[cut:]
+        yield pd.concat(ready).sort_values(KEY, kind='stable')
+
+def write_blocks(frames, f, header=True, start_row=0, index_every=None):
+    """
+    Append sorted frames to an open binary CSV file.
+
+    Returns (rows, index, last_date_ns). index is a sparse list of
+    [byte_offset, first_date_ns, row_number] entries, about one every
+    index_every (INDEX_EVERY) rows, used to find where a later update has to start
+    rewriting (see merge_incremental.py). An entry written together with the
+    header points at offset 0.
+    """
+    index_every = index_every or INDEX_EVERY
+    rows, index, since, last = 0, [], index_every, None
+    for out in frames:
+        if not len(out):
+            continue
+        if since >= index_every:
+            f.flush()
+            index.append([0 if header else f.tell(), int(out[KEY].iat[0].value), start_row + rows])
+            since = 0
+        md.write_csv(out, f, header=header)
+        header = False
+        rows += len(out)
+        since += len(out)
+        last = int(out[KEY].iat[-1].value)
+    return rows, index, last
+
+def merge_runs(run_paths, out_file):
+    """Merge sorted runs into a fresh CSV. Returns (rows, index, last_date_ns) as write_blocks."""
+    with open(out_file, 'wb') as f:
+        return write_blocks(merge_sorted(read_run(p) for p in run_paths), f)
+
+##-----------------------------------------------------------------------------------------------------------------------------
+"""Streaming merge"""
+##-----------------------------------------------------------------------------------------------------------------------------
+def stream_merge(card_file, household_file, out_dir, info_dir=None, chunk_rows=md.CHUNK_ROWS,
+                 block_rows=None, tmp_dir=None, seed=md.SEED, workers=None):
+    """
+    Merge both sources into out_dir/merged_transactions.csv with bounded memory.
+
+    Args:
+        chunk_rows (int): Rows read and cleaned per chunk (size of one sorted run).
+            The random fields depend on it (see the module docstring).
+        block_rows (int): Rows per spilled block; defaults to chunk_rows // 32.
+        tmp_dir (str): Where sorted runs are spilled (system temp dir by default).
+        workers (int): Processes for the card transform (all cores by default);
+            the output does not depend on it.
+        info_dir (str): Folder for the per-source histograms (skipped if None).
+
+    Returns:
+        dict with rows written, row counts per source ('card', 'household'),
+        the sparse offset index of the output and its last date (see write_blocks).
+    """
+    rng = np.random.default_rng(seed)
+    dates = DateNormalizer(rng, md.random_start, md.random_end)
+    block_rows = block_rows or max(1_000, chunk_rows // 32)
+    n_card, ranks = card_id_ranks(card_file, chunk_rows)
+
+    cube = RollupCube()
+    os.makedirs(out_dir, exist_ok=True)
+    out_file = os.path.join(out_dir, 'merged_transactions.csv')
+
+    with tempfile.TemporaryDirectory(prefix='merge_runs_', dir=tmp_dir) as run_dir:
+        runs = []
+
+        print('Streaming df1... ⏬⏬')
+        offset = 0
+        for df in md.standardize_card_chunks(md.read_card(card_file, chunksize=chunk_rows), seed, workers):
+            n = len(df)
+            df['customer_id'] = np.arange(offset, offset + n) if ranks is None else ranks[offset:offset + n]
+            df = md.to_schema(df)
+            offset += n
+            cube.update(df, 'card')
+            runs.append(write_run(df, run_dir, len(runs), block_rows))
+
+        print('Streaming df2... ⏬⏬')
+        offset = n_card
+        for chunk in md.read_household(household_file, chunksize=chunk_rows):
+            df = md.clean_household(chunk, rng, start_id=offset, dates=dates)
+            offset += len(df)
+            cube.update(df, 'household')
+            runs.append(write_run(df, run_dir, len(runs), block_rows))
+
+        print(f'Merging {len(runs)} sorted runs... ⛓️⛓️')
+        rows, index, last_date = merge_runs(runs, out_file)
+
+    cube.save(os.path.join(out_dir, 'rollup.pkl'))
+    if info_dir:
+        plot_histograms(cube, info_dir, out_dir)
+    return {'rows': rows, 'card': n_card, 'household': offset - n_card, 'index': index, 'last_date': last_date}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Bounded-memory merge of the card and household datasets.')
+    parser.add_argument('--card', default=md.card_path)
+    parser.add_argument('--household', default=md.household_path)
+    parser.add_argument('--out-dir', default=md.after_merge)
+    parser.add_argument('--info-dir', default=md.data_info_path)
+    parser.add_argument('--chunk-rows', type=int, default=md.CHUNK_ROWS)
+    parser.add_argument('--block-rows', type=int, default=None)
+    parser.add_argument('--tmp-dir', default=None, help='directory for sorted runs')
+    parser.add_argument('--seed', type=int, default=md.SEED)
+    parser.add_argument('--workers', type=int, default=None, help='processes for the card transform (default: all cores)')
+    parser.add_argument('--parquet', action='store_true', help='also write the month-partitioned Parquet dataset')
+    args = parser.parse_args()
+
+    summary = stream_merge(args.card, args.household, args.out_dir, args.info_dir, args.chunk_rows,
+                        args.block_rows, args.tmp_dir, args.seed, args.workers)
+    if args.parquet:
+        import columnar_store
+        columnar_store.csv_to_parquet(os.path.join(args.out_dir, 'merged_transactions.csv'),
+                                      os.path.join(args.out_dir, 'merged_transactions'), args.chunk_rows)
+    print(f"Done: {summary['rows']:,} rows ✔️")
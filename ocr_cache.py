@@ -0,0 +1,133 @@
+"""
+==============================================================================
+ Content-Addressed OCR Cache
+==============================================================================
+On-disk cache for the receipt pipeline (preprocessed images and OCR text).
+Keys are the sha256 of the image bytes plus every parameter that shaped the
+result (preprocessing steps, OCR engine/version/language/config), so an
+edited image or a changed setting is a miss, never a stale hit.
+
+# - Entries live in <root>/<key[:2]>/<key>.txt (OCR text) or .npy (images).
+# - LRU: a hit touches the entry's mtime; when the cache grows past max_bytes
+#   the least recently used entries are deleted down to 90% of it.
+# - hits / misses / evictions are counted per OcrCache instance. Each batch
+#   worker has its own instance on the shared folder; the size it tracks is
+#   its own estimate and is corrected by the directory scan in evict().
+
+Usage:
+    cache = OcrCache('.ocr_cache', max_bytes=256 * 2**20)
+    key = cache.key(content_hash(data), 'text', lang='eng')
+    text = cache.get_text(key)
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EXTENSIONS = ('.txt', '.npy')
+
+def content_hash(data):
+    """sha256 hex of raw bytes, or of a NumPy image (shape and dtype included)."""
+    h = hashlib.sha256()
+    if isinstance(data, np.ndarray):
+        h.update(f'{data.shape}{data.dtype}'.encode())
+        h.update(np.ascontiguousarray(data).data)
+    else:
+        h.update(data)
+    return h.hexdigest()
+
+class OcrCache:
+    """
+    Size-bounded LRU cache of OCR text and preprocessed images.
+
+    Args:
+        root (str): Cache folder (created if missing).
+        max_bytes (int): Size above which least recently used entries are evicted.
+    """
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        self.size = sum(size for _, _, size in self.entries())
+
+    def key(self, image_hash, kind, **params):
+        """Cache key of one result: image content hash + result kind + its parameters."""
+        payload = json.dumps({'image': image_hash, 'kind': kind, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def entries(self):
+        """(path, mtime, size) of every entry."""
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(EXTENSIONS):
+                    path = os.path.join(folder, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:  # evicted by another worker
+                        continue
+                    yield path, st.st_mtime, st.st_size
+
+    ##Read / write
+    def read(self, key, ext, load):
+        path = self.path(key, ext)
+        try:
+            value = load(path)
+            os.utime(path)
+        except (OSError, ValueError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def write(self, key, ext, save):
+        path = self.path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            save(f)
+        os.replace(tmp, path)
+        self.size += os.path.getsize(path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def get_text(self, key):
+        def load(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        return self.read(key, '.txt', load)
+
+    def put_text(self, key, text):
+        self.write(key, '.txt', lambda f: f.write(text.encode('utf-8')))
+
+    def get_array(self, key):
+        return self.read(key, '.npy', lambda path: np.load(path, allow_pickle=False))
+
+    def put_array(self, key, array):
+        self.write(key, '.npy', lambda f: np.save(f, array, allow_pickle=False))
+
+    ##Eviction
+    def evict(self):
+        """Delete least recently used entries until the cache is at 90% of max_bytes."""
+        entries = sorted(self.entries(), key=lambda e: e[1])
+        self.size = sum(size for _, _, size in entries)
+        target = 0.9 * self.max_bytes
+        for path, _, size in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'bytes': self.size}
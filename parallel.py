@@ -0,0 +1,40 @@
+"""
+==============================================================================
+ Ordered Process-Pool Map
+==============================================================================
+Shared by the chunked card transform (merge_data.py) and batch OCR
+(batch_ocr.py). Results come back in input order while at most `window`
+items are in flight, so a lazy reader (CSV chunks, image paths) is never
+consumed far ahead of the caller.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+def parallel_map(fn, items, workers=None, window=None, initializer=None, initargs=()):
+    """
+    Ordered map over a process pool.
+
+    Args:
+        fn (callable): Picklable (module-level) function of one item.
+        items (iterable): Consumed lazily.
+        workers (int): Processes (all cores by default); <= 1 maps in-process.
+        window (int): Items in flight (2 x workers by default).
+        initializer, initargs: Run once per worker before its first item
+            (e.g. to load a model), and once in-process when workers <= 1.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(fn, items)
+        return
+    window = window or 2 * workers
+    with ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
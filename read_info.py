@@ -1,36 +1,351 @@
-import numpy as np 
+"""
+==============================================================================
+ Single-Pass Dataset Profile
+==============================================================================
+Everything read_info.py used to print (head, shape, info, describe, missing
+values, duplicated rows, nunique, category list, dtypes), computed in ONE
+chunked pass with bounded memory, so a 100M-row file profiles like a 1M one.
+
+# - Counts, missing values, min/max and mean/std (Chan's parallel update)
+#   are running totals per chunk.
+# - Quartiles come from a bottom-k random sample of SAMPLE_SIZE values per
+#   numeric column (exact while the column has fewer values than that).
+# - Distinct values and the most frequent value are exact value counts up to
+#   EXACT_DISTINCT keys per column; past that the column switches to a
+#   HyperLogLog sketch (2**HLL_PRECISION registers, ~0.8% error).
+# - Duplicated rows: every row is hashed to 64 bits and the hashes are spilled
+#   to DUPLICATE_PARTS files by their top bits, so counting repeats only ever
+#   loads one file's share of the hashes.
+#
+# The result is a JSON-ready dict (profile) / file (--json).
+
+Usage:
+    python read_info.py dataset/after_merge/merged_transactions.csv --json profile.json
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import random
 
 # ---------------------------------------------------------------------------------------------------------------------------------------
 """Data Reading"""
 # ---------------------------------------------------------------------------------------------------------------------------------------
-# df = pd.read_csv('/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/before_merge/credit_card_transactions.csv')
-# df = pd.read_csv('/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/before_merge/Daily Household Transactions.csv')
-# df = pd.read_csv('/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/after_merge/merged_transactions.csv')
-df = pd.read_csv('/Users/panda/Documents/Work/Work_Main/spending_track/demo_project/dataset/after_merge/merged_transactions.csv')
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+merged_csv = os.path.join(DATASET_DIR, 'after_merge', 'merged_transactions.csv')
+merged_parquet = os.path.join(DATASET_DIR, 'after_merge', 'merged_transactions')
+
+CHUNK_ROWS = 1_000_000
+HEAD_ROWS = 5
+SAMPLE_SIZE = 100_000
+EXACT_DISTINCT = 100_000
+HLL_PRECISION = 14
+DUPLICATE_PARTS = 64
+
+##Text columns with at most this many values get the full list in the report (e.g. the 14 categories)
+MAX_LISTED = 100
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, columns=None, start=None, end=None):
+    """
+    Chunks of the merged transactions.
+
+    Args:
+        path (str): merged_transactions.csv or the Parquet dataset folder.
+        columns (list): Only read these columns.
+        start, end (str): Inclusive date range (Parquet only), e.g. '2019-01-01', '2019-06-30'.
+    """
+    if os.path.isdir(path):
+        from columnar_store import iter_transactions
+        yield from iter_transactions(path, columns=columns, start=start, end=end, batch_rows=chunk_rows)
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+#------------------------------------------------------- SKETCHES -----------------------------------------------
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes (value_hashes)."""
+    def __init__(self, precision=HLL_PRECISION):
+        self.p = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+
+        ##Rank = leading zeros of the remaining bits + 1; frexp gives their bit length
+        _, bits = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, 64 - self.p + 1, 65 - bits).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+
+        ##Small-range correction (linear counting)
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+class DuplicateCounter:
+    """
+    Exact count of repeated rows from 64-bit row hashes.
+
+    Hashes are appended to DUPLICATE_PARTS files chosen by their top bits, so
+    equal rows always land in the same file and each file is counted alone.
+    """
+    def __init__(self, tmp_dir=None, parts=DUPLICATE_PARTS):
+        self.bits = int(parts).bit_length() - 1
+        self.tmp = tempfile.TemporaryDirectory(prefix='profile_', dir=tmp_dir)
+        self.files = [open(os.path.join(self.tmp.name, f'{i:03d}.u64'), 'wb') for i in range(1 << self.bits)]
+
+    def add(self, hashes):
+        """hashes: one uint64 per row (row_hashes)."""
+        part = (hashes >> np.uint64(64 - self.bits)).astype(np.intp)
+        order = np.argsort(part, kind='stable')
+        hashes = hashes[order]
+        bounds = np.searchsorted(part[order], np.arange(len(self.files) + 1))
+        for i, f in enumerate(self.files):
+            if bounds[i] < bounds[i + 1]:
+                hashes[bounds[i]:bounds[i + 1]].tofile(f)
+
+    def count(self):
+        duplicates = 0
+        for f in self.files:
+            f.close()
+            hashes = np.fromfile(f.name, dtype=np.uint64)
+            duplicates += len(hashes) - len(np.unique(hashes))
+        return duplicates
+
+    def close(self):
+        for f in self.files:
+            f.close()
+        self.tmp.cleanup()
+
+#------------------------------------------------------- COLUMNS -----------------------------------------------
+def plain(value):
+    """JSON-safe scalar."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return value.item() if hasattr(value, 'item') else value
+
+def kind_of(series):
+    """'numeric', 'datetime' or 'text', decided from the first chunk and kept for the whole file."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return 'numeric'
+    return 'text'
+
+def coerce(series, kind):
+    """Same dtype for every chunk (a chunk with only NaN would otherwise turn float), so hashes agree."""
+    if kind == 'numeric':
+        return pd.to_numeric(series, errors='coerce').astype(np.float64)
+    if kind == 'datetime':
+        return pd.to_datetime(series, errors='coerce')
+    if pd.api.types.is_string_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype(object)
+
+def value_hashes(values):
+    """64-bit hash per value; equal values hash equally whatever the string dtype (object, str, category)."""
+    return pd.util.hash_pandas_object(pd.Series(values), index=False, categorize=False).to_numpy()
+
+def row_hashes(column_hashes):
+    """Fold the per-column hashes of a chunk into one 64-bit hash per row."""
+    rows = column_hashes[0].copy()
+    for hashes in column_hashes[1:]:
+        rows = (rows * np.uint64(0x100000001B3)) ^ hashes
+    return rows
+
+class ColumnProfile:
+    """Running statistics of one column."""
+    def __init__(self, name, kind, dtype, rng):
+        self.name = name
+        self.kind = kind
+        self.dtype = dtype
+        self.rng = rng
+        self.rows = 0
+        self.missing = 0
+
+        ##Exact value counts until EXACT_DISTINCT keys, then a HyperLogLog
+        self.counts = pd.Series(dtype=np.int64)
+        self.hll = None
+
+        ##Numeric / datetime
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = None, None
+        self.sample = np.empty(0, dtype=np.float64)
+        self.sample_keys = np.empty(0, dtype=np.float64)
+
+    def update(self, series, hashes):
+        """series: one coerced chunk of the column, hashes: its value_hashes."""
+        present = series.notna().to_numpy()
+        valid = series[present]
+        self.rows += len(series)
+        self.missing += len(series) - len(valid)
+        if not len(valid):
+            return
+        self.update_distinct(valid, hashes[present])
+        if self.kind == 'text':
+            return
+
+        lo, hi = valid.min(), valid.max()
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        if self.kind == 'numeric':
+            self.update_moments(valid.to_numpy(dtype=np.float64))
+
+    def update_distinct(self, valid, hashes):
+        if self.hll is None:
+            ##Categorical columns also list their unobserved categories, with count 0
+            counts = valid.value_counts(sort=False)
+            self.counts = self.counts.add(counts[counts > 0], fill_value=0).astype(np.int64)
+            if len(self.counts) <= EXACT_DISTINCT:
+                return
+            self.hll = HyperLogLog()
+            self.hll.add_hashes(value_hashes(self.counts.index))
+            self.counts = None
+        else:
+            self.hll.add_hashes(hashes)
+
+    def update_moments(self, x):
+        ##Chan et al. pairwise update of count / mean / sum of squared deviations
+        n_chunk, mean_chunk = len(x), x.mean()
+        n = self.n + n_chunk
+        delta = mean_chunk - self.mean
+        self.m2 += ((x - mean_chunk) ** 2).sum() + delta * delta * self.n * n_chunk / n
+        self.mean += delta * n_chunk / n
+        self.n = n
+
+        ##Bottom-k sample: keep the SAMPLE_SIZE values with the smallest random keys
+        keys = np.concatenate([self.sample_keys, self.rng.random(n_chunk)])
+        values = np.concatenate([self.sample, x])
+        if len(keys) > SAMPLE_SIZE:
+            keep = np.argpartition(keys, SAMPLE_SIZE)[:SAMPLE_SIZE]
+            keys, values = keys[keep], values[keep]
+        self.sample_keys, self.sample = keys, values
+
+    def report(self):
+        out = {'kind': self.kind, 'dtype': self.dtype, 'non_null': self.rows - self.missing, 'missing': self.missing}
+        if self.hll is None:
+            out['distinct'] = len(self.counts)
+            out['distinct_exact'] = True
+            if self.kind == 'text' and len(self.counts):
+                out['top'] = plain(self.counts.idxmax())
+                out['freq'] = int(self.counts.max())
+                if len(self.counts) <= MAX_LISTED:
+                    out['values'] = sorted(plain(v) for v in self.counts.index)
+        else:
+            out['distinct'] = self.hll.count()
+            out['distinct_exact'] = False
+
+        if self.kind in ('numeric', 'datetime') and self.min is not None:
+            out['min'], out['max'] = plain(self.min), plain(self.max)
+        if self.kind == 'numeric' and self.n:
+            q25, q50, q75 = np.quantile(self.sample, [0.25, 0.5, 0.75])
+            out.update({
+                'mean': float(self.mean),
+                'std': float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else None,
+                '25%': float(q25), '50%': float(q50), '75%': float(q75),
+                'quartiles_exact': self.n <= SAMPLE_SIZE,
+            })
+        return out
+
+# ---------------------------------------------------------------------------------------------------------------------------------------
+"""Profile"""
+# ---------------------------------------------------------------------------------------------------------------------------------------
+def profile(path=None, chunk_rows=CHUNK_ROWS, columns=None, start=None, end=None, tmp_dir=None, seed=0):
+    """
+    Profile the merged transactions in one pass.
+
+    Args:
+        path (str): merged_transactions.csv or the Parquet dataset folder. By
+            default the Parquet copy when it exists, otherwise the CSV.
+        chunk_rows (int): Rows per chunk (memory is about one chunk plus the sketches).
+        columns, start, end: Passed to iter_chunks.
+        tmp_dir (str): Where row hashes are spilled for the duplicate count.
+        seed (int): Seed of the quartile sample.
+
+    Returns:
+        dict: source, rows, columns, head, duplicate_rows and per-column stats.
+    """
+    if path is None:
+        path = merged_parquet if os.path.isdir(merged_parquet) else merged_csv
+    rng = np.random.default_rng(seed)
+    stats, head, rows = {}, [], 0
+
+    duplicates = DuplicateCounter(tmp_dir)
+    try:
+        for chunk in iter_chunks(path, chunk_rows, columns, start, end):
+            if not stats:
+                head = json.loads(chunk.head(HEAD_ROWS).to_json(orient='records', date_format='iso'))
+                stats = {c: ColumnProfile(c, kind_of(chunk[c]), str(chunk[c].dtype), rng) for c in chunk.columns}
+            hashes = []
+            for c, col in stats.items():
+                values = coerce(chunk[c], col.kind)
+                hashes.append(value_hashes(values))
+                col.update(values, hashes[-1])
+            duplicates.add(row_hashes(hashes))
+            rows += len(chunk)
+        duplicate_rows = duplicates.count()
+    finally:
+        duplicates.close()
+
+    return {
+        'source': path,
+        'rows': rows,
+        'columns': list(stats),
+        'head': head,
+        'duplicate_rows': duplicate_rows,
+        'column_stats': {c: col.report() for c, col in stats.items()},
+    }
+
+def main(path=None, columns=None, start=None, end=None, chunk_rows=CHUNK_ROWS, report_file=None):
+    report = profile(path, chunk_rows, columns, start, end)
+    table = pd.DataFrame(report['column_stats']).T
+
+    ##Check the dataset info
+    print("(1) -- General view 0:\n", pd.DataFrame(report['head']))
+    print("(2) -- Shape of the dataset:", (report['rows'], len(report['columns'])))
+    print("(3) -- Info of the dataset:\n", table[['dtype', 'non_null']])
+    described = [c for c in ['mean', 'std', 'min', '25%', '50%', '75%', 'max'] if c in table]
+    print("(4) -- Describe of the dataset:\n", table.loc[table['kind'] != 'text', described])
+    print("(5) -- Columns of the dataset:", report['columns'])
 
-##Check the dataset info
-print("(1) -- General view 0:\n",df.head())
-print("(2) -- Shape of the dataset:",df.shape)
-print("(3) -- Info of the dataset:",df.info())
-print("(4) -- Info of the dataset:",df.describe())
-print("(5) -- Columns of the dataset:",df.columns)
+    #Check missing values
+    print("(6) -- Missing values of the dataset:\n", table['missing'])
 
-#Check missing values
-print("(6) -- Missing values of the dataset:",df.isnull().sum())
-print("(7) -- Missing values of the dataset:",df.isna().sum())
+    #Check duplicated values
+    print("(7) -- Duplicated values of the dataset: ", report['duplicate_rows'])
 
-#Check duplicated values
-print("(8) -- Duplicated values of the dataset: ",df.duplicated().sum())
+    #Check unique values (~ = HyperLogLog estimate)
+    print("(8) -- Unique values of the dataset:\n",
+          table.apply(lambda r: f"{r['distinct']:,}" + ('' if r['distinct_exact'] else ' (~)'), axis=1))
 
-#Check unique values
-print("(9) -- Unique values of the dataset:",df.nunique())
+    #List all categories (Total 14)
+    if 'category' in report['column_stats']:
+        print("(9) -- List all categories:\n", report['column_stats']['category'].get('values'))
 
-#List all categories (Total 14) 
-print("(10) -- List all categories:\n",df.category.unique())
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {report_file}")
+    return report
 
-#Check data types
-print("(11) -- Data types of the dataset:",df.dtypes)
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Single-pass profile of the merged transactions.')
+    parser.add_argument('path', nargs='?', default=None, help='merged CSV or Parquet folder')
+    parser.add_argument('--columns', nargs='+', default=None)
+    parser.add_argument('--start', default=None, help='Parquet: first date, e.g. 2019-01-01')
+    parser.add_argument('--end', default=None, help='Parquet: last date, e.g. 2019-06-30')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--json', default=None, help='write the report to this file')
+    args = parser.parse_args()
+    main(args.path, args.columns, args.start, args.end, args.chunk_rows, args.json)
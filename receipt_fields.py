@@ -0,0 +1,259 @@
+"""
+==============================================================================
+ Receipt Field Extraction
+==============================================================================
+Turns OCR text into structured fields (merchant, date, total, line items)
+with their character positions.
+
+Every pattern is compiled ONCE into a single multi-line regex of named
+alternatives (labels and summary words case-insensitive), so each text is scanned in one pass instead of
+trying ReceiptOCR's former pattern lists one after another ('TOTAL'/'Total' and
+'Amount'/'AMOUNT' collapse into one label list):
+
+# - merchant: the first line that starts with a letter and is not a total,
+#             item or date line
+# - total:    a line starting with a TOTAL_LABELS word (or 'Grand Total') and an
+#             amount; without one, the last amount that ends a line
+#             (ReceiptOCR's r'(\\d+\\.\\d{2})\\s*$')
+# - item:     a line starting with a word and ending in a price, unless its first
+#             or second word is one of SUMMARY_WORDS (tax, change, ...)
+# - date:     any of DATE_PATTERNS (the first one found is the receipt date)
+
+extract_batch() handles thousands of texts: the scan loop only records
+spans, and the values (prices, totals, summary-line filter) are parsed a
+column at a time with pyarrow kernels into a receipts and an items frame,
+optionally on a process pool. parse_item_prices() is the vectorized
+version of parse_item_price.
+
+Usage:
+    fields = FieldExtractor().extract(text)
+    fields['total'].value, fields['total'].start
+    receipts, items = FieldExtractor().extract_batch(texts)
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+##Covers ReceiptOCR's former data_patterns (dd/mm/yyyy, yyyy-mm-dd, dd-mm-yyyy, d/m/yy)
+DATE_PATTERNS = [
+    r'\d{4}-\d{2}-\d{2}',
+    r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}',
+]
+
+##Words that introduce the total (matched case-insensitively)
+TOTAL_LABELS = [r'(?:grand\s+)?total', r'amount(?:\s+due)?', r'balance\s+due']
+
+##Lines with these words are summary lines, not purchased items
+SUMMARY_WORDS = ['total', 'subtotal', 'tax', 'vat', 'amount', 'balance', 'due', 'change', 'cash', 'tip', 'visa',
+                 'mastercard', 'card', 'paid']
+
+##Amount after a total label: digits with thousands commas, up to 2 decimals
+MONEY = r'[0-9][0-9,]*\.?\d{0,2}'
+##Price ending an item line: MONEY with the cents required ('Store 1042' is no item)
+PRICE = r'[0-9][0-9,]*\.\d{2}'
+
+Field = namedtuple('Field', ['value', 'start', 'end'])
+Item = namedtuple('Item', ['name', 'price', 'start', 'end'])
+
+def to_amount(text):
+    """'1,234.50' -> 1234.5 (None if it is not a number)."""
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return None
+
+def build_pattern(date_patterns=DATE_PATTERNS, total_labels=TOTAL_LABELS):
+    """
+    One compiled regex; the outer group name of each alternative is the field
+    kind (match.lastgroup). Every alternative is anchored at a line start, so
+    a match attempt costs one check per line instead of trying every pattern
+    at every character. Alternatives are tried in order, so a letter-led line
+    only counts as a merchant candidate when it is none of the others. Only the labels are
+    case-insensitive (the other patterns have no letters to fold, and a
+    global IGNORECASE slows every character class down).
+    """
+    dates = '|'.join(date_patterns)
+    labels = '|'.join(total_labels)
+    line = [
+        rf'(?P<total_line>(?:[^\W\d]+[ \t]+)?(?i:{labels})\b[ \t:]*\$?(?P<total>{MONEY}))',
+        rf'(?P<item_line>(?P<item>[^\W\d][^\n]*?)[ \t]+\$?(?P<price>{PRICE})[ \t]*$)',
+        rf'(?P<date_line>[^\n]*?\b(?P<date>{dates})\b)',
+        r'(?P<amount_line>[^\n]*?(?P<amount>\d+\.\d{2})[ \t]*$)',
+        r'(?P<merchant_line>(?P<merchant>[^\W\d][^\n]*?)[ \t]*$)',
+    ]
+    return re.compile(r'^[ \t]*(?:' + '|'.join(line) + ')', re.MULTILINE)
+
+class FieldExtractor:
+    """Single-pass receipt field extraction (patterns compiled once, see build_pattern)."""
+    def __init__(self, date_patterns=DATE_PATTERNS, total_labels=TOTAL_LABELS, summary_words=SUMMARY_WORDS):
+        self.pattern = build_pattern(date_patterns, total_labels)
+        ##Item candidates whose first or second word is a summary word ('Tax', 'Sales Tax', 'Change due')
+        self.summary_pattern = rf'^(?:\S+\s+)?(?:{"|".join(summary_words)})\b'
+        self.summary = re.compile(self.summary_pattern, re.IGNORECASE)
+        ##Group numbers, so the match loop does no name lookups
+        groups = self.pattern.groupindex
+        self.groups = tuple(groups[name] for name in ('merchant', 'date', 'total', 'amount', 'item', 'price'))
+
+    def scan(self, texts):
+        """
+        The single pass over every text: character positions only, no values.
+        Everything goes into flat lists of ints / strings, so a large batch
+        leaves no tuples behind for the garbage collector to walk.
+
+        Returns:
+            dict of lists - per text: {merchant, date, total, amount}_{start, end}
+            (-1 = not found; total = labelled total, amount = last amount ending a line),
+            per line-item candidate: receipt, item, item_start, price_start, price_end.
+        """
+        MERCHANT, DATE, TOTAL, AMOUNT, ITEM, PRICE = self.groups
+        out = {name: [] for name in ('merchant_start', 'merchant_end', 'date_start', 'date_end', 'total_start',
+                                     'total_end', 'amount_start', 'amount_end', 'receipt', 'item', 'item_start',
+                                     'price_start', 'price_end')}
+        receipt, item, item_start, price_start, price_end = (out[name].append for name in
+                                                             ('receipt', 'item', 'item_start', 'price_start', 'price_end'))
+        for i, text in enumerate(texts):
+            merchant = date = total = amount = (-1, -1)
+            for m in self.pattern.finditer(text):
+                kind = m.lastgroup
+                if kind == 'item_line':
+                    amount = m.span(PRICE)
+                    receipt(i)
+                    item(m[ITEM])
+                    item_start(m.start(ITEM))
+                    price_start(amount[0])
+                    price_end(amount[1])
+                elif kind == 'amount_line':
+                    amount = m.span(AMOUNT)
+                elif kind == 'total_line':
+                    total = m.span(TOTAL)
+                elif kind == 'date_line':
+                    if date[0] < 0:
+                        date = m.span(DATE)
+                elif kind == 'merchant_line':
+                    if merchant[0] < 0:
+                        merchant = m.span(MERCHANT)
+            for field, (start, end) in (('merchant', merchant), ('date', date), ('total', total), ('amount', amount)):
+                out[f'{field}_start'].append(start)
+                out[f'{field}_end'].append(end)
+        return out
+
+    def extract(self, text):
+        """
+        Args:
+            text (str): OCR output of one receipt.
+
+        Returns:
+            dict: merchant, date, total (Field or None), total_labelled (bool), items [Item].
+        """
+        s = self.scan([text])
+        per_text = ('merchant', 'date', 'total', 'amount')
+        s.update({f'{field}_{end}': s[f'{field}_{end}'][0] for field in per_text for end in ('start', 'end')})
+        items = [Item(name, to_amount(text[p0:p1]), start, p1)
+                 for name, start, p0, p1 in zip(s['item'], s['item_start'], s['price_start'], s['price_end'])
+                 if not self.summary.match(name)]
+
+        ##A labelled total that is not a number ('TOTAL ,') falls back to the last amount
+        total = s['total_start'], s['total_end']
+        labelled = total[0] >= 0 and to_amount(text[total[0]:total[1]]) is not None
+        if not labelled:
+            total = s['amount_start'], s['amount_end']
+        field = lambda start, end, value: None if start < 0 else Field(value(text[start:end]), start, end)
+        return {
+            'merchant': field(s['merchant_start'], s['merchant_end'], str),
+            'date': field(s['date_start'], s['date_end'], str),
+            'total': field(*total, to_amount),
+            'total_labelled': labelled,
+            'items': items,
+        }
+
+    def extract_batch(self, texts, workers=1, chunk_size=20_000):
+        """
+        extract() for many OCR outputs, as two frames (values are parsed a
+        column at a time, not per field).
+
+        workers > 1 spreads chunks of chunk_size texts over a process pool
+        (worth it from hundreds of thousands of texts).
+
+        Returns:
+            receipts: one row per text - merchant, date, total (+ _start/_end
+                      positions of each, -1 when not found), total_labelled, items (count).
+            items:    one row per line item - receipt (row of receipts), name, price, start, end.
+        """
+        texts = list(texts)
+        if workers == 1 or len(texts) <= chunk_size:
+            return self.extract_frames(texts)
+        from parallel import parallel_map
+        chunks = ((self, texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size))
+        receipts, items = [], []
+        offset = 0
+        for chunk_receipts, chunk_items in parallel_map(_extract_chunk, chunks, workers):
+            chunk_items['receipt'] += offset
+            offset += len(chunk_receipts)
+            receipts.append(chunk_receipts)
+            items.append(chunk_items)
+        return pd.concat(receipts, ignore_index=True), pd.concat(items, ignore_index=True)
+
+    def extract_frames(self, texts):
+        """extract_batch() of one chunk, in this process."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        s = {name: np.array(values, dtype=object if name == 'item' else np.int64) for name, values in self.scan(texts).items()}
+
+        def cut(starts, ends, owners=None):
+            """Substrings texts[owner][start:end] as an arrow array (null where start is -1)."""
+            owners = range(len(texts)) if owners is None else owners
+            return pa.array([texts[i][a:b] if a >= 0 else None for i, a, b in zip(owners, starts.tolist(), ends.tolist())],
+                            pa.string())
+
+        def amounts(strings):
+            """'1,234.50' -> 1234.5, null where it is not a number."""
+            strings = pc.replace_substring(strings, ',', '')
+            number = pc.match_substring_regex(strings, r'^(\d+\.?\d*|\.\d+)$')
+            return pc.cast(pc.if_else(number, strings, None), pa.float64()).to_numpy(zero_copy_only=False)
+
+        receipts = pd.DataFrame(index=range(len(texts)))
+        for field in ('merchant', 'date'):
+            receipts[field] = pd.Series(cut(s[f'{field}_start'], s[f'{field}_end']).to_pandas(), dtype='str')
+            receipts[f'{field}_start'], receipts[f'{field}_end'] = s[f'{field}_start'], s[f'{field}_end']
+
+        ##Labelled totals, falling back to the last amount when missing or not a number
+        labelled = amounts(cut(s['total_start'], s['total_end']))
+        is_labelled = ~np.isnan(labelled)
+        receipts['total'] = np.where(is_labelled, labelled, amounts(cut(s['amount_start'], s['amount_end'])))
+        receipts['total_start'] = np.where(is_labelled, s['total_start'], s['amount_start'])
+        receipts['total_end'] = np.where(is_labelled, s['total_end'], s['amount_end'])
+        receipts['total_labelled'] = is_labelled
+
+        ##Line items: drop summary lines (tax, change, ...) and parse every price in one cast
+        names = pa.array(s['item'], pa.string())
+        keep = ~pc.match_substring_regex(names, self.summary_pattern, ignore_case=True).to_numpy(zero_copy_only=False)
+        items = pd.DataFrame({
+            'receipt': s['receipt'],
+            'name': pd.Series(names.to_pandas(), dtype='str'),
+            'price': amounts(cut(s['price_start'], s['price_end'], s['receipt'].tolist())),
+            'start': s['item_start'],
+            'end': s['price_end'],
+        })[keep].reset_index(drop=True)
+        receipts['items'] = np.bincount(items['receipt'], minlength=len(texts))
+        return receipts, items
+
+def _extract_chunk(task):
+    extractor, texts = task
+    return extractor.extract_frames(texts)
+
+def parse_item_prices(items):
+    """
+    Vectorized parse_item_price: last whitespace-separated token of each
+    line-item string ('latte 3.25' -> 3.25) as float, NaN where it is not a
+    number. The token is cut out and cast by pyarrow kernels, no Python loop.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    lines = pa.array(pd.Series(items, dtype='str'), pa.string())
+    token = pc.struct_field(pc.extract_regex(lines, r'(?P<token>\S+)\s*$'), [0])
+    number = pc.match_substring_regex(token, r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+    return pc.cast(pc.if_else(number, token, None), pa.float64()).to_numpy(zero_copy_only=False)
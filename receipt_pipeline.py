@@ -0,0 +1,204 @@
+"""
+==============================================================================
+ In-Memory Receipt Pipeline
+==============================================================================
+A receipt is decoded ONCE into a NumPy buffer and handed from stage to stage:
+
+    decode -> crop -> MSER text regions -> threshold -> OCR
+                                          \-> text-line boxes -> OCR of each line crop
+
+No stage re-encodes the image or goes through a file, and the source image
+is only ever read. Stage outputs are written as PNGs only when debug_dir is
+given. The crop stage takes any function image -> image, e.g.
+Crop_Functions.auto_crop.AutoCrop (the OpenCV port of autoCrop.m), so
+cropping runs in-process instead of the MATLAB step handing over files.
+
+In line mode the MSER regions are grouped into text-line boxes and only
+those crops are recognized, each as a single line (PSM 7) on a small thread
+pool (tesseract releases the GIL, and the pytesseract fallback waits on a
+subprocess). On phone photos, where most of the frame is table or floor,
+OCR then never sees the background. It pays off most with tesserocr: the
+pytesseract fallback starts one tesseract process per line.
+
+With cascade=True the fixed threshold gives way to run_single_img.OcrCascade:
+the receipt is recognized at the cheapest preprocessing level first and
+only escalates (Otsu, denoise + adaptive threshold, deskew) while the
+Tesseract word confidence or the extracted fields fall short; self.level
+is the level the last receipt's text came from.
+
+With a cache (ocr_cache.py) the encoded bytes are hashed before decoding,
+so an unchanged receipt skips every stage.
+
+Usage:
+    from batch_ocr import OcrEngine
+    pipeline = ReceiptPipeline(OcrEngine(), regions=True, threshold=True)
+    text, cached = pipeline.run('receipt.png')
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from ocr_cache import content_hash
+
+def read_source(source):
+    """Encoded bytes of a path / bytes source, or the array itself if already decoded."""
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open(source, 'rb') as f:
+        return f.read()
+
+def decode(data):
+    """BGR image from encoded bytes (arrays pass through)."""
+    if isinstance(data, np.ndarray):
+        return data
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError('cannot decode image')
+    return img
+
+class ReceiptPipeline:
+    """
+    Args:
+        engine (batch_ocr.OcrEngine): OCR engine, reused for every receipt.
+        crop (callable): image -> cropped image (None = no crop).
+        regions (bool): Blank everything outside the MSER text regions.
+        threshold (bool): Grayscale, median blur and Otsu threshold (run_single_img.preprocess).
+        cache (ocr_cache.OcrCache): Reuse results of unchanged receipts.
+        debug_dir (str): Write every stage's image here (nothing is written otherwise).
+        lines (bool): OCR only the text-line crops, each as a single line.
+        line_workers (int): Threads recognizing line crops (all cores by default).
+        cascade (bool): Choose the preprocessing per receipt by OCR confidence (run_single_img.OcrCascade)
+            instead of the fixed threshold; not with lines.
+    """
+    ##Tesseract page segmentation mode of the line crops: a single text line
+    LINE_PSM = 7
+
+    def __init__(self, engine, crop=None, regions=False, threshold=False, cache=None, debug_dir=None,
+                 lines=False, line_workers=None, cascade=False):
+        if cascade and (threshold or lines):
+            raise ValueError('cascade picks its own threshold and reads whole receipts (no threshold / lines)')
+        self.engine = engine
+        self.crop = crop
+        self.regions = regions
+        self.threshold = threshold
+        self.cache = cache
+        self.debug_dir = debug_dir
+        self.lines = lines
+        self.line_workers = line_workers or os.cpu_count() or 1
+        ##One single-line engine per thread (a tesseract instance is not thread-safe)
+        self.local = threading.local()
+        self.pool = None
+        self.cascade = None
+        if cascade:
+            from run_single_img import OcrCascade
+            self.cascade = OcrCascade(engine)
+        ##Cascade level of the last receipt run (None when it came from the cache or without cascade)
+        self.level = None
+
+    def params(self):
+        """Everything that changes the text for the same source (part of the cache key)."""
+        from run_single_img import PREPROCESS_PARAMS
+        crop = None
+        if self.crop is not None:
+            crop = f'{self.crop.__module__}.{getattr(self.crop, "__qualname__", type(self.crop).__qualname__)}'
+            if hasattr(self.crop, 'params'):
+                crop = {'crop': crop, **self.crop.params()}
+        params = {'crop': crop, 'regions': self.regions,
+                  'threshold': PREPROCESS_PARAMS if self.threshold else None, **self.engine.params()}
+        if self.lines:
+            params['lines'] = self.LINE_PSM
+        if self.cascade is not None:
+            params['cascade'] = self.cascade.params()
+        if self.regions or self.lines:
+            from Text_Detection.text_region import DETECTOR
+            params['detector'] = DETECTOR.params()
+        return params
+
+    def process(self, img, image_hash=None):
+        """
+        Run the image stages on a decoded buffer.
+
+        Returns:
+            (image handed to OCR, {stage name: image} for debugging,
+             text-line boxes (n, 4) x, y, w, h in line mode, else None)
+        """
+        stages = {}
+        boxes = None
+        if self.crop is not None:
+            img = stages['crop'] = self.crop(img)
+        if self.regions:
+            from Text_Detection.text_region import keep_text_regions
+            img = stages['regions'] = keep_text_regions(img)
+        if self.lines:
+            ##Found on the image before thresholding (MSER needs the gray levels)
+            from Text_Detection.text_region import draw_boxes, line_boxes
+            boxes = line_boxes(img)
+            if self.debug_dir:
+                stages['lines'] = draw_boxes(img, boxes)
+        if self.threshold:
+            from run_single_img import preprocess
+            ##The cached threshold is keyed by the source bytes only when no stage changed the pixels before it
+            upstream = image_hash if not stages else None
+            img = stages['threshold'] = preprocess(img, self.cache, upstream)
+        return img, stages, boxes
+
+    def line_engine(self):
+        engine = getattr(self.local, 'engine', None)
+        if engine is None:
+            engine = self.local.engine = self.engine.with_psm(self.LINE_PSM)
+        return engine
+
+    def ocr_lines(self, img, boxes):
+        """Recognize each line crop as a single line, in parallel; lines joined top to bottom."""
+        crops = [img[y:y + h, x:x + w] for x, y, w, h in boxes]
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.line_workers)
+        texts = self.pool.map(lambda crop: self.line_engine().image_to_string(crop).strip(), crops)
+        return '\n'.join(text for text in texts if text) + '\n'
+
+    def run(self, source, name=None):
+        """
+        OCR one receipt.
+
+        Args:
+            source (str | bytes | np.ndarray): Image path, encoded bytes or decoded BGR image.
+            name (str): Prefix of the debug images (default: file name of source).
+
+        Returns:
+            (text, cached)
+        """
+        self.level = None
+        data = read_source(source)
+        image_hash = text_key = None
+        if self.cache is not None:
+            image_hash = content_hash(data)
+            text_key = self.cache.key(image_hash, 'text', **self.params())
+            text = self.cache.get_text(text_key)
+            if text is not None:
+                return text, True
+
+        img, stages, boxes = self.process(decode(data), image_hash)
+        if boxes is not None and len(boxes):
+            text = self.ocr_lines(img, boxes)
+        elif self.cascade is not None:
+            result = self.cascade.run(img)
+            text, self.level = result.text, result.level
+            if self.debug_dir:
+                stages[f'cascade_{result.level}'] = result.image
+        else:
+            text = self.engine.image_to_string(img)
+        if self.cache is not None:
+            self.cache.put_text(text_key, text)
+        if self.debug_dir:
+            self.write_debug(stages, name or (os.path.splitext(os.path.basename(source))[0] if isinstance(source, str) else 'receipt'))
+        return text, False
+
+    def write_debug(self, stages, name):
+        os.makedirs(self.debug_dir, exist_ok=True)
+        for stage, img in stages.items():
+            cv2.imwrite(os.path.join(self.debug_dir, f'{name}_{stage}.png'), img)
@@ -0,0 +1,339 @@
+"""
+==============================================================================
+ Receipt Reconciliation
+==============================================================================
+Matches OCR'd receipts (merchant, date, total) to card transactions (same
+merchant, amount within amount_tol, date within +/- days) so a purchase is
+not counted twice, and reports every receipt as matched, ambiguous or
+unmatched.
+
+# - Blocking: transactions are sorted once by (amount bucket, day), buckets
+#   2 * amount_tol wide. A receipt's candidates then sit in 3 contiguous runs
+#   (its bucket and the two neighbours, each cut to the date window with a
+#   binary search), found for all receipts at once with searchsorted and
+#   expanded without a Python loop. Candidates are never compared to the rest
+#   of the card data.
+# - Merchant names are normalized (case, punctuation, 'fraud_' prefix of the
+#   card export, store numbers, legal suffixes, characters OCR confuses such
+#   as 0/o, 1/l, rn/m, c/e) and scored with character
+#   bigram Dice similarity (1.0 for equal names, CONTAINED_SCORE when one
+#   name's words are all in the other). OCR and card names repeat, so each
+#   distinct (receipt name, card merchant) pair is scored once.
+# - Decision per receipt over candidates with similarity >= min_similarity:
+#   best score wins (similarity, minus small amount / date distance terms);
+#   a runner-up within AMBIGUITY_MARGIN makes the receipt ambiguous, and so
+#   does losing its transaction to a better-scoring receipt (each card
+#   transaction backs at most one receipt).
+
+Usage:
+    card = load_transactions('dataset/before_merge/credit_card_transactions.csv')
+    result = Reconciler(card).match(receipts)      # receipts: merchant, date, total
+    summarize(result)
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from date_normalize import NAT, NS, SECONDS_PER_DAY, fixed_layout, parse_fixed, parse_unique
+
+AMOUNT_TOL = 0.01
+DAYS = 3
+MIN_SIMILARITY = 0.6
+
+##Score of two names where every word of one is in the other ('starbucks' / 'starbucks coffee')
+CONTAINED_SCORE = 0.7
+
+##Runner-up this close to the best score: ambiguous
+AMBIGUITY_MARGIN = 0.02
+
+##Score lost for an amount difference of amount_tol / a date difference of `days`
+AMOUNT_WEIGHT = 0.05
+DATE_WEIGHT = 0.1
+
+##Words that say nothing about which merchant it is
+STOPWORDS = {'the', 'and', 'inc', 'llc', 'ltd', 'co', 'corp', 'company', 'store', 'shop', 'no'}
+
+##Characters OCR mixes up, mapped to one of them ('l' for 1 / i / l, 'e' for c / e, ...)
+CONFUSABLE = str.maketrans({'0': 'o', '1': 'l', 'i': 'l', '5': 's', '8': 'b', 'c': 'e'})
+
+CARD_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+#------------------------------------------------------- NAMES -----------------------------------------------
+def canonical(word):
+    """One spelling per class of characters OCR confuses (applied to both sides)."""
+    return word.replace('rn', 'm').translate(CONFUSABLE)
+
+CANONICAL_STOPWORDS = sorted({canonical(word) for word in STOPWORDS})
+
+def normalize_merchants(names):
+    """
+    Normalized merchant names, vectorized: 'fraud_Kub & Sons, Inc. #1042' -> 'kub sons',
+    OCR'd 'KU8 5ONS' -> 'kub sons' ('' for a missing name).
+    """
+    s = pd.Series(names, dtype=object).fillna('').astype(str).str.lower().str.replace(r'^fraud_', '', regex=True)
+    s = s.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.replace(r'\b\d+\b', ' ', regex=True)
+    s = s.str.replace('rn', 'm').str.translate(CONFUSABLE)
+    s = s.str.replace(r'\b(?:' + '|'.join(CANONICAL_STOPWORDS) + r')\b', ' ', regex=True)
+    return s.str.split().str.join(' ').tolist()
+
+def normalize_merchant(name):
+    return normalize_merchants([name])[0]
+
+def name_info(name):
+    """(character bigrams without spaces, words) of a normalized name."""
+    joined = name.replace(' ', '')
+    return frozenset(joined[i:i + 2] for i in range(len(joined) - 1)) or frozenset([joined]), frozenset(name.split())
+
+def similarity(a, b, info=None):
+    """Similarity of two normalized names in [0, 1]. info: cache name -> name_info(name)."""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    (ga, wa), (gb, wb) = (info[a], info[b]) if info is not None else (name_info(a), name_info(b))
+    dice = 2 * len(ga & gb) / (len(ga) + len(gb))
+    return max(dice, CONTAINED_SCORE) if wa <= wb or wb <= wa else dice
+
+#------------------------------------------------------- INPUT -----------------------------------------------
+##Day number of a missing date (never within any window)
+NAT_DAY = np.iinfo(np.int32).min
+
+def to_days(values):
+    """Day numbers since the epoch of datetime64 / date strings (NAT_DAY where missing)."""
+    if pd.api.types.is_datetime64_any_dtype(values) or np.asarray(values).dtype.kind == 'M':
+        ns = np.asarray(values, dtype='datetime64[ns]').view(np.int64)
+    else:
+        ##Receipt dates: each distinct string parsed once (date_normalize.parse_unique, day-first)
+        texts = pd.Series(values, dtype=object).fillna('').astype(str).str.strip()
+        codes, uniques = pd.factorize(texts)
+        ns = parse_unique(pd.Series(uniques, dtype=object))[0][codes] if len(uniques) else np.empty(0, np.int64)
+    days = np.floor_divide(ns, SECONDS_PER_DAY * NS)
+    return np.where(ns == NAT, NAT_DAY, days).astype(np.int64)
+
+def load_transactions(path):
+    """
+    Card transactions as a frame of date (datetime64), merchant (categorical) and amount,
+    indexed by their row in the source:
+
+    # - the card export (credit_card_transactions.csv): trans_date_trans_time, merchant, amt
+    # - merged_transactions.csv or the Parquet folder: transaction_date, merchant, amount
+    # - a transaction_index folder of the merged output (memory-mapped, nothing parsed)
+    """
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, 'meta.json')):
+        from transaction_index import TransactionIndex
+        index = TransactionIndex(path)
+        return pd.DataFrame({
+            'date': np.asarray(index.array('transaction_date')),
+            'merchant': pd.Categorical.from_codes(np.asarray(index.array('merchant')), dtype=index.dtypes['merchant']),
+            'amount': np.asarray(index.array('amount')),
+        })
+    if os.path.isdir(path):
+        from columnar_store import read_transactions
+        df = read_transactions(path, columns=['transaction_date', 'merchant', 'amount'])
+        return df.rename(columns={'transaction_date': 'date'})
+
+    header = pd.read_csv(path, nrows=0).columns
+    if 'trans_date_trans_time' in header:
+        df = pd.read_csv(path, usecols=['trans_date_trans_time', 'merchant', 'amt'], dtype={'merchant': 'category'})
+        texts = df['trans_date_trans_time'].to_numpy(dtype=object, na_value='')
+        ns, ok = parse_fixed(texts, fixed_layout(CARD_DATE_FORMAT))
+        if not ok.all():
+            ns[~ok] = pd.to_datetime(pd.Series(texts[~ok]), errors='coerce').to_numpy(dtype='datetime64[ns]').view(np.int64)
+        return pd.DataFrame({'date': ns.view('datetime64[ns]'), 'merchant': df['merchant'], 'amount': df['amt']})
+    from merge_data import DATE_FORMAT
+    df = pd.read_csv(path, usecols=['transaction_date', 'merchant', 'amount'], dtype={'merchant': 'category'})
+    df['transaction_date'] = pd.to_datetime(df['transaction_date'], format=DATE_FORMAT)
+    return df.rename(columns={'transaction_date': 'date'})
+
+def load_receipts(path):
+    """
+    Receipts as merchant, date, total: a CSV with those columns (e.g. FieldExtractor.extract_batch
+    output) or the OCR rows of a ledger database (ledger.py).
+    """
+    if path.endswith('.db'):
+        from ledger import Ledger
+        with Ledger(path) as book:
+            df = book.query(source='ocr')
+        return df.rename(columns={'transaction_date': 'date', 'amount': 'total'})[['merchant', 'date', 'total', 'receipt']]
+    return pd.read_csv(path)
+
+#------------------------------------------------------- MATCH -----------------------------------------------
+class Reconciler:
+    """
+    Bucket index over card transactions; match() reconciles receipts against it.
+
+    Args:
+        transactions (pd.DataFrame): date (datetime64), merchant, amount (see load_transactions).
+        amount_tol (float): Largest |receipt total - amount| of a match.
+        days (int): Largest |receipt day - transaction day| of a match.
+        min_similarity (float): Smallest merchant similarity of a match.
+    """
+    def __init__(self, transactions, amount_tol=AMOUNT_TOL, days=DAYS, min_similarity=MIN_SIMILARITY):
+        self.transactions = transactions
+        self.amount_tol = amount_tol
+        self.days = days
+        self.min_similarity = min_similarity
+
+        ##Amount buckets 2 * tolerance wide: any amount within tolerance is in the same or a neighbouring bucket
+        self.tol_cents = int(round(amount_tol * 100))
+        self.width = 2 * self.tol_cents + 1
+        self.cents = np.round(transactions['amount'].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        self.day = to_days(transactions['date'].to_numpy())
+        valid = self.day != NAT_DAY
+        self.day0 = int(self.day[valid].min()) - days - 1 if valid.any() else 0
+        self.span = int(self.day[valid].max()) - self.day0 + days + 2 if valid.any() else 1
+        keys = self.key(self.cents // self.width, self.day)
+        keys[~valid] = np.iinfo(np.int64).max
+        self.order = np.argsort(keys)
+        self.keys = keys[self.order]
+
+        ##Merchant names normalized once per distinct value
+        merchants = transactions['merchant'].astype('category')
+        self.merchant_codes = merchants.cat.codes.to_numpy()
+        self.merchant_names = normalize_merchants(merchants.cat.categories)
+
+    def key(self, bucket, day):
+        return bucket * self.span + np.clip(day - self.day0, 0, self.span - 1)
+
+    def candidates(self, cents, day):
+        """(receipt, transaction) pairs in the same / neighbouring amount bucket and the date window."""
+        bucket = cents // self.width
+        receipt = np.repeat(np.arange(len(cents)), 3)
+        buckets = (bucket[:, None] + np.array([-1, 0, 1])).ravel()
+        lo = np.searchsorted(self.keys, self.key(buckets, day[receipt] - self.days), 'left')
+        hi = np.searchsorted(self.keys, self.key(buckets, day[receipt] + self.days), 'right')
+        ##Receipts without a date get no candidates
+        hi = np.where(day[receipt] == NAT_DAY, lo, hi)
+
+        ##Expand the runs [lo, hi) into one pair per position
+        counts = hi - lo
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        pos = starts + np.arange(counts.sum())
+        return np.repeat(receipt, counts), self.order[pos]
+
+    def score_names(self, receipt_names, codes, pairs_receipt, pairs_txn):
+        """Merchant similarity per pair, computed once per distinct (receipt name, card merchant)."""
+        n_vocab = max(len(self.merchant_names), 1)
+        pair_keys = codes[pairs_receipt].astype(np.int64) * (n_vocab + 1) + (self.merchant_codes[pairs_txn] + 1)
+        unique, inverse = np.unique(pair_keys, return_inverse=True)
+        info = {name: name_info(name) for name in set(receipt_names) | set(self.merchant_names) if name}
+        ##Card merchant code + 1, so a missing merchant (-1) maps to ''
+        names = [''] + self.merchant_names
+        scores = np.array([similarity(receipt_names[k // (n_vocab + 1)], names[k % (n_vocab + 1)], info)
+                           for k in unique.tolist()], dtype=np.float64)
+        return scores[inverse] if len(unique) else np.empty(0)
+
+    def match(self, receipts):
+        """
+        Args:
+            receipts (pd.DataFrame): merchant, date (string or datetime), total.
+
+        Returns:
+            pd.DataFrame, one row per receipt (same index): status ('matched' | 'ambiguous' |
+            'unmatched'), transaction (index label in the transactions, -1 if none), merchant of
+            it, similarity, amount_diff, day_diff, candidates (within amount / date), reason.
+        """
+        n = len(receipts)
+        totals = pd.to_numeric(receipts['total'], errors='coerce').to_numpy(dtype=np.float64)
+        day = to_days(receipts['date'].to_numpy() if pd.api.types.is_datetime64_any_dtype(receipts['date'])
+                      else receipts['date'])
+        has_total = ~np.isnan(totals)
+        cents = np.where(has_total, np.round(np.nan_to_num(totals) * 100), 0).astype(np.int64)
+        day = np.where(has_total, day, NAT_DAY)
+
+        ##Blocking, then the exact amount / date test
+        r, t = self.candidates(cents, day)
+        amount_diff = np.abs(self.cents[t] - cents[r])
+        day_diff = np.abs(self.day[t] - day[r])
+        keep = (amount_diff <= self.tol_cents) & (day_diff <= self.days)
+        r, t, amount_diff, day_diff = r[keep], t[keep], amount_diff[keep], day_diff[keep]
+        n_candidates = np.bincount(r, minlength=n)
+
+        receipt_codes, receipt_uniques = pd.factorize(pd.Series(receipts['merchant'], dtype=object).fillna(''))
+        receipt_names = normalize_merchants(receipt_uniques)
+        sim = self.score_names(receipt_names, receipt_codes, r, t)
+        score = (sim - AMOUNT_WEIGHT * amount_diff / max(self.tol_cents, 1)
+                 - DATE_WEIGHT * day_diff / max(self.days, 1))
+
+        ##Best and runner-up qualifying candidate per receipt
+        ok = sim >= self.min_similarity
+        r, t, sim, score, amount_diff, day_diff = r[ok], t[ok], sim[ok], score[ok], amount_diff[ok], day_diff[ok]
+        order = np.lexsort((-score, r))
+        r, t, sim, score, amount_diff, day_diff = (a[order] for a in (r, t, sim, score, amount_diff, day_diff))
+        first = np.flatnonzero(np.r_[True, r[1:] != r[:-1]]) if len(r) else np.empty(0, np.int64)
+        second = first + 1
+        has_second = second < len(r)
+        has_second[has_second] = r[second[has_second]] == r[first[has_second]]
+        tied = np.zeros(len(first), dtype=bool)
+        tied[has_second] = score[second[has_second]] >= score[first[has_second]] - AMBIGUITY_MARGIN
+
+        ##A transaction backs one receipt: the best-scoring claim keeps it
+        best_t = t[first]
+        claim = np.lexsort((-score[first], best_t))
+        lost = np.zeros(len(first), dtype=bool)
+        lost[claim[1:]] = best_t[claim[1:]] == best_t[claim[:-1]]
+
+        status = np.full(n, 'unmatched', dtype=object)
+        reason = np.full(n, 'no transaction within amount / date', dtype=object)
+        reason[~has_total] = 'no total'
+        reason[has_total & (day == NAT_DAY)] = 'no date'
+        reason[(n_candidates > 0)] = 'merchant differs'
+        owner = r[first]
+        status[owner] = np.where(tied | lost, 'ambiguous', 'matched')
+        reason[owner] = np.where(tied, 'several transactions fit', np.where(lost, 'transaction fits a better receipt', ''))
+
+        transaction = np.full(n, -1, dtype=np.int64)
+        labels = self.transactions.index.to_numpy()
+        transaction[owner] = labels[best_t]
+        merchant = np.full(n, None, dtype=object)
+        merchant[owner] = np.asarray(self.transactions['merchant'].astype(object).to_numpy())[best_t]
+        similarity_out = np.full(n, np.nan)
+        similarity_out[owner] = sim[first]
+        amount_out = np.full(n, np.nan)
+        amount_out[owner] = amount_diff[first] / 100
+        days_out = np.full(n, -1, dtype=np.int64)
+        days_out[owner] = day_diff[first]
+        return pd.DataFrame({
+            'status': status, 'transaction': transaction, 'merchant': merchant, 'similarity': similarity_out,
+            'amount_diff': amount_out, 'day_diff': days_out, 'candidates': n_candidates, 'reason': reason,
+        }, index=receipts.index)
+
+def summarize(result):
+    """Receipts per status (and the reasons of those not matched)."""
+    lines = [f"{status:<10}{count:>10,}" for status, count in result['status'].value_counts().items()]
+    for reason, count in result.loc[result['status'] != 'matched', 'reason'].value_counts().items():
+        lines.append(f"  {reason:<40}{count:>10,}")
+    return '\n'.join(lines)
+
+#------------------------------------------------------- MAIN -----------------------------------------------
+def main(receipts_path, transactions_path, out=None, amount_tol=AMOUNT_TOL, days=DAYS, min_similarity=MIN_SIMILARITY):
+    start = time.perf_counter()
+    transactions = load_transactions(transactions_path)
+    receipts = load_receipts(receipts_path)
+    loaded = time.perf_counter()
+    reconciler = Reconciler(transactions, amount_tol, days, min_similarity)
+    indexed = time.perf_counter()
+    result = reconciler.match(receipts)
+    matched = time.perf_counter()
+    print(summarize(result))
+    print(f'{len(receipts):,} receipts vs {len(transactions):,} transactions: load {loaded - start:.1f} s, '
+          f'index {indexed - loaded:.2f} s, match {matched - indexed:.2f} s')
+    if out:
+        receipts.join(result, rsuffix='_card').to_csv(out)
+        print(f'Saved to {out}')
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Match OCR receipts to card transactions.')
+    parser.add_argument('receipts', help='CSV with merchant, date, total columns, or a ledger .db (its OCR rows)')
+    parser.add_argument('transactions', help='card export CSV, merged CSV / Parquet folder, or transaction index folder')
+    parser.add_argument('--out', default=None, help='write the receipts with their match here (CSV)')
+    parser.add_argument('--amount-tol', type=float, default=AMOUNT_TOL)
+    parser.add_argument('--days', type=int, default=DAYS)
+    parser.add_argument('--min-similarity', type=float, default=MIN_SIMILARITY)
+    args = parser.parse_args()
+    main(args.receipts, args.transactions, args.out, args.amount_tol, args.days, args.min_similarity)
@@ -0,0 +1,192 @@
+"""
+==============================================================================
+ Spending Rollup Cube
+==============================================================================
+Pre-aggregated spending built once while merging, so category/month/merchant
+questions and the histograms never need the raw transactions again.
+
+Cells are keyed by source (card / household) x category x subcategory x
+merchant x day and hold sum, count, min and max of `amount`. A month-level
+copy is derived from it for coarse queries. Every statistic is additive
+(sum+sum, count+count, min of mins, max of maxes), so new transactions are
+folded in with update() and a reprocessed source is replaced with
+replace_source().
+
+Usage:
+    cube = RollupCube.load('after_merge/rollup.pkl')
+    cube.query(by=['category'])                                  # totals per category
+    cube.query(by=['merchant'], grain='month', category='food')  # monthly food spend per merchant
+    python rollup.py --plot                                      # regenerate the histograms
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['source', 'category', 'subcategory', 'merchant']
+##Pending update cells are folded into the day cells once they outnumber them (and at least this many)
+FOLD_ROWS = 1_000_000
+STATS = ['sum', 'count', 'min', 'max']
+COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+#------------------------------------------------------- HELPERS -----------------------------------------------
+def aggregate(df, source):
+    """Day-level cells for one cleaned/merged frame."""
+    frame = pd.DataFrame({
+        'source': source,
+        'category': df['category'],
+        'subcategory': df['subcategory'],
+        'merchant': df['merchant'],
+        'day': pd.to_datetime(df['transaction_date']).to_numpy().astype('datetime64[D]'),
+        'amount': df['amount'],
+    })
+    cells = frame.groupby(DIMENSIONS + ['day'], observed=True, sort=False)['amount'].agg(STATS)
+    return cells.reset_index()
+
+def combine(cells, key):
+    """Re-aggregate cells that share a key (the additive merge)."""
+    out = cells.groupby(key, observed=True, sort=False).agg(COMBINE).reset_index()
+    for col in DIMENSIONS:
+        if col in out:
+            out[col] = out[col].astype('category')
+    out['count'] = out['count'].astype(np.int64)
+    return out
+
+class RollupCube:
+    """Day- and month-level spending cells with additive updates."""
+    def __init__(self, day=None):
+        self.day = day if day is not None else pd.DataFrame(columns=DIMENSIONS + ['day'] + STATS)
+        self.pending, self.pending_rows = [], 0
+        self.refresh()
+
+    ##Build / update
+    @classmethod
+    def from_frames(cls, frames):
+        """frames: {source name: cleaned frame}."""
+        cube = cls()
+        for source, df in frames.items():
+            cube.update(df, source)
+        return cube
+
+    def update(self, df, source):
+        """Fold new transactions of one source into the cube."""
+        if len(df):
+            cells = aggregate(df, source)
+            self.pending.append(cells)
+            self.pending_rows += len(cells)
+            if self.pending_rows >= max(len(self.day), FOLD_ROWS):
+                self.fold()
+            self.month = None
+        return self
+
+    def fold(self):
+        """Combine the pending update cells into the day cells."""
+        if self.pending:
+            parts = ([self.day] if len(self.day) else []) + self.pending
+            self.day = combine(pd.concat(parts, ignore_index=True), DIMENSIONS + ['day'])
+            self.pending, self.pending_rows = [], 0
+
+    def replace_source(self, df, source):
+        """Drop every cell of a source and rebuild it from df (when the source was reprocessed)."""
+        self.fold()
+        if len(self.day):
+            self.day = self.day[self.day['source'] != source].reset_index(drop=True)
+        self.month = None
+        return self.update(df, source)
+
+    def refresh(self):
+        """Fold the pending updates and recompute the month-level copy (once, before it is read)."""
+        self.fold()
+        if not len(self.day):
+            self.month = self.day.rename(columns={'day': 'month'})
+            return
+        month = self.day.drop(columns='day').assign(month=self.day['day'].to_numpy().astype('datetime64[M]'))
+        self.month = combine(month, DIMENSIONS + ['month'])
+
+    ##Queries
+    def query(self, by=('category',), grain=None, start=None, end=None, **filters):
+        """
+        Aggregate the cube.
+
+        Args:
+            by (list): Dimensions to group by (any of DIMENSIONS).
+            grain (str): None, 'day' or 'month' - adds that time column to the grouping.
+            start, end (str | datetime): Inclusive date range. Month-aligned
+                ranges are answered from the month cells, others from the day
+                cells (grouped by month for grain='month').
+            **filters: dimension=value or dimension=[values], e.g. category='food'.
+
+        Returns:
+            pd.DataFrame indexed by `by` (+ time) with sum, count, min, max, mean.
+        """
+        if self.month is None:
+            self.refresh()
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        month_aligned = (start is None or start == start.to_period('M').start_time) and \
+                        (end is None or end.normalize() == end.to_period('M').end_time.normalize())
+        use_month = grain != 'day' and month_aligned
+        cells, time_col = (self.month, 'month') if use_month else (self.day, 'day')
+
+        mask = np.ones(len(cells), dtype=bool)
+        if start is not None:
+            mask &= cells[time_col].to_numpy() >= np.datetime64(start.normalize())
+        if end is not None:
+            mask &= cells[time_col].to_numpy() <= np.datetime64(end.normalize())
+        for dim, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= cells[dim].isin(values).to_numpy()
+
+        cells = cells[mask]
+        if grain == 'month' and not use_month:
+            ##Partial months: only the days in range, grouped by their month
+            cells = cells.assign(month=cells['day'].to_numpy().astype('datetime64[M]'))
+            time_col = 'month'
+
+        keys = list(by) + ([time_col] if grain else [])
+        if keys:
+            out = cells.groupby(keys, observed=True).agg(COMBINE)
+        else:
+            out = cells[STATS].agg(COMBINE).to_frame('total').T.astype({'count': np.int64})
+        out['mean'] = out['sum'] / out['count']
+        return out
+
+    def category_totals(self, source=None):
+        """Total amount per category (what the histograms plot)."""
+        filters = {'source': source} if source else {}
+        return self.query(by=['category'], **filters)['sum']
+
+    ##Persistence
+    def save(self, path):
+        self.fold()
+        self.day.to_pickle(path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(pd.read_pickle(path))
+
+def plot_histograms(cube, data_info_path, after_merge):
+    """Regenerate d1/df2/merge histograms from the cube."""
+    import merge_data as md
+    md.plot_totals(cube.category_totals('card'), 'Credit Card Transactions by Category (USD)', os.path.join(data_info_path, 'd1_histogram.png'))
+    md.plot_totals(cube.category_totals('household'), 'Daily Household Transactions by Category (USD)', os.path.join(data_info_path, 'df2_histogram.png'))
+    md.plot_totals(cube.category_totals(), 'All Transactions by Category (USD)', os.path.join(after_merge, 'merge_histogram.png'), figsize=(14, 8))
+
+
+if __name__ == "__main__":
+    import merge_data as md
+
+    parser = argparse.ArgumentParser(description='Query the spending rollup cube.')
+    parser.add_argument('--cube', default=os.path.join(md.after_merge, 'rollup.pkl'))
+    parser.add_argument('--by', nargs='+', default=['category'])
+    parser.add_argument('--grain', choices=['day', 'month'], default=None)
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--plot', action='store_true', help='regenerate the histograms')
+    args = parser.parse_args()
+
+    cube = RollupCube.load(args.cube)
+    print(cube.query(by=args.by, grain=args.grain, start=args.start, end=args.end))
+    if args.plot:
+        plot_histograms(cube, md.data_info_path, md.after_merge)
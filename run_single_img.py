@@ -1,40 +1,223 @@
-import cv2
-import pytesseract
-"""For individual test image run, extracting all the text from the image"""
+import time
+from collections import namedtuple
+"""
+For individual test image run, extracting all the text from the image.
 
-## Defining 
+Instead of always OCRing twice (raw, then grayscale -> median blur -> Otsu),
+the image goes through a cascade of preprocessing levels, cheapest first,
+and stops at the first level whose OCR is good enough:
+
+# - gray:     grayscale only
+# - otsu:     median blur + Otsu threshold (the old preprocess())
+# - adaptive: non-local-means denoise + Gaussian adaptive threshold (shadows, uneven light)
+# - deskew:   the adaptive image rotated straight (photos taken at an angle)
+#
+# 'Good enough' = mean Tesseract word confidence (image_to_data) of at least
+# min_confidence AND every required field (a total by default) found by
+# receipt_fields.FieldExtractor. When no level passes, the best one is kept.
+# OcrCascade.stats counts how often each level was tried, passed and kept.
+"""
+
+##Preprocessing settings; part of the cache key of every preprocessed image (ocr_cache.py)
+MEDIAN_KERNEL = 5
+PREPROCESS_PARAMS = {'steps': ['grayscale', 'median_blur', 'otsu'], 'median_kernel': MEDIAN_KERNEL}
+
+##Cascade settings
+DENOISE_STRENGTH = 10
+ADAPTIVE_BLOCK = 31
+ADAPTIVE_C = 15
+MAX_SKEW = 15
+MIN_CONFIDENCE = 75
+REQUIRED_FIELDS = ('total',)
+
+## Defining
 def ocr_core(img):
+    import pytesseract
     text = pytesseract.image_to_string(img)
     return text
 
-##Load image
-img = cv2.imread('/Users/panda/Documents/Work/Work_Main/Dataset_collection/Screenshot 2025-06-25 at 14.56.31.png')
-text = ocr_core(img)
-print(text)
-
 ##Get grayscale image(preprocessing and since OCR only cares about black and white)
 def get_grayscale(image):
-    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    import cv2
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
 
 ##Remove noise
-def remove_noise(image):
-    kernal_sz = 5
-    return cv2.medianBlur(image, kernal_sz) 
+def remove_noise(image, kernal_sz=MEDIAN_KERNEL):
+    import cv2
+    return cv2.medianBlur(image, kernal_sz)
 
 ##Thresholding
 def thresholding(image):
+    import cv2
     return cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-img = get_grayscale(img)
-img = remove_noise(img)
-img = thresholding(img)
+##Heavier noise removal (grain, JPEG artifacts) that keeps stroke edges
+def denoise(image, strength=DENOISE_STRENGTH):
+    import cv2
+    return cv2.fastNlMeansDenoising(image, None, strength, 7, 21)
+
+##Threshold against the local mean, so shadows and uneven light do not swallow text
+def adaptive_thresholding(image, block=ADAPTIVE_BLOCK, c=ADAPTIVE_C):
+    import cv2
+    return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block, c)
+
+##Rotate black-on-white text straight (angle of the minimum-area rectangle around the ink)
+def deskew(binary, max_angle=MAX_SKEW):
+    import cv2
+    ink = cv2.findNonZero(255 - binary)
+    if ink is None:
+        return binary
+    ##Into [-45, 45), whichever range minAreaRect reports in (it changed across OpenCV versions)
+    angle = (cv2.minAreaRect(ink)[2] + 45) % 90 - 45
+    if abs(angle) < 0.5 or abs(angle) > max_angle:
+        return binary
+    height, width = binary.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(binary, rotation, (width, height), flags=cv2.INTER_CUBIC, borderValue=255)
+
+##Grayscale -> noise removed -> thresholded
+def preprocess(img, cache=None, image_hash=None):
+    """
+    Args:
+        cache (ocr_cache.OcrCache): Reuse the result of an earlier run on the same image.
+        image_hash (str): content_hash of the encoded image, if already known
+            (otherwise the decoded pixels are hashed).
+    """
+    if cache is None:
+        return thresholding(remove_noise(get_grayscale(img)))
+
+    from ocr_cache import content_hash
+    key = cache.key(image_hash or content_hash(img), 'preprocess', **PREPROCESS_PARAMS)
+    out = cache.get_array(key)
+    if out is None:
+        out = thresholding(remove_noise(get_grayscale(img)))
+        cache.put_array(key, out)
+    return out
+
+#------------------------------------------------------- CASCADE -----------------------------------------------
+##Cascade levels, cheapest first: name -> (grayscale image, previous level's image) -> image for OCR
+LEVELS = {
+    'gray': lambda gray, previous: gray,
+    'otsu': lambda gray, previous: thresholding(remove_noise(gray)),
+    'adaptive': lambda gray, previous: adaptive_thresholding(denoise(gray)),
+    'deskew': lambda gray, previous: deskew(previous),
+}
+
+##text, level name, mean word confidence, found fields (receipt_fields), image that was recognized
+CascadeResult = namedtuple('CascadeResult', ['text', 'level', 'confidence', 'fields', 'image'])
+
+class OcrCascade:
+    """
+    OCR with early exit: preprocessing levels from cheapest to heaviest, until
+    one reaches min_confidence and finds the required fields.
+
+    Args:
+        engine (batch_ocr.OcrEngine): OCR engine (a default one when None).
+        min_confidence (float): Mean word confidence (0-100) a level must reach.
+        required (tuple): Fields of receipt_fields.FieldExtractor.extract that must be found.
+        levels (list): Names from LEVELS to try, in order ('deskew' works on the level before it).
+    """
+    def __init__(self, engine=None, min_confidence=MIN_CONFIDENCE, required=REQUIRED_FIELDS, levels=tuple(LEVELS)):
+        from receipt_fields import FieldExtractor
+        if engine is None:
+            from batch_ocr import OcrEngine
+            engine = OcrEngine()
+        unknown = set(levels) - set(LEVELS)
+        if unknown:
+            raise ValueError(f'unknown cascade levels {sorted(unknown)}, expected some of {list(LEVELS)}')
+        self.engine = engine
+        self.min_confidence = min_confidence
+        self.required = tuple(required)
+        self.levels = tuple(levels)
+        self.extractor = FieldExtractor()
+        self.stats = {level: {'tried': 0, 'passed': 0, 'kept': 0, 'seconds': 0.0} for level in self.levels}
+
+    def params(self):
+        """Everything that changes the text for the same pixels (part of the cache key)."""
+        return {'levels': list(self.levels), 'min_confidence': self.min_confidence, 'required': list(self.required),
+                'denoise': DENOISE_STRENGTH, 'adaptive': [ADAPTIVE_BLOCK, ADAPTIVE_C], 'max_skew': MAX_SKEW,
+                'median_kernel': MEDIAN_KERNEL}
+
+    def run(self, img):
+        """
+        Args:
+            img (np.ndarray): BGR or grayscale image.
+
+        Returns:
+            CascadeResult of the first level that passed (or the best one when none did).
+        """
+        gray = get_grayscale(img)
+        previous = gray
+        best = best_score = None
+        for level in self.levels:
+            start = time.perf_counter()
+            image = previous = LEVELS[level](gray, previous)
+            text, confidences = self.engine.image_to_data(image)
+            confidence = float(confidences.mean()) if len(confidences) else 0.0
+            fields = self.extractor.extract(text)
+            found = sum(fields[field] is not None for field in self.required)
+            stats = self.stats[level]
+            stats['tried'] += 1
+            stats['seconds'] += time.perf_counter() - start
+
+            result = CascadeResult(text, level, confidence, fields, image)
+            if confidence >= self.min_confidence and found == len(self.required):
+                stats['passed'] += 1
+                stats['kept'] += 1
+                return result
+            ##Otherwise remember the level with the most required fields, then the highest confidence
+            if best is None or (found, confidence) > best_score:
+                best, best_score = result, (found, confidence)
+        self.stats[best.level]['kept'] += 1
+        return best
+
+    def summary(self):
+        """Per level: tried, passed, kept (receipts whose text came from it), share kept, mean ms per try."""
+        receipts = sum(s['kept'] for s in self.stats.values())
+        return {level: {**s, 'share': s['kept'] / receipts if receipts else 0.0,
+                        'ms_per_try': 1000 * s['seconds'] / s['tried'] if s['tried'] else 0.0}
+                for level, s in self.stats.items()}
+
+def run(image_path, show=False, cascade=None):
+    """
+    OCR one image through the cascade.
+
+    Args:
+        cascade (OcrCascade): Reused across images, so its stats add up (a new one when None).
+    """
+    import cv2
+
+    ##Load image
+    img = cv2.imread(image_path)
+    if img is None:
+        raise FileNotFoundError(image_path)
+    cascade = cascade or OcrCascade()
+
+    ## Run
+    result = cascade.run(img)
+    print(f"============ {image_path}: {result.level}, confidence {result.confidence:.0f} ============")
+    print(result.text)
+
+    ##Display image of what is actually going on (the level that was kept)
+    if show:
+        cv2.imshow("Image", result.image)
+        cv2.waitKey(5000) ##Wait for 5000ms (5 seconds)
+    return result.text
+
+
+if __name__ == "__main__":
+    import argparse
 
-## Run
-text = ocr_core(img)
-print("======================================")
-print(text)
-print("======================================")
+    parser = argparse.ArgumentParser(description='OCR images, escalating the preprocessing until the OCR is confident.')
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--show', action='store_true', help='display the image that was recognized for 5 seconds')
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE)
+    parser.add_argument('--levels', nargs='+', choices=list(LEVELS), default=list(LEVELS))
+    args = parser.parse_args()
 
-##Display image of what is actually going on (grayscale, noise removed, thresholded)
-cv2.imshow("Image", img)
-cv2.waitKey(5000) ##Wait for 5000ms (5 seconds)
+    cascade = OcrCascade(min_confidence=args.min_confidence, levels=args.levels)
+    for image in args.images:
+        run(image, args.show, cascade)
+    print(f"{'level':<10}{'tried':>7}{'passed':>8}{'kept':>6}{'share':>8}{'ms/try':>9}")
+    for level, s in cascade.summary().items():
+        print(f"{level:<10}{s['tried']:>7}{s['passed']:>8}{s['kept']:>6}{s['share']:>8.0%}{s['ms_per_try']:>9.0f}")
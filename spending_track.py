@@ -0,0 +1,192 @@
+"""
+==============================================================================
+ Spending Track command line
+==============================================================================
+One entry point for the project scripts:
+
+    python spending_track.py merge   [--mode memory|stream|incremental] [--card ...] [--household ...]
+    python spending_track.py profile [merged_transactions.csv | merged_transactions/]
+    python spending_track.py query   [--start ...] [--end ...] [--customer ID] [--merchant ...] [--category ...]
+    python spending_track.py ocr     receipts/ [receipt.png ...] [--workers N] [--preprocess | --cascade] [--lines] [--ledger DB]
+    python spending_track.py ledger  load [merged_transactions.csv] | add | show [--start ...] [--source manual]
+    python spending_track.py reconcile receipts.csv|ledger.db [card_transactions.csv] [--out matches.csv] [--days N]
+    python spending_track.py detect  receipt.png [--out-dir debug/]
+
+Only argparse is imported up front. Each subcommand imports its own module
+(pandas for merge/profile, cv2 + pytesseract for ocr/detect) when it runs,
+so `--help` and every subcommand start without the others' imports.
+Plots are written with the Agg backend and never shown. Paths left out fall
+back to the repository's dataset/ folder.
+"""
+import argparse
+import sys
+
+#------------------------------------------------------- SUBCOMMANDS -----------------------------------------------
+def run_merge(args):
+    import merge_data as md
+
+    card = args.card or md.card_path
+    household = args.household or md.household_path
+    info_dir = args.info_dir or md.data_info_path
+    out_dir = args.out_dir or md.after_merge
+    seed = md.SEED if args.seed is None else args.seed
+
+    if args.mode == 'memory':
+        md.main(card, household, info_dir, out_dir, seed, args.workers, trace_file=args.trace,
+                profile_dir=args.profile_dir)
+    elif args.mode == 'stream':
+        import merge_stream
+        summary = merge_stream.stream_merge(card, household, out_dir, info_dir, args.chunk_rows,
+                                            tmp_dir=args.tmp_dir, seed=seed, workers=args.workers)
+        print(f"Done: {summary['rows']:,} rows ✔️")
+    else:
+        import merge_incremental
+        print(merge_incremental.incremental_merge(card, household, out_dir, seed, args.chunk_rows, args.rebuild_index))
+
+def run_profile(args):
+    import read_info
+    read_info.main(args.path, args.columns, args.start, args.end, args.chunk_rows, args.json)
+
+def run_query(args):
+    import transaction_index
+    index_dir = args.index or transaction_index.DEFAULT_INDEX
+    transaction_index.main(index_dir, args.build, args.start, args.end, args.customer, args.merchant, args.category,
+                           args.limit)
+
+def run_ocr(args):
+    import OCR
+    OCR.main(args.images, args.tesseract_cmd, args.preprocess, args.workers, args.cache_dir, args.lines, args.crop, args.cascade,
+             args.ledger)
+
+def run_ledger(args):
+    import ledger
+    book = ledger.Ledger(args.db or ledger.DEFAULT_LEDGER)
+    if args.action == 'load':
+        import os
+        import time
+        import merge_data as md
+        path = args.path or os.path.join(md.after_merge, 'merged_transactions.csv')
+        start = time.perf_counter()
+        rows = book.load_merged(path)
+        print(f'{rows:,} merged rows loaded into {book.path} in {time.perf_counter() - start:.1f} s')
+    elif args.action == 'add':
+        import OCR
+        OCR.mannual_entry(book)
+    else:
+        filters = dict(start=args.start, end=args.end, customer_id=args.customer, merchant=args.merchant,
+                       category=args.category, source=args.source)
+        print(book.query(limit=args.limit, **filters).to_string())
+        print(f'{book.count(**filters):,} of {len(book):,} transactions, total {book.total(**filters):,.2f}')
+    book.close()
+
+def run_reconcile(args):
+    import reconcile
+    import merge_data as md
+    reconcile.main(args.receipts, args.transactions or md.card_path, args.out, args.amount_tol, args.days,
+                   args.min_similarity)
+
+def run_detect(args):
+    from Text_Detection import text_region
+    text_region.main(args.image, args.out_dir, args.show)
+
+#------------------------------------------------------- PARSER -----------------------------------------------
+def build_parser():
+    parser = argparse.ArgumentParser(prog='spending_track', description='Spending Track tools.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    merge = sub.add_parser('merge', help='merge the card and household datasets')
+    merge.add_argument('--mode', choices=['memory', 'stream', 'incremental'], default='memory',
+                       help='memory: merge_data.py, stream: bounded-memory merge_stream.py, '
+                            'incremental: only process what changed since the last run')
+    merge.add_argument('--card', default=None, help='credit card CSV (default: dataset/before_merge/)')
+    merge.add_argument('--household', default=None, help='household CSV (default: dataset/before_merge/)')
+    merge.add_argument('--info-dir', default=None, help='per-source histograms (default: dataset/data_info/)')
+    merge.add_argument('--out-dir', default=None, help='merged outputs (default: dataset/after_merge/)')
+    merge.add_argument('--seed', type=int, default=None)
+    merge.add_argument('--workers', type=int, default=None, help='processes for the card transform (default: all cores)')
+    merge.add_argument('--chunk-rows', type=int, default=500_000, help='stream/incremental chunk size')
+    merge.add_argument('--tmp-dir', default=None, help='stream: directory for sorted runs')
+    merge.add_argument('--rebuild-index', action='store_true',
+                       help='incremental: rebuild the transaction index (reads the whole output) instead of removing it')
+    merge.add_argument('--trace', default=None, help='memory: JSON stage trace (default: merge_trace.json in --out-dir)')
+    merge.add_argument('--profile-dir', default=None, help='memory: also dump a cProfile of every stage here')
+    merge.set_defaults(func=run_merge)
+
+    profile = sub.add_parser('profile', help='single-pass profile of the merged transactions')
+    profile.add_argument('path', nargs='?', default=None,
+                         help='merged CSV or Parquet folder (default: dataset/after_merge/)')
+    profile.add_argument('--columns', nargs='+', default=None, help='Parquet: only load these columns')
+    profile.add_argument('--start', default=None, help='Parquet: first date, e.g. 2019-01-01')
+    profile.add_argument('--end', default=None, help='Parquet: last date, e.g. 2019-06-30')
+    profile.add_argument('--chunk-rows', type=int, default=1_000_000)
+    profile.add_argument('--json', default=None, help='write the JSON report to this file')
+    profile.set_defaults(func=run_profile)
+
+    query = sub.add_parser('query', help='look up transactions by date range, customer, merchant or category')
+    query.add_argument('--index', default=None, help='index folder (default: dataset/after_merge/merged_transactions.idx)')
+    query.add_argument('--build', default=None, metavar='MERGED',
+                       help='(re)build the index from this merged CSV or Parquet folder first')
+    query.add_argument('--start', default=None, help='first date, e.g. 2019-03-01')
+    query.add_argument('--end', default=None, help='last date (inclusive; a date alone covers the whole day), e.g. 2019-03-31')
+    query.add_argument('--customer', type=int, default=None, help='customer_id')
+    query.add_argument('--merchant', nargs='+', default=None, help='any of these merchants')
+    query.add_argument('--category', nargs='+', default=None, help='any of these categories')
+    query.add_argument('--limit', type=int, default=20, help='rows printed')
+    query.set_defaults(func=run_query)
+
+    ocr = sub.add_parser('ocr', help='extract the text of receipt images')
+    ocr.add_argument('images', nargs='+', help='images and/or directories of images')
+    ocr.add_argument('--workers', type=int, default=None, help='OCR worker processes (default: all cores)')
+    ocr.add_argument('--tesseract-cmd', default=None, help='tesseract binary (default: found on PATH)')
+    ocr.add_argument('--preprocess', action='store_true', help='grayscale, denoise and threshold first')
+    ocr.add_argument('--cache-dir', default=None, help='reuse OCR results of unchanged images (content-addressed cache)')
+    ocr.add_argument('--lines', action='store_true', help='OCR only the detected text lines (faster on photos)')
+    ocr.add_argument('--crop', choices=('morphology', 'adaptive'), default=None,
+                     help='auto-crop each photo to the receipt first (Crop_Functions/auto_crop.py)')
+    ocr.add_argument('--cascade', action='store_true',
+                     help='escalate the preprocessing only for receipts the OCR is not confident about')
+    ocr.add_argument('--ledger', default=None, metavar='DB', help='book every receipt with a total into this ledger')
+    ocr.set_defaults(func=run_ocr)
+
+    ledger = sub.add_parser('ledger', help='SQLite ledger of merged, manual and OCR transactions')
+    ledger.add_argument('action', choices=['load', 'add', 'show'],
+                      help='load: (re)load the merged output, add: manual entry, show: query')
+    ledger.add_argument('path', nargs='?', default=None,
+                      help='load: merged CSV or Parquet folder (default: dataset/after_merge/merged_transactions.csv)')
+    ledger.add_argument('--db', default=None, help='ledger database (default: dataset/ledger.db)')
+    ledger.add_argument('--start', default=None, help='show: first date, e.g. 2019-03-01')
+    ledger.add_argument('--end', default=None, help='show: last date (inclusive; a date alone covers the whole day), e.g. 2019-03-31')
+    ledger.add_argument('--customer', type=int, default=None)
+    ledger.add_argument('--merchant', default=None)
+    ledger.add_argument('--category', default=None)
+    ledger.add_argument('--source', choices=['merged', 'manual', 'ocr'], default=None)
+    ledger.add_argument('--limit', type=int, default=20, help='show: rows printed')
+    ledger.set_defaults(func=run_ledger)
+
+    reconcile = sub.add_parser('reconcile', help='match OCR receipts to card transactions')
+    reconcile.add_argument('receipts', help='CSV with merchant, date, total columns, or a ledger .db (its OCR rows)')
+    reconcile.add_argument('transactions', nargs='?', default=None,
+                           help='card export CSV (default), merged CSV / Parquet folder, or transaction index folder')
+    reconcile.add_argument('--out', default=None, help='write the receipts with their match here (CSV)')
+    reconcile.add_argument('--amount-tol', type=float, default=0.01, help='largest amount difference matched')
+    reconcile.add_argument('--days', type=int, default=3, help='largest date difference matched, in days')
+    reconcile.add_argument('--min-similarity', type=float, default=0.6, help='lowest merchant name similarity (0-1)')
+    reconcile.set_defaults(func=run_reconcile)
+
+    detect = sub.add_parser('detect', help='detect text regions (MSER) in an image')
+    detect.add_argument('image')
+    detect.add_argument('--out-dir', default=None, help='write the result images here (nothing is written otherwise)')
+    detect.add_argument('--show', action='store_true', help='display the results for 5 seconds each')
+    detect.set_defaults(func=run_detect)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'ocr' and args.cascade and (args.preprocess or args.lines):
+        parser.error('--cascade picks its own preprocessing and reads whole receipts: not with --preprocess or --lines')
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
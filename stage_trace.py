@@ -0,0 +1,262 @@
+"""
+==============================================================================
+ Pipeline Stage Trace
+==============================================================================
+Per-stage wall time, CPU time, rows in/out and peak RSS for the merge
+pipeline, cheap enough to leave on in every run:
+
+# - Time: perf_counter and getrusage (this process + reaped children, so the
+#   CPU of a finished process pool counts towards the stage that ran it).
+# - Peak RSS: on Linux the kernel's high-water mark (VmHWM) is reset when a
+#   stage starts (/proc/self/clear_refs) and read when it ends, so the peak
+#   is the stage's own, with no sampling thread. Elsewhere it is the process
+#   peak so far (ru_maxrss); report()['peak_scope'] says which.
+# - A stage entered again (once per chunk) or recorded by pool workers
+#   (merge() of a worker Tracer's records) adds up into one row with a call count.
+# - Nested stages are named parent.child.
+#
+# One enter/exit costs a few tens of microseconds. With profile_dir set,
+# every top-level stage also runs under cProfile and is dumped to
+# <profile_dir>/<nn>_<stage>.prof (python -m pstats, snakeviz, flameprof).
+
+Usage:
+    trace = Tracer('merge')
+    with trace.stage('load_card') as stage:
+        df = load()
+        stage.rows_out = len(df)
+    trace.write('merge_trace.json')
+"""
+import json
+import os
+import platform
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def rss_mb():
+    """Current resident set size in MB (None where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+def reset_peak():
+    """Reset the kernel's RSS high-water mark of this process; False where that is not possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_mb():
+    """RSS high-water mark in MB (since the last reset_peak on Linux, process lifetime elsewhere)."""
+    try:
+        with open('/proc/self/status') as f:
+            return int(re.search(r'VmHWM:\s+(\d+)', f.read()).group(1)) / 1024
+    except (OSError, AttributeError):
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def cpu_seconds():
+    """User + system CPU of this process and its reaped children."""
+    if resource is None:
+        return time.process_time()
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+class Stage:
+    """Totals of one stage name. Set rows_in / rows_out inside the `with` block."""
+    __slots__ = ('name', 'calls', 'start', 'seconds', 'cpu_seconds', 'rows_in', 'rows_out', 'peak_rss_mb', 'rss_mb')
+
+    def __init__(self, name, start):
+        self.name = name
+        self.calls = 0
+        self.start = start
+        self.seconds = self.cpu_seconds = 0.0
+        self.rows_in = self.rows_out = None
+        self.peak_rss_mb = self.rss_mb = None
+
+    def to_dict(self):
+        out = {name: getattr(self, name) for name in self.__slots__}
+        for name in ('start', 'seconds', 'cpu_seconds'):
+            out[name] = round(out[name], 6)
+        for name in ('peak_rss_mb', 'rss_mb'):
+            out[name] = None if out[name] is None else round(out[name], 1)
+        return out
+
+def add_rows(total, rows):
+    return rows if total is None else total + (rows or 0)
+
+def max_peak(a, b):
+    return a if b is None else b if a is None else max(a, b)
+
+##Marks the end of Tracer.iterate's items
+END = object()
+
+class Tracer:
+    """
+    Records the stages of one run.
+
+    Args:
+        name (str): Run name in the trace ('merge', 'stream', ...).
+        profile_dir (str): Also cProfile every top-level stage into this folder (None = off).
+    """
+    def __init__(self, name='run', profile_dir=None):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+        self.stages = {}
+        self.open = []
+        ##Whether peaks are per stage (Linux) or the process peak so far
+        self.peak_scope = 'stage' if reset_peak() else 'process'
+        self.profiled = 0
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Time the block as stage `name` (prefixed with the enclosing stage's name).
+
+        Yields:
+            Stage: the running totals; set rows_in / rows_out on it (added up per call).
+        """
+        name = f'{self.open[-1][0].name}.{name}' if self.open else name
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name, time.perf_counter() - self.t0)
+        call = Stage(name, 0.0)
+        call.rows_in = rows_in
+
+        ##The enclosing stages keep the peak reached so far before it is reset for this one
+        peak = peak_mb()
+        for parent, _ in self.open:
+            parent.peak_rss_mb = max_peak(parent.peak_rss_mb, peak)
+        if self.peak_scope == 'stage':
+            reset_peak()
+
+        profiler = None
+        if self.profile_dir and not self.open:
+            import cProfile
+            profiler = cProfile.Profile()
+        self.open.append((call, stage))
+        cpu, start = cpu_seconds(), time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield call
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds, cpu = time.perf_counter() - start, cpu_seconds() - cpu
+            self.open.pop()
+            peak = max_peak(call.peak_rss_mb, peak_mb())
+            for parent, _ in self.open:
+                parent.peak_rss_mb = max_peak(parent.peak_rss_mb, peak)
+
+            stage.calls += 1
+            stage.seconds += seconds
+            stage.cpu_seconds += cpu
+            stage.rows_in = add_rows(stage.rows_in, call.rows_in)
+            stage.rows_out = add_rows(stage.rows_out, call.rows_out)
+            stage.peak_rss_mb = max_peak(stage.peak_rss_mb, peak)
+            stage.rss_mb = rss_mb()
+            if profiler is not None:
+                self.dump_profile(profiler, name)
+
+    def dump_profile(self, profiler, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.profiled += 1
+        profiler.dump_stats(os.path.join(self.profile_dir, f'{self.profiled:02d}_{name}.prof'))
+
+    def records(self):
+        """Stage totals as dicts (picklable, for merge() in the parent of a pool worker)."""
+        return [stage.to_dict() for stage in self.stages.values()]
+
+    def iterate(self, name, items):
+        """
+        Yield from items, timing every next() as a call of stage `name` (rows_out =
+        len(item)), e.g. the chunk reads of a lazy CSV reader. The last call is the
+        one that finds the end.
+        """
+        items = iter(items)
+        while True:
+            with self.stage(name) as call:
+                item = next(items, END)
+                if item is not END and hasattr(item, '__len__'):
+                    call.rows_out = len(item)
+            if item is END:
+                return
+            yield item
+
+    def merge(self, records, prefix=None):
+        """
+        Add stage records of another Tracer (e.g. from a pool worker) under
+        prefix.name; prefix defaults to the stage open here.
+        """
+        if prefix is None and self.open:
+            prefix = self.open[-1][0].name
+        for record in records:
+            name = f"{prefix}.{record['name']}" if prefix else record['name']
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = Stage(name, time.perf_counter() - self.t0)
+            stage.calls += record['calls']
+            stage.seconds += record['seconds']
+            stage.cpu_seconds += record['cpu_seconds']
+            stage.rows_in = add_rows(stage.rows_in, record['rows_in'])
+            stage.rows_out = add_rows(stage.rows_out, record['rows_out'])
+            stage.peak_rss_mb = max_peak(stage.peak_rss_mb, record['peak_rss_mb'])
+
+    def report(self):
+        """The JSON trace: run metadata, total seconds and every stage in order of first start."""
+        return {
+            'run': self.name,
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self.t0, 6),
+            'pid': os.getpid(),
+            'python': platform.python_version(),
+            'argv': sys.argv,
+            'peak_scope': self.peak_scope,
+            'stages': self.records(),
+        }
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def summary(self):
+        """One aligned line per stage (seconds, CPU, rows in/out, peak MB)."""
+        lines = [f"{'stage':<34}{'calls':>6}{'seconds':>10}{'cpu':>10}{'rows in':>14}{'rows out':>14}{'peak MB':>9}"]
+        rows = lambda n: '' if n is None else f'{n:,}'
+        for s in self.stages.values():
+            peak = '' if s.peak_rss_mb is None else f'{s.peak_rss_mb:.0f}'
+            lines.append(f'{s.name:<34}{s.calls:>6}{s.seconds:>10.3f}{s.cpu_seconds:>10.3f}'
+                         f'{rows(s.rows_in):>14}{rows(s.rows_out):>14}{peak:>9}')
+        return '\n'.join(lines)
+
+class NullTracer:
+    """Records nothing: the default of functions that take a trace."""
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        yield Stage(name, 0.0)
+
+    def iterate(self, name, items):
+        return items
+
+    def merge(self, records, prefix=None):
+        pass
+
+NULL_TRACER = NullTracer()
@@ -0,0 +1,62 @@
+"""Small seeded inputs shared by the tests (same layout as the real exports)."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import merge_data as md
+
+
+def card_frame(n, seed=0, start='2019-01-01'):
+    """Card export rows: unnamed row number, ISO dates in order, category, amt (one missing date)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, 90 * 86400, n)), unit='s')
+    dates = pd.Series(dates.strftime('%Y-%m-%d %H:%M:%S'), dtype=object)
+    dates.iloc[n // 2] = None
+    return pd.DataFrame({
+        'trans_date_trans_time': dates,
+        'cc_num': rng.integers(10**15, 10**16, n),
+        'merchant': 'fraud_' + pd.Series(rng.choice(['Kub', 'Lind', 'Rau', 'Mann'], n)),
+        'category': rng.choice(list(md.merchant_options), n),
+        'amt': np.round(rng.gamma(1.5, 45.0, n) + 1, 2),
+    })
+
+
+def household_frame(n, seed=1):
+    """Household export rows: day-first dates (some without time), title-cased vocabulary, INR."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 200 * 86400, n), unit='s')
+    text = pd.Series(dates.strftime('%d/%m/%Y %H:%M:%S'), dtype=object)
+    text[rng.random(n) < 0.2] = pd.Series(dates.strftime('%d/%m/%Y'), dtype=object)
+    return pd.DataFrame({
+        'Date': text,
+        'Mode': 'Cash',
+        'Category': rng.choice(['Food', 'Transportation', 'Household'], n),
+        'Subcategory': 'Other',
+        'Note': 'note',
+        'Amount': np.round(rng.gamma(1.2, 400.0, n), 0),
+        'Income/Expense': 'Expense',
+        'Currency': 'INR',
+    })
+
+
+def merged_frame(n, seed=0):
+    """Merged-like frame: typed dates in order over Jan-Jun 2019, ~10 transactions per customer."""
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2019-01-01', 'ns') + np.sort(rng.integers(0, 181 * 86400, n)).astype('timedelta64[s]')
+    return pd.DataFrame({
+        'customer_id': rng.integers(0, max(n // 10, 1), n).astype(np.int32),
+        'transaction_date': dates,
+        'merchant': pd.Categorical(rng.choice(['Kub', 'Lind', 'Rau', 'Mann', 'Bins'], n)),
+        'amount': np.round(rng.gamma(2.0, 35.0, n), 2),
+        'category': pd.Categorical(rng.choice(['food', 'travel', 'health'], n)),
+        'subcategory': pd.Categorical(rng.choice(['cafe', 'train', 'pharmacy', 'bakery'], n)),
+    })
+
+
+@pytest.fixture
+def sources(tmp_path):
+    """(card csv, household csv) with 3,000 and 500 rows."""
+    card, household = tmp_path / 'card.csv', tmp_path / 'household.csv'
+    card_frame(3_000).to_csv(card)
+    household_frame(500).to_csv(household, index=False)
+    return str(card), str(household)
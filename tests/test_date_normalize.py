@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from date_normalize import DateNormalizer
+
+
+def normalizer():
+    return DateNormalizer(np.random.default_rng(0), pd.Timestamp('2019-01-01'), pd.Timestamp('2020-12-31'))
+
+
+def test_missing_dates_are_imputed_in_the_window():
+    out = normalizer().normalize(['20/09/2018 12:04:08', None, '2019-01-01 00:00:18', np.nan])
+    assert out[0] == np.datetime64('2018-09-20T12:04:08')
+    assert out[2] == np.datetime64('2019-01-01T00:00:18')
+    for imputed in out[[1, 3]]:
+        assert np.datetime64('2019-01-01') <= imputed <= np.datetime64('2020-12-31')
+        assert imputed != out[2]
+
+
+def test_only_missing_dates():
+    out = normalizer().normalize([None, np.nan])
+    assert not np.isnat(out).any()
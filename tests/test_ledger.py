@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import merge_data as md
+from conftest import merged_frame
+from ledger import Ledger
+
+
+@pytest.fixture
+def book(tmp_path):
+    with Ledger(str(tmp_path / 'ledger.db')) as book:
+        yield book
+
+
+def write_merged(df, path):
+    md.write_csv(df, str(path))
+    return str(path)
+
+
+def test_add_is_visible_at_once_and_date_only_end_covers_the_day(book):
+    book.add('Starbucks', 4.75, '14/03/2025', category='food')
+    book.add('Starbucks', 5.25, '31/03/2025 18:30:00', category='food')
+    book.add('Blue Bottle', 3.00, '2025-04-01', category='food')
+    march = book.query(start='2025-03-01', end='2025-03-31', source='manual')
+    assert march['amount'].tolist() == [4.75, 5.25]
+    assert march['merchant'].tolist() == ['Starbucks', 'Starbucks']
+    assert book.count(end='2025-03-31 12:00:00') == 1
+    assert book.total(merchant='Starbucks') == 10.0
+    assert book.count(merchant='Unknown') == 0
+
+
+def test_load_merged_replaces_merged_rows_and_skips_missing_dates(book, tmp_path, capsys):
+    df = merged_frame(1_000)
+    book.add('Manual', 1.0, '2025-01-01')
+    assert book.load_merged(write_merged(df, tmp_path / 'a.csv'), chunk_rows=300) == 1_000
+
+    undated = df.head(10).copy()
+    undated.loc[3, 'transaction_date'] = pd.NaT
+    assert book.load_merged(write_merged(undated, tmp_path / 'b.csv')) == 9
+    assert '1 rows without a date skipped' in capsys.readouterr().out
+    assert book.count(source='merged') == 9 and book.count(source='manual') == 1
+    assert np.isclose(book.total(source='merged'), undated['amount'].drop(3).sum())
+
+
+def test_failed_load_rolls_back(book, tmp_path):
+    df = merged_frame(1_000)
+    book.load_merged(write_merged(df, tmp_path / 'a.csv'))
+    bad = df.copy()
+    bad['merchant'] = bad['merchant'].cat.add_categories(['Brand New'])
+    bad.loc[0, 'merchant'] = 'Brand New'
+    bad.loc[900, 'amount'] = np.nan
+    with pytest.raises(Exception):
+        book.load_merged(write_merged(bad, tmp_path / 'bad.csv'), chunk_rows=300)
+
+    assert book.count(source='merged') == 1_000
+    assert np.isclose(book.total(), df['amount'].sum())
+    ##Names inserted by the rolled back load are not cached either
+    assert 'Brand New' not in book.ids['merchant']
+    book.add('Brand New', 2.0, '2025-01-01')
+    assert book.count(merchant='Brand New') == 1
+    assert pd.notna(book.query(merchant='Brand New')['transaction_date']).all()
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnar_store as cs
+import merge_data as md
+import transaction_index
+from conftest import card_frame
+from merge_incremental import OUTPUT, incremental_merge
+
+
+def append_card(card, n, start):
+    rows = card_frame(n, seed=5, start=start)
+    ##After every existing row (missing dates are imputed up to today); a missing one would force a rewrite
+    rows['trans_date_trans_time'] = rows['trans_date_trans_time'].ffill()
+    rows.index += len(pd.read_csv(card, usecols=[0]))
+    rows.to_csv(card, mode='a', header=False)
+
+
+def test_manifest_detects_unchanged_appended_and_rewritten_sources(sources, tmp_path):
+    card, household = sources
+    out = str(tmp_path / 'out')
+    assert incremental_merge(card, household, out, chunk_rows=1_000)['output'] == 'full'
+    assert incremental_merge(card, household, out, chunk_rows=1_000) == \
+        {'card': 'unchanged', 'household': 'unchanged', 'new_rows': 0, 'output': 'unchanged'}
+
+    append_card(card, 200, '2030-01-01')
+    report = incremental_merge(card, household, out, chunk_rows=1_000)
+    assert (report['card'], report['household'], report['new_rows'], report['output']) == ('append', 'unchanged', 200, 'append')
+
+    pd.read_csv(household).iloc[::-1].to_csv(household, index=False)
+    report = incremental_merge(card, household, out, chunk_rows=1_000)
+    assert (report['card'], report['household'], report['output']) == ('unchanged', 'rebuild', 'rewrite')
+
+    merged = pd.read_csv(os.path.join(out, OUTPUT))
+    assert len(merged) == 3_700
+    assert pd.to_datetime(merged['transaction_date'], format=md.DATE_FORMAT).is_monotonic_increasing
+
+
+def test_parquet_copy_follows_the_csv_and_stale_index_is_removed(sources, tmp_path):
+    card, household = sources
+    out = str(tmp_path / 'out')
+    incremental_merge(card, household, out, chunk_rows=1_000)
+    csv_file, parquet = os.path.join(out, OUTPUT), os.path.join(out, 'merged_transactions')
+    cs.csv_to_parquet(csv_file, parquet)
+    transaction_index.build_from_file(csv_file, os.path.join(out, 'merged_transactions.idx'))
+    january = sorted(os.listdir(os.path.join(parquet, 'month=2019-01')))
+
+    append_card(card, 200, '2030-01-01')
+    incremental_merge(card, household, out, chunk_rows=1_000)
+
+    merged = pd.read_csv(csv_file)
+    copy = cs.read_transactions(parquet)
+    assert len(copy) == len(merged)
+    assert np.isclose(copy['amount'].astype(float).sum(), merged['amount'].sum(), rtol=1e-6)
+    ##Only the months of the new rows were rewritten
+    assert sorted(os.listdir(os.path.join(parquet, 'month=2019-01'))) == january
+    assert not os.path.exists(os.path.join(out, 'merged_transactions.idx'))
@@ -0,0 +1,17 @@
+import os
+
+import merge_data as md
+import merge_stream as ms
+
+
+def test_stream_merge_matches_the_in_memory_merge(sources, tmp_path):
+    card, household = sources
+    memory, stream = str(tmp_path / 'memory'), str(tmp_path / 'stream')
+    os.makedirs(memory)
+    md.main(card, household, info_dir=memory, out_dir=memory, seed=7, workers=1)
+    summary = ms.stream_merge(card, household, stream, chunk_rows=md.CHUNK_ROWS, seed=7, workers=1)
+
+    with open(os.path.join(memory, 'merged_transactions.csv'), 'rb') as a, \
+         open(os.path.join(stream, 'merged_transactions.csv'), 'rb') as b:
+        assert a.read() == b.read()
+    assert summary['card'] == 3_000 and summary['household'] == 500
@@ -0,0 +1,14 @@
+import columnar_store as cs
+from conftest import merged_frame
+from read_info import profile
+
+
+def test_distinct_counts_on_a_filtered_parquet_scan(tmp_path):
+    root = str(tmp_path / 'merged_transactions')
+    cs.write_dataset(merged_frame(20_000), root)
+    expected = cs.read_transactions(root, start='2019-03-01', end='2019-03-31')
+
+    stats = profile(root, chunk_rows=2_000, start='2019-03-01', end='2019-03-31', tmp_dir=str(tmp_path))['column_stats']
+    for column in ['merchant', 'category', 'subcategory']:
+        assert stats[column]['distinct_exact']
+        assert stats[column]['distinct'] == expected[column].nunique()
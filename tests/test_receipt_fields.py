@@ -0,0 +1,22 @@
+from receipt_fields import FieldExtractor
+
+
+def test_merchant_after_a_date_line():
+    fields = FieldExtractor().extract('12/03/2019\nSTARBUCKS\nLatte 4.50\nTOTAL 4.50')
+    assert fields['merchant'].value == 'STARBUCKS'
+    assert fields['date'].value == '12/03/2019'
+
+
+def test_first_line_item_is_not_the_merchant():
+    fields = FieldExtractor().extract('Latte 4.50\nMuffin 2.25\nTotal 6.75')
+    assert fields['merchant'] is None
+    assert [(item.name, item.price) for item in fields['items']] == [('Latte', 4.5), ('Muffin', 2.25)]
+
+
+def test_item_price_with_thousands_commas():
+    extractor = FieldExtractor()
+    text = 'ELECTRO MART\nItem 1,234.50\nTOTAL 1,234.50'
+    assert [(item.name, item.price) for item in extractor.extract(text)['items']] == [('Item', 1234.5)]
+    receipts, items = extractor.extract_batch([text])
+    assert items['price'].tolist() == [1234.5]
+    assert receipts['merchant'].tolist() == ['ELECTRO MART']
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from reconcile import Reconciler, normalize_merchant, similarity
+
+
+def card(rows):
+    """rows: (date, merchant, amount)."""
+    dates, merchants, amounts = zip(*rows)
+    return pd.DataFrame({'date': pd.to_datetime(list(dates)), 'merchant': pd.Categorical(merchants),
+                         'amount': list(amounts)})
+
+
+def receipts(rows):
+    """rows: (merchant, dd/mm/yyyy date or None, total)."""
+    return pd.DataFrame(rows, columns=['merchant', 'date', 'total'])
+
+
+def test_amount_tolerance_reaches_the_neighbouring_buckets():
+    ##Buckets are 3 cents wide at the default 1 cent tolerance: 10.02 sits in 334, 10.01 in 333
+    result = Reconciler(card([('2019-03-10', 'fraud_Kub', 10.02)])).match(receipts([
+        ('KUB', '10/03/2019', 10.01), ('KUB', '11/03/2019', 10.03), ('KUB', '10/03/2019', 10.04),
+    ]))
+    assert result['status'].tolist() == ['matched', 'ambiguous', 'unmatched']
+    assert result['reason'].tolist()[1:] == ['transaction fits a better receipt', 'no transaction within amount / date']
+
+
+def test_date_window_and_receipts_without_a_date():
+    transactions = card([('2019-03-10 18:00:00', 'fraud_Kub', 25.00), ('2019-06-01 09:00:00', 'fraud_Lind', 7.50)])
+    result = Reconciler(transactions, days=3).match(receipts([
+        ('Kub', '13/03/2019', 25.00), ('Lind', '05/06/2019', 7.50), ('Lind', None, 7.50), ('Lind', '01/06/2019', None),
+    ]))
+    assert result['status'].tolist() == ['matched', 'unmatched', 'unmatched', 'unmatched']
+    assert result['day_diff'].tolist()[0] == 3
+    assert result['reason'].tolist()[1:] == ['no transaction within amount / date', 'no date', 'no total']
+    assert result['candidates'].tolist()[2:] == [0, 0]
+
+
+def test_ambiguous_and_lost_to_a_better_receipt():
+    transactions = card([
+        ('2019-03-10', 'fraud_Kub', 12.00), ('2019-03-10', 'fraud_Kub', 12.00),
+        ('2019-04-01', 'fraud_Heller-Lind', 30.00),
+    ])
+    result = Reconciler(transactions).match(receipts([
+        ('KUB', '10/03/2019', 12.00),
+        ('HELLER LIND', '01/04/2019', 30.00), ('HE11ER-LIND #44', '02/04/2019', 30.00),
+        ('ZIEME', '01/04/2019', 30.00),
+    ]))
+    assert result['status'].tolist() == ['ambiguous', 'matched', 'ambiguous', 'unmatched']
+    assert result['reason'].tolist() == ['several transactions fit', '', 'transaction fits a better receipt',
+                                         'merchant differs']
+    assert result['transaction'].tolist()[1] == 2
+
+
+def test_merchant_names_normalize_ocr_confusions():
+    assert normalize_merchant('fraud_Kub & Sons, Inc. #1042') == normalize_merchant('KU8 5ONS 1NC')
+    assert similarity(normalize_merchant('Lcrnke LLC'), normalize_merchant('fraud_Lemke')) == 1.0
+    assert np.isclose(similarity('rau', 'rau ratke reichel'), 0.7)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from conftest import merged_frame
+from rollup import RollupCube
+
+
+def chunked_cube(df, rows=1_000):
+    cube = RollupCube()
+    for i in range(0, len(df), rows):
+        cube.update(df.iloc[i:i + rows], 'card')
+    return cube
+
+
+def test_chunked_updates_match_one_update():
+    df = merged_frame(5_000)
+    one = RollupCube().update(df, 'card').query(by=['category', 'merchant'], grain='month')
+    chunked = chunked_cube(df).query(by=['category', 'merchant'], grain='month')
+    pd.testing.assert_frame_equal(one, chunked)
+
+
+def test_partial_month_range_counts_only_the_days_in_range():
+    df = merged_frame(5_000)
+    dates = df['transaction_date']
+    inside = df[(dates >= '2019-03-10') & (dates < '2019-04-21')]
+    expected = inside.groupby(dates.dt.to_period('M'))['amount'].agg(['sum', 'count'])
+
+    got = chunked_cube(df).query(by=[], grain='month', start='2019-03-10', end='2019-04-20')
+    assert got['count'].tolist() == expected['count'].tolist()
+    assert np.allclose(got['sum'], expected['sum'])
+
+
+def test_whole_month_range_and_replace_source():
+    df = merged_frame(5_000)
+    cube = chunked_cube(df)
+    march = cube.query(by=['category'], start='2019-03-01', end='2019-03-31')
+    dates = df['transaction_date']
+    assert march['count'].sum() == ((dates >= '2019-03-01') & (dates < '2019-04-01')).sum()
+
+    cube.update(df.head(100), 'household')
+    cube.replace_source(df.head(10), 'household')
+    assert cube.query(by=['source']).loc['household', 'count'] == 10
+    assert cube.query(by=['source']).loc['card', 'count'] == len(df)
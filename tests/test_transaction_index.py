@@ -0,0 +1,38 @@
+import numpy as np
+
+from conftest import merged_frame
+from transaction_index import TransactionIndex, build_index
+
+
+def index_of(tmp_path, df):
+    return TransactionIndex(build_index(df, str(tmp_path / 'merged_transactions.idx')))
+
+
+def test_date_only_end_includes_the_whole_day(tmp_path):
+    df = merged_frame(5_000)
+    index = index_of(tmp_path, df)
+    dates = df['transaction_date']
+    march = (dates >= '2019-03-01') & (dates < '2019-04-01')
+    assert index.count(start='2019-03-01', end='2019-03-31') == march.sum()
+    assert np.isclose(index.total(start='2019-03-01', end='2019-03-31'), df.loc[march, 'amount'].sum())
+    assert index.count(end='2019-03-31 12:00:00') == (dates <= '2019-03-31 12:00:00').sum()
+
+    customer = int(df.loc[march, 'customer_id'].iloc[-1])
+    expected = (march & (df['customer_id'] == customer)).sum()
+    assert index.count(customer_id=customer, start='2019-03-01', end='2019-03-31') == expected
+
+
+def test_filters_match_pandas(tmp_path):
+    df = merged_frame(5_000)
+    index = index_of(tmp_path, df)
+    got = index.query(merchant=['Kub', 'Rau', 'Kub'], category='food', start='2019-02-01', end='2019-02-28')
+    dates = df['transaction_date']
+    expected = df[df['merchant'].isin(['Kub', 'Rau']) & (df['category'] == 'food')
+                  & (dates >= '2019-02-01') & (dates < '2019-03-01')]
+    assert got['amount'].tolist() == expected['amount'].tolist()
+
+
+def test_key_outside_the_stored_dtype_selects_nothing(tmp_path):
+    index = index_of(tmp_path, merged_frame(1_000))
+    assert index.count(customer_id=2**40) == 0
+    assert index.count(customer_id=[2**40, -2**40], category='food') == 0
@@ -0,0 +1,307 @@
+"""
+==============================================================================
+ Indexed Queries over Merged Transactions
+==============================================================================
+A read-only index folder next to the merged output
+(after_merge/merged_transactions.idx/) that answers time-range, customer,
+merchant and category questions without loading the dataset:
+
+# - One .npy file per column, rows in transaction_date order, opened with
+#   np.load(mmap_mode='r'): a query only pages in the rows it touches.
+#   merchant / category / subcategory are stored as integer codes with their
+#   vocabulary in meta.json.
+# - Time range: binary search (searchsorted) in the sorted date column gives a
+#   contiguous row range [lo, hi).
+# - customer_id, merchant, category: CSR postings - <col>.keys (distinct values,
+#   sorted), <col>.offsets and <col>.rows (row numbers grouped by key, ascending
+#   within a key). A key's rows are rows[offsets[i]:offsets[i + 1]] after one
+#   binary search, and since row order is date order, a date range cuts that
+#   list with two more binary searches.
+# - Several filters: the shortest cut posting list (or the date range when that
+#   is shorter) is read, the other conditions are checked on just those rows.
+#
+# build_index() writes the folder from a merged frame (merge_data.main does
+# it after the CSV), build_from_file() from merged_transactions.csv or the
+# Parquet dataset. The folder is written next to its final name and swapped in.
+
+Usage:
+    index = TransactionIndex('dataset/after_merge/merged_transactions.idx')
+    index.query(customer_id=42)
+    index.query(start='2019-03-01', end='2019-03-07', category='food')
+    index.total(merchant='Starbucks', start='2019-01-01', end='2019-12-31')
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from merge_data import DATE_FORMAT, MERGED_COLUMNS, after_merge
+
+DEFAULT_INDEX = os.path.join(after_merge, 'merged_transactions.idx')
+
+##Columns stored as integer codes + vocabulary
+CODED = ['merchant', 'category', 'subcategory']
+
+##Columns with a secondary (posting list) index
+INDEXED = ['customer_id', 'merchant', 'category']
+
+VERSION = 1
+
+#------------------------------------------------------- BUILD -----------------------------------------------
+def row_dtype(n):
+    return np.int32 if n < 2**31 else np.int64
+
+def code_dtype(n_values):
+    return np.int16 if n_values < 2**15 else np.int32
+
+def encode(values, categories=None):
+    """(codes, vocabulary) of a text column (-1 = missing)."""
+    cat = pd.Categorical(values, categories=categories)
+    return cat.codes.astype(code_dtype(len(cat.categories))), [str(c) for c in cat.categories]
+
+def to_dates(values):
+    """datetime64[ns] of a merged date column (typed, or DATE_FORMAT strings as in the CSV)."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return np.asarray(values, dtype='datetime64[ns]')
+    return pd.to_datetime(values, format=DATE_FORMAT).to_numpy(dtype='datetime64[ns]')
+
+def is_sorted(dates):
+    """Ascending with any NaT last (numpy's order, which searchsorted relies on)."""
+    valid = int((~np.isnat(dates)).sum())
+    return bool(np.isnat(dates[valid:]).all() and (dates[1:valid] >= dates[:valid - 1]).all())
+
+def postings(values):
+    """CSR posting lists of a column: (distinct keys, offsets, row numbers grouped by key)."""
+    order = np.argsort(values, kind='stable').astype(row_dtype(len(values)))
+    keys, starts = np.unique(values[order], return_index=True)
+    return keys, np.append(starts, len(values)).astype(np.int64), order
+
+def build_index(df, root=DEFAULT_INDEX, source=None):
+    """
+    Write the index folder of a merged frame.
+
+    Args:
+        df (pd.DataFrame): MERGED_COLUMNS; dates typed or as DATE_FORMAT strings,
+            text columns as strings or categoricals. Sorted by date or not.
+        root (str): Index folder (replaced).
+        source (str): Path of the file the frame came from (recorded in meta.json).
+
+    Returns:
+        root
+    """
+    dates = to_dates(df['transaction_date'])
+    order = None
+    if not is_sorted(dates):
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+    take = (lambda a: np.asarray(a)) if order is None else (lambda a: np.asarray(a)[order])
+
+    columns = {
+        'transaction_date': dates,
+        'customer_id': take(df['customer_id']).astype(np.int64 if len(df) and df['customer_id'].max() >= 2**31 else np.int32),
+        'amount': take(df['amount']).astype(np.float64),
+    }
+    vocab = {}
+    for col in CODED:
+        codes, vocab[col] = encode(df[col])
+        columns[col] = take(codes)
+
+    tmp = root.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for col, values in columns.items():
+        np.save(os.path.join(tmp, f'{col}.npy'), values)
+    for col in INDEXED:
+        for part, values in zip(('keys', 'offsets', 'rows'), postings(columns[col])):
+            np.save(os.path.join(tmp, f'{col}.{part}.npy'), values)
+
+    meta = {
+        'version': VERSION,
+        'rows': len(dates),
+        'start': str(dates[0]) if len(dates) else None,
+        'end': str(dates[-1]) if len(dates) else None,
+        'columns': list(columns),
+        'indexed': INDEXED,
+        'vocab': vocab,
+        'source': source,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(tmp, root)
+    return root
+
+def build_from_file(path, root=DEFAULT_INDEX, chunk_rows=1_000_000):
+    """
+    build_index from merged_transactions.csv (read in chunks, only the
+    columns kept) or the Parquet dataset folder.
+    """
+    if os.path.isdir(path):
+        from columnar_store import read_transactions
+        df = read_transactions(path, columns=MERGED_COLUMNS)
+    else:
+        parts = []
+        for chunk in pd.read_csv(path, usecols=MERGED_COLUMNS, chunksize=chunk_rows,
+                                 dtype={col: 'category' for col in CODED}):
+            chunk['transaction_date'] = to_dates(chunk['transaction_date'])
+            parts.append(chunk)
+        df = pd.concat(parts, ignore_index=True)
+        ##concat drops to object when the chunks' categories differ, so union them instead
+        for col in CODED:
+            df[col] = pd.api.types.union_categoricals([part[col] for part in parts], ignore_order=True)
+    return build_index(df, root, source=os.path.abspath(path))
+
+#------------------------------------------------------- QUERY -----------------------------------------------
+class TransactionIndex:
+    """
+    Memory-mapped, read-only view of an index folder (see build_index).
+
+    Filters of select / query / total / count:
+        start, end (str | datetime): Inclusive date range.
+        customer_id (int), merchant, category (str): Equality; a list means any of them.
+    """
+    def __init__(self, root=DEFAULT_INDEX):
+        self.root = root
+        with open(os.path.join(root, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != VERSION:
+            raise ValueError(f"{root}: index version {self.meta['version']}, expected {VERSION} (rebuild it)")
+        self.arrays = {}
+        self.dtypes = {col: pd.CategoricalDtype(self.meta['vocab'][col]) for col in CODED}
+        self.codes = {col: {value: code for code, value in enumerate(self.meta['vocab'][col])} for col in CODED}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def array(self, name):
+        """Column or posting array by file name ('amount', 'merchant.rows', ...), mapped on first use."""
+        array = self.arrays.get(name)
+        if array is None:
+            array = self.arrays[name] = np.load(os.path.join(self.root, f'{name}.npy'), mmap_mode='r')
+        return array
+
+    def date_range(self, start=None, end=None):
+        """Row range [lo, hi) of the inclusive date range (a date-only end includes that whole day)."""
+        dates = self.array('transaction_date')
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left'))
+        if end is None:
+            hi = len(dates)
+        else:
+            end = pd.Timestamp(end)
+            if end == end.normalize():
+                hi = int(np.searchsorted(dates, np.datetime64(end + pd.Timedelta(days=1), 'ns'), 'left'))
+            else:
+                hi = int(np.searchsorted(dates, np.datetime64(end, 'ns'), 'right'))
+        return lo, max(lo, hi)
+
+    def keys_of(self, col, value):
+        """Stored keys (codes for text columns) of a filter value or list of values; unknown values are dropped."""
+        values = value if isinstance(value, (list, tuple, set, np.ndarray, pd.Index, pd.Series)) else [value]
+        if col in CODED:
+            return sorted({self.codes[col][v] for v in values if v in self.codes[col]})
+        return sorted({int(v) for v in values})
+
+    def spans(self, col, keys, lo, hi):
+        """Spans of <col>.rows holding the keys' rows in the row range [lo, hi)."""
+        stored, offsets, posting = self.array(f'{col}.keys'), self.array(f'{col}.offsets'), self.array(f'{col}.rows')
+        spans = []
+        bounds = np.iinfo(stored.dtype)
+        for key in keys:
+            ##A key the stored dtype cannot hold has no rows (and would overflow the cast below)
+            if not bounds.min <= key <= bounds.max:
+                continue
+            ##Needle in the array's dtype: a Python int would make searchsorted cast the whole array
+            i = int(np.searchsorted(stored, stored.dtype.type(key)))
+            if i < len(stored) and stored[i] == key:
+                a, b = int(offsets[i]), int(offsets[i + 1])
+                if lo > 0 or hi < len(self):
+                    ##A key's rows are ascending, i.e. in date order: cut them to the date range
+                    a, b = a + np.searchsorted(posting[a:b], np.array([lo, hi], dtype=posting.dtype))
+                spans.append((int(a), int(b)))
+        return spans
+
+    def select(self, start=None, end=None, customer_id=None, merchant=None, category=None):
+        """Row numbers matching the filters: a slice for a pure date range, otherwise a sorted array."""
+        lo, hi = self.date_range(start, end)
+        filters = {col: self.keys_of(col, value) for col, value in
+                   (('customer_id', customer_id), ('merchant', merchant), ('category', category)) if value is not None}
+        if not filters:
+            return slice(lo, hi)
+
+        ##Read the shortest cut posting list (or the date range, if shorter), check the other filters on its rows
+        spans = {col: self.spans(col, keys, lo, hi) for col, keys in filters.items()}
+        size = {col: sum(b - a for a, b in s) for col, s in spans.items()}
+        col = min(size, key=size.get)
+        if hi - lo <= size[col]:
+            col, rows = None, np.arange(lo, hi)
+        else:
+            posting = self.array(f'{col}.rows')
+            parts = [posting[a:b] for a, b in spans[col]]
+            rows = np.sort(np.concatenate(parts)) if len(parts) > 1 else (parts[0] if parts else np.empty(0, np.int64))
+            rows = np.asarray(rows, dtype=np.int64)
+        for other, keys in filters.items():
+            if other != col and len(rows):
+                values = self.array(other)[rows]
+                rows = rows[values == keys[0] if len(keys) == 1 else np.isin(values, keys)]
+        return rows
+
+    def frame(self, rows, columns=None):
+        """DataFrame of the selected rows (index = row number in date order)."""
+        data = {}
+        for col in columns or MERGED_COLUMNS:
+            values = self.array(col)[rows]
+            data[col] = pd.Categorical.from_codes(values, dtype=self.dtypes[col]) if col in CODED else values
+        index = pd.RangeIndex(rows.start, rows.stop) if isinstance(rows, slice) else rows
+        return pd.DataFrame(data, index=pd.Index(index, name='row'))
+
+    def query(self, columns=None, **filters):
+        """Matching transactions as a DataFrame (columns: default MERGED_COLUMNS)."""
+        return self.frame(self.select(**filters), columns)
+
+    def total(self, **filters):
+        """Sum of amount over the matching transactions."""
+        return float(self.array('amount')[self.select(**filters)].sum())
+
+    def count(self, **filters):
+        rows = self.select(**filters)
+        return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+
+#------------------------------------------------------- MAIN -----------------------------------------------
+def main(index_dir=DEFAULT_INDEX, build=None, start=None, end=None, customer_id=None, merchant=None, category=None,
+         limit=20):
+    """
+    Print the transactions matching the filters (first `limit` rows) and their total.
+
+    Args:
+        build (str): (Re)build the index from this merged CSV or Parquet folder first.
+    """
+    if build:
+        started = time.perf_counter()
+        build_from_file(build, index_dir)
+        print(f'Index of {build} written to {index_dir} ({time.perf_counter() - started:.1f} s)')
+    index = TransactionIndex(index_dir)
+    started = time.perf_counter()
+    result = index.query(start=start, end=end, customer_id=customer_id, merchant=merchant, category=category)
+    seconds = time.perf_counter() - started
+    print(result.head(limit).to_string())
+    print(f"{len(result):,} of {len(index):,} transactions, total {result['amount'].sum():,.2f} "
+          f"({1000 * seconds:.2f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build or query the index of the merged transactions.')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help='index folder')
+    parser.add_argument('--build', default=None, metavar='MERGED', help='(re)build from merged CSV or Parquet folder first')
+    parser.add_argument('--start', default=None, help='first date, e.g. 2019-03-01')
+    parser.add_argument('--end', default=None, help='last date (inclusive; a date alone covers the whole day), e.g. 2019-03-31')
+    parser.add_argument('--customer', type=int, default=None)
+    parser.add_argument('--merchant', nargs='+', default=None)
+    parser.add_argument('--category', nargs='+', default=None)
+    parser.add_argument('--limit', type=int, default=20, help='rows printed')
+    args = parser.parse_args()
+    main(args.index, args.build, args.start, args.end, args.customer, args.merchant, args.category, args.limit)